@@ -0,0 +1,30 @@
+"""add entity_id to webhook_events
+
+Revision ID: a7e5b3d0f624
+Revises: f6d4a2c9e513
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7e5b3d0f624'
+down_revision: Union[str, None] = 'f6d4a2c9e513'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('webhook_events', sa.Column('entity_id', sa.String(), nullable=True))
+    op.create_index('idx_webhook_events_entity', 'webhook_events', ['merchant_id', 'entity_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_webhook_events_entity', table_name='webhook_events')
+    op.drop_column('webhook_events', 'entity_id')
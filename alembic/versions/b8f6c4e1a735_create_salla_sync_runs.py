@@ -0,0 +1,49 @@
+"""create salla_sync_runs table
+
+Revision ID: b8f6c4e1a735
+Revises: a7e5b3d0f624
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8f6c4e1a735'
+down_revision: Union[str, None] = 'a7e5b3d0f624'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('salla_sync_runs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('store_id', sa.Integer(), nullable=True),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('parallel', sa.Boolean(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('resumed_count', sa.Integer(), nullable=True),
+    sa.Column('last_page', sa.Integer(), nullable=True),
+    sa.Column('total_pages', sa.Integer(), nullable=True),
+    sa.Column('products_new', sa.Integer(), nullable=True),
+    sa.Column('products_changed', sa.Integer(), nullable=True),
+    sa.Column('products_unchanged', sa.Integer(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['store_id'], ['salla_stores.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_salla_sync_runs_id'), 'salla_sync_runs', ['id'], unique=False)
+    op.create_index(op.f('ix_salla_sync_runs_store_id'), 'salla_sync_runs', ['store_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_salla_sync_runs_store_id'), table_name='salla_sync_runs')
+    op.drop_index(op.f('ix_salla_sync_runs_id'), table_name='salla_sync_runs')
+    op.drop_table('salla_sync_runs')
@@ -0,0 +1,28 @@
+"""add store sync concurrency
+
+Revision ID: c3a1d9e4f210
+Revises: b7b02f462d64
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3a1d9e4f210'
+down_revision: Union[str, None] = 'b7b02f462d64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('salla_stores', sa.Column('sync_concurrency', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('salla_stores', 'sync_concurrency')
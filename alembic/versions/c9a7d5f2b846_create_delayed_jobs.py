@@ -0,0 +1,49 @@
+"""create delayed_jobs table
+
+Revision ID: c9a7d5f2b846
+Revises: b8f6c4e1a735
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c9a7d5f2b846'
+down_revision: Union[str, None] = 'b8f6c4e1a735'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('delayed_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('job_type', sa.String(), nullable=False),
+    sa.Column('dedupe_key', sa.String(), nullable=True),
+    sa.Column('payload', sa.JSON(), nullable=True),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('claim_token', sa.String(length=32), nullable=True),
+    sa.Column('run_at', sa.DateTime(), nullable=False),
+    sa.Column('locked_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('dedupe_key')
+    )
+    op.create_index(op.f('ix_delayed_jobs_id'), 'delayed_jobs', ['id'], unique=False)
+    op.create_index('idx_delayed_jobs_status_run_at', 'delayed_jobs', ['status', 'run_at'], unique=False)
+    op.create_index('idx_delayed_jobs_claim_token', 'delayed_jobs', ['claim_token'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_delayed_jobs_claim_token', table_name='delayed_jobs')
+    op.drop_index('idx_delayed_jobs_status_run_at', table_name='delayed_jobs')
+    op.drop_index(op.f('ix_delayed_jobs_id'), table_name='delayed_jobs')
+    op.drop_table('delayed_jobs')
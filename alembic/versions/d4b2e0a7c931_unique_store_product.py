@@ -0,0 +1,37 @@
+"""unique (store_id, salla_product_id) on salla_products
+
+Revision ID: d4b2e0a7c931
+Revises: c3a1d9e4f210
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4b2e0a7c931'
+down_revision: Union[str, None] = 'c3a1d9e4f210'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # حذف النسخ المكررة (إن وجدت) مع الإبقاء على أحدث صف لكل منتج
+    op.execute(
+        "DELETE FROM salla_products WHERE id NOT IN ("
+        "SELECT MAX(id) FROM salla_products GROUP BY store_id, salla_product_id)"
+    )
+    with op.batch_alter_table('salla_products') as batch_op:
+        batch_op.create_unique_constraint(
+            'uq_salla_products_store_product', ['store_id', 'salla_product_id']
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('salla_products') as batch_op:
+        batch_op.drop_constraint('uq_salla_products_store_product', type_='unique')
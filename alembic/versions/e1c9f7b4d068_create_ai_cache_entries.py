@@ -0,0 +1,46 @@
+"""create ai_cache_entries table
+
+Revision ID: e1c9f7b4d068
+Revises: d0b8e6a3c957
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1c9f7b4d068'
+down_revision: Union[str, None] = 'd0b8e6a3c957'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('ai_cache_entries',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('cache_key', sa.String(length=64), nullable=False),
+    sa.Column('kind', sa.String(), nullable=False),
+    sa.Column('model', sa.String(), nullable=False),
+    sa.Column('result', sa.JSON(), nullable=False),
+    sa.Column('hits', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('last_used_at', sa.DateTime(), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('cache_key')
+    )
+    op.create_index(op.f('ix_ai_cache_entries_id'), 'ai_cache_entries', ['id'], unique=False)
+    op.create_index('idx_ai_cache_last_used', 'ai_cache_entries', ['last_used_at'], unique=False)
+    op.create_index('idx_ai_cache_expires', 'ai_cache_entries', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_ai_cache_expires', table_name='ai_cache_entries')
+    op.drop_index('idx_ai_cache_last_used', table_name='ai_cache_entries')
+    op.drop_index(op.f('ix_ai_cache_entries_id'), table_name='ai_cache_entries')
+    op.drop_table('ai_cache_entries')
@@ -0,0 +1,28 @@
+"""add content_hash to salla_products
+
+Revision ID: e5c3f1b8d402
+Revises: d4b2e0a7c931
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5c3f1b8d402'
+down_revision: Union[str, None] = 'd4b2e0a7c931'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('salla_products', sa.Column('content_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('salla_products', 'content_hash')
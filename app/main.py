@@ -2,7 +2,14 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
 from app.database import engine, Base
+from app.services.salla_api import salla_http
+from app.services.webhook_inbox import webhook_inbox
+from app.services.auto_sync_scheduler import auto_sync_scheduler
+from app.services.delayed_jobs import delayed_jobs
+from app.services.email_service import email_service
+from app.services.email_outbox import email_outbox
 from dotenv import load_dotenv
 import os
 
@@ -21,10 +28,31 @@ from app.models import user, points
 
 load_dotenv()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """تهيئة وإغلاق الموارد المشتركة مع دورة حياة التطبيق"""
+    await salla_http.startup()
+    await webhook_inbox.start()
+    await auto_sync_scheduler.start()
+    await delayed_jobs.start()
+    await email_outbox.start()
+    try:
+        yield
+    finally:
+        await email_outbox.stop()
+        await delayed_jobs.stop()
+        await email_service.smtp_pool.close()
+        await auto_sync_scheduler.stop()
+        await webhook_inbox.stop()
+        await salla_http.shutdown()
+
+
 app = FastAPI(
     title="Salla SEO Integration API",
     description="API لربط وإدارة متاجر سلة مع تحسين SEO بالذكاء الاصطناعي",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # ✅ إعدادات CORS محدثة - إضافة allow_origins=["*"] مؤقتاً
@@ -2,9 +2,13 @@
 from app.database import Base
 from .user import User
 from .pending_store import PendingStore
+from .webhook_event import WebhookEvent
+from .delayed_job import DelayedJob
+from .email_outbox import EmailOutbox
+from .ai_cache import AICacheEntry
 
 try:
-    from .salla import SallaStore, SallaProduct
-    __all__ = ["Base", "User", "SallaStore", "SallaProduct", "PendingStore"]
+    from .salla import SallaStore, SallaProduct, SallaSyncRun
+    __all__ = ["Base", "User", "SallaStore", "SallaProduct", "SallaSyncRun", "PendingStore", "WebhookEvent", "DelayedJob", "EmailOutbox", "AICacheEntry"]
 except ImportError:
-    __all__ = ["Base", "User", "PendingStore"]
\ No newline at end of file
+    __all__ = ["Base", "User", "PendingStore", "WebhookEvent", "DelayedJob", "EmailOutbox", "AICacheEntry"]
\ No newline at end of file
@@ -0,0 +1,25 @@
+# app/models/ai_cache.py
+from sqlalchemy import Column, Integer, String, DateTime, JSON, Index
+from app.database import Base
+from datetime import datetime
+
+
+class AICacheEntry(Base):
+    """نتائج AI محفوظة بمفتاح hash لمدخلات البرومبت والنموذج"""
+    __tablename__ = "ai_cache_entries"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String(64), unique=True, nullable=False)  # sha256 للنوع + النموذج + المدخلات
+    kind = Column(String, nullable=False)  # seo, description
+    model = Column(String, nullable=False)
+    result = Column(JSON, nullable=False)
+    
+    hits = Column(Integer, default=0)  # عدد مرات الاستخدام من الكاش
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow)  # للإزالة الأقل استخداماً (LRU)
+    expires_at = Column(DateTime, nullable=False)
+    
+    __table_args__ = (
+        Index('idx_ai_cache_last_used', 'last_used_at'),
+        Index('idx_ai_cache_expires', 'expires_at'),
+    )
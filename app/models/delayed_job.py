@@ -0,0 +1,31 @@
+# app/models/delayed_job.py
+from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, Index
+from app.database import Base
+from datetime import datetime
+
+
+class DelayedJob(Base):
+    """مهام مؤجلة محفوظة في قاعدة البيانات (تذكيرات، تنظيف دوري...) تبقى بعد إعادة التشغيل"""
+    __tablename__ = "delayed_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    job_type = Column(String, nullable=False)  # نوع المهمة (pending_store_reminder ...)
+    dedupe_key = Column(String, unique=True, nullable=True)  # يمنع جدولة نفس المهمة مرتين
+    payload = Column(JSON)  # بيانات المهمة
+    
+    # حالة التنفيذ
+    status = Column(String, default="pending", nullable=False)  # pending, running, done, failed
+    attempts = Column(Integer, default=0)  # عدد محاولات التنفيذ
+    last_error = Column(Text)  # آخر خطأ
+    claim_token = Column(String(32))  # رمز الدفعة التي حجزت المهمة
+    
+    # تواريخ
+    run_at = Column(DateTime, nullable=False)  # موعد التنفيذ
+    locked_at = Column(DateTime)  # وقت حجز المهمة من worker
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime)  # وقت انتهاء التنفيذ
+    
+    __table_args__ = (
+        Index('idx_delayed_jobs_status_run_at', 'status', 'run_at'),
+        Index('idx_delayed_jobs_claim_token', 'claim_token'),
+    )
@@ -0,0 +1,33 @@
+# app/models/email_outbox.py
+from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, Index
+from app.database import Base
+from datetime import datetime
+
+
+class EmailOutbox(Base):
+    """إيميلات تُكتب في نفس معاملة التغيير الذي سببها ثم تُرسل لاحقاً على دفعات"""
+    __tablename__ = "email_outbox"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    template = Column(String, nullable=False)  # store_welcome, store_reminder, store_connected
+    recipient = Column(String, nullable=False)  # البريد المرسل إليه
+    entity_key = Column(String, nullable=False)  # الكيان المرتبط (متجر + رمز التحقق...)
+    dedupe_key = Column(String, unique=True, nullable=False)  # recipient:template:entity_key
+    context = Column(JSON)  # متغيرات بناء الإيميل
+    
+    # حالة الإرسال
+    status = Column(String, default="pending", nullable=False)  # pending, sending, sent, failed
+    attempts = Column(Integer, default=0)  # عدد محاولات الإرسال
+    last_error = Column(Text)  # آخر خطأ
+    claim_token = Column(String(32))  # رمز الدفعة التي حجزت الإيميل
+    
+    # تواريخ
+    available_at = Column(DateTime, default=datetime.utcnow, nullable=False)  # موعد المحاولة التالية
+    locked_at = Column(DateTime)  # وقت حجز الإيميل من worker
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime)
+    
+    __table_args__ = (
+        Index('idx_email_outbox_status_available', 'status', 'available_at'),
+        Index('idx_email_outbox_claim_token', 'claim_token'),
+    )
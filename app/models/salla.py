@@ -1,5 +1,5 @@
 # app/models/salla.py
-from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, Boolean, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, Boolean, ForeignKey, Float, UniqueConstraint
 from sqlalchemy.orm import relationship
 from app.database import Base
 from datetime import datetime
@@ -27,6 +27,7 @@ class SallaStore(Base):
     auto_sync_enabled = Column(Boolean, default=True)  # تفعيل المزامنة التلقائية
     webhook_secret = Column(String)  # مفتاح الحماية للإشعارات
     last_sync_at = Column(DateTime)  # آخر مزامنة
+    sync_concurrency = Column(Integer, nullable=True)  # عدد الصفحات المجلوبة بالتوازي أثناء المزامنة (الافتراضي من الإعدادات)
     
     # تواريخ الإنشاء والتحديث
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -35,6 +36,7 @@ class SallaStore(Base):
     # العلاقات
     user = relationship("User", back_populates="salla_stores")
     products = relationship("SallaProduct", back_populates="store")
+    sync_runs = relationship("SallaSyncRun", back_populates="store")
 
 
 class SallaProduct(Base):
@@ -78,10 +80,48 @@ class SallaProduct(Base):
     # بيانات المزامنة
     last_synced_at = Column(DateTime, default=datetime.utcnow)  # آخر مزامنة
     needs_update = Column(Boolean, default=False)  # يحتاج تحديث
+    content_hash = Column(String(64), nullable=True)  # بصمة بيانات سلة لتخطي المنتجات غير المتغيرة
     
     # تواريخ
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # العلاقات
-    store = relationship("SallaStore", back_populates="products")
\ No newline at end of file
+    store = relationship("SallaStore", back_populates="products")
+    
+    # Constraints
+    __table_args__ = (
+        # يضمن منتجاً واحداً لكل متجر ويدعم INSERT ... ON CONFLICT أثناء المزامنة
+        UniqueConstraint('store_id', 'salla_product_id', name='uq_salla_products_store_product'),
+    )
+
+
+class SallaSyncRun(Base):
+    """سجل تشغيلات مزامنة المنتجات مع نقطة استئناف بعد كل صفحة"""
+    __tablename__ = "salla_sync_runs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    store_id = Column(Integer, ForeignKey("salla_stores.id"), index=True)  # ربط مع المتجر
+    
+    # حالة التشغيل
+    status = Column(String, default="running", nullable=False)  # running, completed, failed, abandoned
+    parallel = Column(Boolean, default=True)  # جلب الصفحات بالتوازي
+    error = Column(Text)  # آخر خطأ
+    resumed_count = Column(Integer, default=0)  # عدد مرات الاستئناف من نقطة الحفظ
+    
+    # نقطة الاستئناف
+    last_page = Column(Integer, default=0)  # آخر صفحة حُفظت بالكامل
+    total_pages = Column(Integer)  # عدد الصفحات حسب سلة
+    
+    # الإحصائيات
+    products_new = Column(Integer, default=0)
+    products_changed = Column(Integer, default=0)
+    products_unchanged = Column(Integer, default=0)
+    
+    # تواريخ
+    started_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # آخر نقطة حفظ
+    finished_at = Column(DateTime)
+    
+    # العلاقات
+    store = relationship("SallaStore", back_populates="sync_runs")
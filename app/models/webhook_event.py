@@ -0,0 +1,36 @@
+# app/models/webhook_event.py
+from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, Index
+from app.database import Base
+from datetime import datetime
+
+
+class WebhookEvent(Base):
+    """صندوق وارد دائم لأحداث webhooks سلة قبل معالجتها"""
+    __tablename__ = "webhook_events"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    idempotency_key = Column(String(64), unique=True, nullable=False)  # بصمة الحدث لمنع التكرار
+    
+    # بيانات الحدث من سلة
+    event = Column(String, nullable=False)  # نوع الحدث (product.updated ...)
+    merchant_id = Column(String, index=True)  # ID المتجر في سلة
+    entity_id = Column(String)  # ID الكيان المتأثر (المنتج مثلاً) لدمج الأحداث المتكررة
+    payload = Column(JSON)  # محتوى data من الحدث
+    
+    # حالة المعالجة
+    status = Column(String, default="pending", nullable=False)  # pending, processing, done, coalesced, failed
+    attempts = Column(Integer, default=0)  # عدد محاولات المعالجة
+    last_error = Column(Text)  # آخر خطأ
+    claim_token = Column(String(32))  # رمز الدفعة التي حجزت الحدث
+    
+    # تواريخ
+    received_at = Column(DateTime, default=datetime.utcnow)  # وقت الاستلام
+    available_at = Column(DateTime, default=datetime.utcnow)  # لا يُعالج قبل هذا الوقت (إعادة المحاولة)
+    locked_at = Column(DateTime)  # وقت حجز الحدث من worker
+    processed_at = Column(DateTime)  # وقت انتهاء المعالجة
+    
+    __table_args__ = (
+        Index('idx_webhook_events_status_available', 'status', 'available_at'),
+        Index('idx_webhook_events_claim_token', 'claim_token'),
+        Index('idx_webhook_events_entity', 'merchant_id', 'entity_id'),
+    )
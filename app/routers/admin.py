@@ -10,6 +10,19 @@ from app.models.user import User
 from app.models.points import UserPoints, PointTransaction, TransactionType
 from app.routers.auth import get_current_user
 from app.services.points_service import PointsService
+from app.services.salla_api import salla_http
+from app.services.ai_cache import ai_cache
+from app.services.auto_sync_scheduler import auto_sync_scheduler
+from app.services.fair_queue import get_fair_queue_metrics
+from app.services.prompt_compactor import prompt_compactor
+from app.services.delayed_jobs import delayed_jobs
+from app.services.email_service import email_service
+from app.services.email_outbox import email_outbox
+from app.services.salla_push_service import salla_push_service
+from app.services.salla_rate_limiter import salla_rate_limiter
+from app.services.seo_scorer import seo_scorer
+from app.services.salla_token_manager import salla_token_manager
+from app.services.webhook_inbox import webhook_inbox
 import logging
 
 logger = logging.getLogger(__name__)
@@ -331,4 +344,24 @@ async def list_all_users(
         
     except Exception as e:
         logger.error(f"Error listing users: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"خطأ في جلب المستخدمين: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"خطأ في جلب المستخدمين: {str(e)}")
+
+@router.get("/system/metrics")
+async def get_system_metrics(admin: User = Depends(get_admin_user)):
+    """مقاييس أداء الخدمات الداخلية"""
+    return {
+        "salla_http": salla_http.get_metrics(),
+        "salla_rate_limits": salla_rate_limiter.get_metrics(),
+        "salla_tokens": salla_token_manager.get_metrics(),
+        "salla_push": salla_push_service.get_metrics(),
+        "webhook_inbox": webhook_inbox.get_metrics(),
+        "auto_sync": auto_sync_scheduler.get_metrics(),
+        "fair_queues": get_fair_queue_metrics(),
+        "delayed_jobs": delayed_jobs.get_metrics(),
+        "smtp_pool": email_service.smtp_pool.get_metrics(),
+        "email_outbox": email_outbox.get_metrics(),
+        "ai_cache": ai_cache.get_metrics(),
+        "ai_prompts": prompt_compactor.get_metrics(),
+        "seo_scorer": seo_scorer.get_metrics(),
+        "timestamp": datetime.utcnow().isoformat()
+    }
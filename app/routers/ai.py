@@ -1,25 +1,73 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from openai import OpenAI
+from openai import AsyncOpenAI
 import os
+import json
+import logging
 from dotenv import load_dotenv
 from app.routers.auth import get_current_user
 
 load_dotenv()
-client = OpenAI(api_key=os.environ["OPENAI_API_KEY"])
+# عميل غير متزامن حتى لا يوقف توليد النص بقية الطلبات على نفس الـ worker
+client = AsyncOpenAI(
+    api_key=os.environ["OPENAI_API_KEY"],
+    base_url=os.getenv("OPENAI_BASE_URL") or None,
+    max_retries=int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+)
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+SYSTEM_PROMPT = "أنت مساعد ذكي متخصص في تحسين SEO للمنتجات."
+
 class PromptRequest(BaseModel):
     prompt: str
+    stream: bool = False  # إرسال النص تدريجياً كـ Server-Sent Events
+
+def _sse(payload: dict, event: str = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+async def _stream_generation(prompt: str):
+    """تمرير أجزاء النص للعميل فور وصولها من OpenAI"""
+    try:
+        stream = await client.chat.completions.create(
+            model="gpt-4",
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.7,
+            max_tokens=800,
+            stream=True
+        )
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield _sse({"text": delta})
+        yield "data: [DONE]\n\n"
+    except Exception as e:
+        logger.error(f"Streaming generation error: {str(e)}")
+        yield _sse({"detail": f"خطأ في توليد النص: {str(e)}"}, event="error")
 
 @router.post("/generate")
 async def generate_text(request: PromptRequest, user=Depends(get_current_user)):
+    if request.stream:
+        return StreamingResponse(
+            _stream_generation(request.prompt),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
     try:
-        response = client.chat.completions.create(
+        response = await client.chat.completions.create(
             model="gpt-4",
             messages=[
-                {"role": "system", "content": "أنت مساعد ذكي متخصص في تحسين SEO للمنتجات."},
+                {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": request.prompt}
             ],
             temperature=0.7,
@@ -28,4 +76,4 @@ async def generate_text(request: PromptRequest, user=Depends(get_current_user)):
         generated_text = response.choices[0].message.content.strip()
         return {"text": generated_text}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"خطأ في توليد النص: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"خطأ في توليد النص: {str(e)}")
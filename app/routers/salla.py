@@ -1,21 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Request
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Request, Query
 from sqlalchemy.orm import Session
+from sqlalchemy import func
+from pydantic import BaseModel, Field
 import uuid
 import os
 import json
 import hmac
 import hashlib
-import asyncio
 import logging
+import math
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import List, Optional
 
-from app.database import get_db
+from app.database import get_db, SessionLocal
 from app.models.user import User
-from app.models.salla import SallaStore, SallaProduct
+from app.models.salla import SallaStore, SallaProduct, SallaSyncRun
 from app.models.pending_store import PendingStore
 from app.services.salla_api import SallaAPIService
-from app.services.email_service import email_service
+from app.services.product_sync_service import HASHED_FIELDS, build_product_info, compute_content_hash
+from app.services.product_sync_pipeline import ProductSyncPipeline
+from app.services.email_outbox import email_outbox
+from app.services.webhook_inbox import webhook_inbox
+from app.services.auto_sync_scheduler import auto_sync_scheduler
+from app.services.fair_queue import sync_fair_queue
+from app.services.delayed_jobs import delayed_jobs
 from app.routers.auth import get_current_user
 
 # إعداد logging
@@ -24,6 +32,24 @@ logger = logging.getLogger(__name__)
 # إنشاء router
 router = APIRouter(prefix="/api/salla", tags=["salla"])
 salla_service = SallaAPIService()
+sync_pipeline = ProductSyncPipeline(salla_service)
+
+# إعدادات المزامنة
+SYNC_PAGE_SIZE = int(os.getenv("SALLA_SYNC_PAGE_SIZE", "20"))
+SYNC_CONCURRENCY = int(os.getenv("SALLA_SYNC_CONCURRENCY", "4"))
+MAX_SYNC_CONCURRENCY = 10
+# تشغيل بدون نقطة حفظ لهذه المدة يُعتبر متوقفاً (worker أُعيد تشغيله)
+SYNC_STALE_AFTER = timedelta(minutes=int(os.getenv("SALLA_SYNC_STALE_MINUTES", "10")))
+# نقاط الحفظ الأقدم من هذا لا يُستأنف منها (ترتيب الصفحات في سلة قد تغير)
+SYNC_RESUME_MAX_AGE = timedelta(hours=int(os.getenv("SALLA_SYNC_RESUME_MAX_HOURS", "24")))
+
+# إعدادات المهام المؤجلة
+REMINDER_DELAY_HOURS = int(os.getenv("PENDING_STORE_REMINDER_DELAY_HOURS", "25"))
+CLEANUP_INTERVAL_HOURS = int(os.getenv("PENDING_STORE_CLEANUP_INTERVAL_HOURS", "24"))
+
+class StoreSettingsUpdate(BaseModel):
+    auto_sync_enabled: Optional[bool] = None
+    sync_concurrency: Optional[int] = Field(None, ge=1, le=MAX_SYNC_CONCURRENCY)
 
 @router.get("/authorize")
 async def get_authorization_url(current_user: User = Depends(get_current_user)):
@@ -104,21 +130,23 @@ async def handle_oauth_callback(
             )
             db.add(store)
         
+        # إيميل تأكيد الربط يُحفظ في نفس المعاملة ويُرسل من الصندوق الصادر
+        email_outbox.enqueue(
+            db,
+            "store_connected",
+            recipient=current_user.email,
+            entity_key=f"{store.store_id}:{datetime.utcnow():%Y%m%d}",
+            context={
+                "user_email": current_user.email,
+                "user_name": current_user.full_name or current_user.email,
+                "store_name": store.store_name,
+                "products_synced": 0
+            }
+        )
+        
         db.commit()
         db.refresh(store)
         
-        # إرسال إيميل تأكيد الربط
-        try:
-            await email_service.send_store_connected_email(
-                user_email=current_user.email,
-                user_name=current_user.full_name or current_user.email,
-                store_name=store.store_name,
-                products_synced=0
-            )
-            logger.info(f"تم إرسال إيميل تأكيد الربط")
-        except Exception as email_error:
-            logger.warning(f"خطأ في إرسال إيميل الربط: {str(email_error)}")
-        
         return {
             "success": True,
             "message": "تم ربط المتجر بنجاح!",
@@ -141,7 +169,6 @@ async def handle_oauth_callback(
 @router.post("/webhook")
 async def handle_salla_webhook(
     request: Request,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """استقبال ومعالجة webhooks من سلة"""
@@ -167,38 +194,16 @@ async def handle_salla_webhook(
         
         logger.info(f"Webhook received: {event} for merchant: {merchant_id}")
         
-        # معالجة الأحداث المختلفة
-        if event == "app.installed":
-            background_tasks.add_task(handle_app_installed, db, str(merchant_id), data)
-            
-        elif event == "app.store.authorize":
-            background_tasks.add_task(handle_app_store_authorize, db, str(merchant_id), data)
-            
-        elif event == "app.uninstalled":
-            background_tasks.add_task(handle_app_uninstalled, db, str(merchant_id), data)
-            
-        elif event == "product.created":
-            background_tasks.add_task(handle_product_created, db, str(merchant_id), data)
-            
-        elif event == "product.updated":
-            background_tasks.add_task(handle_product_updated, db, str(merchant_id), data)
-            
-        elif event == "product.deleted":
-            background_tasks.add_task(handle_product_deleted, db, str(merchant_id), data)
-            
-        elif event == "order.created":
-            background_tasks.add_task(handle_order_created, db, str(merchant_id), data)
-            
-        elif event == "order.updated":
-            background_tasks.add_task(handle_order_updated, db, str(merchant_id), data)
+        # حفظ الحدث في الصندوق الوارد - المعالجة تتم عبر workers بجلسات مستقلة
+        queued = webhook_inbox.enqueue(db, event, str(merchant_id), data, payload)
         
-        # جدولة مهام الإيميلات للأحداث المهمة
-        if event in ["app.installed", "app.store.authorize"]:
-            background_tasks.add_task(schedule_reminder_task, str(merchant_id), delay_hours=25)
+        # جدولة مهام الإيميلات للأحداث المهمة (مهمة مؤجلة محفوظة في قاعدة البيانات)
+        if queued and event in ["app.installed", "app.store.authorize"]:
+            schedule_reminder_task(db, str(merchant_id), delay_hours=REMINDER_DELAY_HOURS)
         
         return {
             "success": True,
-            "message": f"Webhook {event} received and processed",
+            "message": f"Webhook {event} received" if queued else f"Webhook {event} already received",
             "timestamp": datetime.utcnow().isoformat()
         }
         
@@ -241,6 +246,7 @@ async def get_connected_stores(
 async def sync_store_products(
     store_id: int,
     background_tasks: BackgroundTasks,
+    parallel: bool = Query(True, description="جلب الصفحات بالتوازي"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -254,7 +260,7 @@ async def sync_store_products(
         if not store:
             raise HTTPException(status_code=404, detail="المتجر غير موجود")
         
-        background_tasks.add_task(sync_products_task, db, store)
+        background_tasks.add_task(sync_products_task, store.id, parallel)
         
         return {
             "success": True,
@@ -267,6 +273,82 @@ async def sync_store_products(
         logger.error(f"خطأ في بدء المزامنة: {str(e)}")
         raise HTTPException(status_code=500, detail=f"خطأ في بدء المزامنة: {str(e)}")
 
+@router.put("/stores/{store_id}/settings")
+async def update_store_settings(
+    store_id: int,
+    settings: StoreSettingsUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """تحديث إعدادات المزامنة للمتجر"""
+    store = db.query(SallaStore).filter(
+        SallaStore.id == store_id,
+        SallaStore.user_id == current_user.id
+    ).first()
+    
+    if not store:
+        raise HTTPException(status_code=404, detail="المتجر غير موجود")
+    
+    if settings.auto_sync_enabled is not None:
+        store.auto_sync_enabled = settings.auto_sync_enabled
+    if settings.sync_concurrency is not None:
+        store.sync_concurrency = settings.sync_concurrency
+    
+    db.commit()
+    
+    return {
+        "success": True,
+        "settings": {
+            "auto_sync_enabled": store.auto_sync_enabled,
+            "sync_concurrency": store.sync_concurrency or SYNC_CONCURRENCY
+        }
+    }
+
+@router.get("/stores/{store_id}/sync-runs")
+async def get_store_sync_runs(
+    store_id: int,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """سجل تشغيلات المزامنة للمتجر مع سرعة كل تشغيل"""
+    store = db.query(SallaStore).filter(
+        SallaStore.id == store_id,
+        SallaStore.user_id == current_user.id
+    ).first()
+    
+    if not store:
+        raise HTTPException(status_code=404, detail="المتجر غير موجود")
+    
+    runs = db.query(SallaSyncRun).filter(
+        SallaSyncRun.store_id == store_id
+    ).order_by(SallaSyncRun.id.desc()).limit(limit).all()
+    
+    result = []
+    for run in runs:
+        products = (run.products_new or 0) + (run.products_changed or 0) + (run.products_unchanged or 0)
+        duration = ((run.finished_at or run.updated_at) - run.started_at).total_seconds() if run.started_at else None
+        result.append({
+            "id": run.id,
+            "status": run.status,
+            "parallel": run.parallel,
+            "last_page": run.last_page,
+            "total_pages": run.total_pages,
+            "products": {
+                "new": run.products_new or 0,
+                "changed": run.products_changed or 0,
+                "unchanged": run.products_unchanged or 0
+            },
+            "resumed_count": run.resumed_count or 0,
+            "error": run.error,
+            "started_at": run.started_at,
+            "finished_at": run.finished_at,
+            "duration_seconds": round(duration, 2) if duration is not None else None,
+            "products_per_second": round(products / duration, 2) if duration else None
+        })
+    
+    return {"store_id": store_id, "runs": result}
+
 @router.get("/stores/{store_id}/products")
 async def get_store_products(
     store_id: int,
@@ -325,6 +407,26 @@ async def get_store_products(
 
 # ===== معالجات الأحداث =====
 
+def queue_welcome_email(db: Session, pending_store: PendingStore, products_count: int = 0):
+    """إضافة إيميل الترحيب للصندوق الصادر ضمن معاملة المتجر المعلق"""
+    email_outbox.enqueue(
+        db,
+        "store_welcome",
+        recipient=pending_store.store_email,
+        entity_key=f"{pending_store.store_id}:{pending_store.verification_token}",
+        context={
+            "store_email": pending_store.store_email,
+            "store_name": pending_store.store_name,
+            "store_id": pending_store.store_id,
+            "verification_token": pending_store.verification_token,
+            "products_count": products_count
+        }
+    )
+    pending_store.welcome_email_sent = True
+    pending_store.last_email_sent_at = datetime.utcnow()
+    pending_store.products_count = products_count
+    logger.info(f"Welcome email queued for {pending_store.store_email}")
+
 async def handle_app_installed(db: Session, merchant_id: str, data: dict):
     """معالجة تثبيت التطبيق"""
     try:
@@ -371,37 +473,19 @@ async def handle_app_installed(db: Session, merchant_id: str, data: dict):
             )
             db.add(pending_store)
         
-        db.commit()
-        db.refresh(pending_store)
-        
-        # إرسال إيميل ترحيب إذا توفر إيميل
+        # إيميل ترحيب إذا توفر إيميل (يُحفظ مع المتجر المعلق في نفس المعاملة)
         if store_email and not pending_store.welcome_email_sent:
-            try:
-                products_count = data.get("products_count", 0)
-                
-                email_sent = await email_service.send_store_welcome_email(
-                    store_email=store_email,
-                    store_name=store_name,
-                    store_id=merchant_id,
-                    verification_token=pending_store.verification_token,
-                    products_count=products_count
-                )
-                
-                if email_sent:
-                    pending_store.welcome_email_sent = True
-                    pending_store.last_email_sent_at = datetime.utcnow()
-                    pending_store.products_count = products_count
-                    db.commit()
-                    logger.info(f"Welcome email sent to {store_email}")
-                    
-            except Exception as email_error:
-                logger.error(f"Error sending welcome email: {str(email_error)}")
+            queue_welcome_email(db, pending_store, data.get("products_count", 0))
+        
+        db.commit()
         
         logger.info(f"App installation processed for {store_name}")
         
     except Exception as e:
         logger.error(f"Error handling app installation: {str(e)}")
         db.rollback()
+        # الخطأ يصل لصندوق الوارد ليعيد المحاولة لاحقاً
+        raise
 
 async def handle_app_store_authorize(db: Session, merchant_id: str, data: dict):
     """معالجة ترخيص التطبيق"""
@@ -414,7 +498,7 @@ async def handle_app_store_authorize(db: Session, merchant_id: str, data: dict):
         
         if access_token:
             try:
-                store_info = await salla_service.get_store_info(access_token)
+                store_info = await salla_service.get_store_info(access_token, merchant_id=merchant_id)
                 
                 if "data" in store_info:
                     store_data = store_info["data"]
@@ -466,37 +550,20 @@ async def handle_app_store_authorize(db: Session, merchant_id: str, data: dict):
                         )
                         db.add(pending_store)
                     
-                    db.commit()
-                    db.refresh(pending_store)
-                    
-                    # إرسال إيميل ترحيب إذا توفر إيميل
+                    # إيميل ترحيب إذا توفر إيميل (يُحفظ مع المتجر المعلق في نفس المعاملة)
                     if store_email and not pending_store.welcome_email_sent:
+                        products_count = 0
                         try:
-                            products_count = 0
-                            try:
-                                products_data = await salla_service.get_products(access_token, page=1, per_page=1)
-                                if products_data and "pagination" in products_data:
-                                    products_count = products_data["pagination"].get("total", 0)
-                            except:
-                                pass
-                            
-                            email_sent = await email_service.send_store_welcome_email(
-                                store_email=store_email,
-                                store_name=store_name,
-                                store_id=merchant_id,
-                                verification_token=pending_store.verification_token,
-                                products_count=products_count
+                            products_data = await salla_service.get_products(
+                                access_token, page=1, per_page=1, merchant_id=merchant_id
                             )
-                            
-                            if email_sent:
-                                pending_store.welcome_email_sent = True
-                                pending_store.last_email_sent_at = datetime.utcnow()
-                                pending_store.products_count = products_count
-                                db.commit()
-                                logger.info(f"Welcome email sent to {store_email}")
-                                
-                        except Exception as email_error:
-                            logger.error(f"Error sending welcome email: {str(email_error)}")
+                            if products_data and "pagination" in products_data:
+                                products_count = products_data["pagination"].get("total", 0)
+                        except:
+                            pass
+                        queue_welcome_email(db, pending_store, products_count)
+                    
+                    db.commit()
                             
             except Exception as api_error:
                 logger.error(f"Error fetching store info: {str(api_error)}")
@@ -520,6 +587,7 @@ async def handle_app_store_authorize(db: Session, merchant_id: str, data: dict):
     except Exception as e:
         logger.error(f"Error handling app authorization: {str(e)}")
         db.rollback()
+        raise
 
 async def handle_app_uninstalled(db: Session, merchant_id: str, data: dict):
     """معالجة إلغاء تثبيت التطبيق"""
@@ -551,6 +619,7 @@ async def handle_app_uninstalled(db: Session, merchant_id: str, data: dict):
     except Exception as e:
         logger.error(f"Error handling app uninstall: {str(e)}")
         db.rollback()
+        raise
 
 async def handle_product_created(db: Session, merchant_id: str, product_data: dict):
     """معالجة إنشاء منتج جديد"""
@@ -565,28 +634,9 @@ async def handle_product_created(db: Session, merchant_id: str, product_data: di
             logger.warning(f"Store not found for merchant: {merchant_id}")
             return
         
-        price_data = product_data.get("price", {})
-        category_data = product_data.get("category", {})
-        metadata = product_data.get("metadata", {})
-        
-        new_product = SallaProduct(
-            store_id=store.id,
-            salla_product_id=str(product_data.get("id", "")),
-            name=product_data.get("name", ""),
-            description=product_data.get("description", ""),
-            sku=product_data.get("sku", ""),
-            url_slug=product_data.get("url", ""),
-            price_amount=str(price_data.get("amount", 0)) if price_data else "0",
-            price_currency=price_data.get("currency", "SAR") if price_data else "SAR",
-            category_id=str(category_data.get("id", "")) if category_data else "",
-            category_name=category_data.get("name", "") if category_data else "",
-            images=product_data.get("images", []),
-            seo_title=metadata.get("title", "") if metadata else "",
-            seo_description=metadata.get("description", "") if metadata else "",
-            status=product_data.get("status", "sale"),
-            last_synced_at=datetime.utcnow(),
-            needs_update=False
-        )
+        product_info = build_product_info(store.id, product_data)
+        product_info["content_hash"] = compute_content_hash(product_info)
+        new_product = SallaProduct(**product_info)
         
         db.add(new_product)
         db.commit()
@@ -595,6 +645,52 @@ async def handle_product_created(db: Session, merchant_id: str, product_data: di
     except Exception as e:
         logger.error(f"Error handling product creation: {str(e)}")
         db.rollback()
+        raise
+
+def _apply_product_update(product: SallaProduct, product_data: dict) -> bool:
+    """دمج بيانات المنتج الواردة في السجل الموجود - يرجع False إذا لم يتغير شيء
+
+    الحقول غير الموجودة في البيانات الواردة تبقى كما هي، والبصمة تُحسب من السجل
+    بعد الدمج حتى تطابق ما كُتب فعلاً (وتقارنها المزامنة الكاملة لاحقاً).
+    """
+    price_data = product_data.get("price", {})
+    category_data = product_data.get("category", {})
+    metadata = product_data.get("metadata", {})
+    
+    merged = {field: getattr(product, field) for field in HASHED_FIELDS}
+    merged["name"] = product_data.get("name", product.name)
+    merged["description"] = product_data.get("description", product.description)
+    merged["sku"] = product_data.get("sku", product.sku)
+    merged["url_slug"] = product_data.get("url", product.url_slug)
+    
+    if price_data:
+        merged["price_amount"] = str(price_data.get("amount", product.price_amount))
+        merged["price_currency"] = price_data.get("currency", product.price_currency)
+    
+    if category_data:
+        merged["category_id"] = str(category_data.get("id", product.category_id))
+        merged["category_name"] = category_data.get("name", product.category_name)
+    
+    if "images" in product_data:
+        merged["images"] = product_data["images"]
+    
+    if metadata:
+        merged["seo_title"] = metadata.get("title", product.seo_title)
+        merged["seo_description"] = metadata.get("description", product.seo_description)
+    
+    # منتج محذوف لا يُعاد بتحديث (التحديث المؤجل للدمج قد يصل بعد حدث الحذف)
+    if product.status != "deleted":
+        merged["status"] = product_data.get("status", product.status)
+    
+    merged_hash = compute_content_hash(merged)
+    if product.content_hash == merged_hash:
+        return False
+    
+    for field, value in merged.items():
+        setattr(product, field, value)
+    product.last_synced_at = datetime.utcnow()
+    product.content_hash = merged_hash
+    return True
 
 async def handle_product_updated(db: Session, merchant_id: str, product_data: dict):
     """معالجة تحديث منتج"""
@@ -616,34 +712,9 @@ async def handle_product_updated(db: Session, merchant_id: str, product_data: di
             SallaProduct.salla_product_id == product_id
         ).first()
         
-        if product:
-            price_data = product_data.get("price", {})
-            category_data = product_data.get("category", {})
-            metadata = product_data.get("metadata", {})
-            
-            product.name = product_data.get("name", product.name)
-            product.description = product_data.get("description", product.description)
-            product.sku = product_data.get("sku", product.sku)
-            product.url_slug = product_data.get("url", product.url_slug)
-            
-            if price_data:
-                product.price_amount = str(price_data.get("amount", product.price_amount))
-                product.price_currency = price_data.get("currency", product.price_currency)
-            
-            if category_data:
-                product.category_id = str(category_data.get("id", product.category_id))
-                product.category_name = category_data.get("name", product.category_name)
-            
-            if "images" in product_data:
-                product.images = product_data["images"]
-            
-            if metadata:
-                product.seo_title = metadata.get("title", product.seo_title)
-                product.seo_description = metadata.get("description", product.seo_description)
-            
-            product.status = product_data.get("status", product.status)
-            product.last_synced_at = datetime.utcnow()
-            
+        if product and not _apply_product_update(product, product_data):
+            logger.info(f"Product unchanged, skipping update: {product.name}")
+        elif product:
             db.commit()
             logger.info(f"Product updated: {product.name}")
         else:
@@ -652,6 +723,46 @@ async def handle_product_updated(db: Session, merchant_id: str, product_data: di
     except Exception as e:
         logger.error(f"Error handling product update: {str(e)}")
         db.rollback()
+        raise
+
+async def handle_product_updates_batch(db: Session, merchant_id: str, products_data: List[dict]):
+    """معالجة دفعة تحديثات منتجات مدمجة لمتجر واحد في معاملة واحدة"""
+    store = db.query(SallaStore).filter(
+        SallaStore.store_id == merchant_id
+    ).first()
+    
+    if not store:
+        logger.warning(f"Store not found for merchant: {merchant_id}")
+        return
+    
+    incoming = {
+        str(product_data.get("id", "")): product_data
+        for product_data in products_data
+    }
+    
+    products = db.query(SallaProduct).filter(
+        SallaProduct.store_id == store.id,
+        SallaProduct.salla_product_id.in_(list(incoming.keys()))
+    ).all()
+    existing = {product.salla_product_id: product for product in products}
+    
+    counts = {"updated": 0, "created": 0, "unchanged": 0}
+    for product_id, product_data in incoming.items():
+        product = existing.get(product_id)
+        
+        if product is None:
+            product_info = build_product_info(store.id, product_data)
+            product_info["content_hash"] = compute_content_hash(product_info)
+            db.add(SallaProduct(**product_info))
+            counts["created"] += 1
+        elif _apply_product_update(product, product_data):
+            counts["updated"] += 1
+        else:
+            counts["unchanged"] += 1
+    
+    # الأخطاء تصل للصندوق ليعيد محاولة الدفعة كاملة
+    db.commit()
+    logger.info(f"✅ Coalesced product updates for {merchant_id}: {counts}")
 
 async def handle_product_deleted(db: Session, merchant_id: str, product_data: dict):
     """معالجة حذف منتج"""
@@ -681,6 +792,7 @@ async def handle_product_deleted(db: Session, merchant_id: str, product_data: di
     except Exception as e:
         logger.error(f"Error handling product deletion: {str(e)}")
         db.rollback()
+        raise
 
 async def handle_order_created(db: Session, merchant_id: str, order_data: dict):
     """معالجة إنشاء طلب جديد"""
@@ -691,6 +803,7 @@ async def handle_order_created(db: Session, merchant_id: str, order_data: dict):
         
     except Exception as e:
         logger.error(f"Error handling order creation: {str(e)}")
+        raise
 
 async def handle_order_updated(db: Session, merchant_id: str, order_data: dict):
     """معالجة تحديث طلب"""
@@ -702,51 +815,67 @@ async def handle_order_updated(db: Session, merchant_id: str, order_data: dict):
         
     except Exception as e:
         logger.error(f"Error handling order update: {str(e)}")
+        raise
+
+# تسجيل المعالجات في الصندوق الوارد
+webhook_inbox.register("app.installed", handle_app_installed)
+webhook_inbox.register("app.store.authorize", handle_app_store_authorize)
+webhook_inbox.register("app.uninstalled", handle_app_uninstalled)
+webhook_inbox.register("product.created", handle_product_created)
+webhook_inbox.register("product.updated", handle_product_updated)
+webhook_inbox.register("product.deleted", handle_product_deleted)
+webhook_inbox.register_batch("product.updated", handle_product_updates_batch)
+webhook_inbox.register("order.created", handle_order_created)
+webhook_inbox.register("order.updated", handle_order_updated)
 
 # ===== مهام مجدولة =====
 
-async def send_pending_reminder_emails(db: Session):
-    """إرسال إيميلات التذكير للمتاجر المعلقة"""
+async def send_pending_reminder_emails(db: Session, store_id: Optional[str] = None):
+    """إرسال إيميلات التذكير للمتاجر المعلقة (أو لمتجر واحد عند تمرير store_id)"""
     try:
         logger.info("Checking for pending stores needing reminder emails...")
         
-        pending_stores = db.query(PendingStore).filter(
+        query = db.query(PendingStore).filter(
             PendingStore.is_claimed == False,
             PendingStore.reminder_email_sent == False,
             PendingStore.welcome_email_sent == True,
             PendingStore.store_email.isnot(None),
             PendingStore.expires_at > datetime.utcnow()
-        ).all()
+        )
+        if store_id is not None:
+            query = query.filter(PendingStore.store_id == store_id)
+        pending_stores = query.all()
         
         reminder_count = 0
         
         for store in pending_stores:
             if store.should_send_reminder:
-                try:
-                    email_sent = await email_service.send_store_reminder_email(
-                        store_email=store.store_email,
-                        store_name=store.store_name,
-                        store_id=store.store_id,
-                        verification_token=store.verification_token,
-                        days_remaining=store.days_remaining
-                    )
-                    
-                    if email_sent:
-                        store.reminder_email_sent = True
-                        store.last_email_sent_at = datetime.utcnow()
-                        reminder_count += 1
-                        
-                except Exception as email_error:
-                    logger.error(f"Error sending reminder to {store.store_name}: {str(email_error)}")
-                    continue
+                email_outbox.enqueue(
+                    db,
+                    "store_reminder",
+                    recipient=store.store_email,
+                    entity_key=f"{store.store_id}:{store.verification_token}",
+                    context={
+                        "store_email": store.store_email,
+                        "store_name": store.store_name,
+                        "store_id": store.store_id,
+                        "verification_token": store.verification_token,
+                        "days_remaining": store.days_remaining
+                    }
+                )
+                store.reminder_email_sent = True
+                store.last_email_sent_at = datetime.utcnow()
+                reminder_count += 1
         
         if reminder_count > 0:
             db.commit()
-            logger.info(f"Sent {reminder_count} reminder emails")
+            logger.info(f"Queued {reminder_count} reminder emails")
         
     except Exception as e:
         logger.error(f"Error in reminder email task: {str(e)}")
         db.rollback()
+        # المهمة المؤجلة تُعاد لاحقاً بدلاً من اعتبارها منفذة
+        raise
 
 async def cleanup_expired_pending_stores(db: Session):
     """تنظيف المتاجر المؤقتة المنتهية الصلاحية"""
@@ -770,93 +899,180 @@ async def cleanup_expired_pending_stores(db: Session):
     except Exception as e:
         logger.error(f"Error in cleanup task: {str(e)}")
         db.rollback()
+        # المهمة المؤجلة تُعاد لاحقاً بدلاً من اعتبارها منفذة
+        raise
 
-async def schedule_reminder_task(merchant_id: str, delay_hours: int = 25):
-    """جدولة مهمة تذكير مؤجلة"""
-    await asyncio.sleep(delay_hours * 3600)
+def schedule_reminder_task(db: Session, merchant_id: str, delay_hours: int = 25):
+    """جدولة تذكير مؤجل للمتجر كمهمة محفوظة (لا تضيع مع إعادة النشر)"""
+    run_at = datetime.utcnow() + timedelta(hours=delay_hours)
+    delayed_jobs.schedule(
+        db,
+        "pending_store_reminder",
+        run_at=run_at,
+        payload={"merchant_id": merchant_id},
+        dedupe_key=f"pending_store_reminder:{merchant_id}:{run_at:%Y%m%d%H}"
+    )
+
+async def run_pending_store_reminder(db: Session, payload: dict):
+    await send_pending_reminder_emails(db, store_id=payload.get("merchant_id"))
+
+async def run_cleanup_expired_pending_stores(db: Session, payload: dict):
+    await cleanup_expired_pending_stores(db)
+
+delayed_jobs.register("pending_store_reminder", run_pending_store_reminder)
+delayed_jobs.register_recurring(
+    "cleanup_expired_pending_stores",
+    run_cleanup_expired_pending_stores,
+    every=timedelta(hours=CLEANUP_INTERVAL_HOURS)
+)
+
+def _start_sync_run(db: Session, store: SallaStore, parallel: bool) -> Optional[SallaSyncRun]:
+    """إنشاء تشغيل جديد أو استئناف آخر تشغيل لم يكتمل - يرجع None إذا كان هناك تشغيل نشط"""
+    now = datetime.utcnow()
+    last_run = db.query(SallaSyncRun).filter(
+        SallaSyncRun.store_id == store.id,
+        SallaSyncRun.status.in_(["running", "failed"])
+    ).order_by(SallaSyncRun.id.desc()).first()
     
+    if last_run:
+        if last_run.status == "running" and last_run.updated_at > now - SYNC_STALE_AFTER:
+            return None
+        
+        if last_run.started_at > now - SYNC_RESUME_MAX_AGE:
+            last_run.status = "running"
+            last_run.parallel = parallel
+            last_run.error = None
+            last_run.resumed_count = (last_run.resumed_count or 0) + 1
+            db.commit()
+            logger.info(f"🔄 Resuming sync run #{last_run.id} for store {store.store_name} after page {last_run.last_page}")
+            return last_run
+        
+        last_run.status = "abandoned"
+        last_run.finished_at = now
+    
+    run = SallaSyncRun(store_id=store.id, status="running", parallel=parallel, last_page=0)
+    db.add(run)
+    db.commit()
+    return run
+
+def _estimated_sync_pages(store_id: int) -> int:
+    """عدد الصفحات المتوقع للمتجر (تكلفة المزامنة في الطابور العادل)"""
+    db = SessionLocal()
     try:
-        from app.database import get_db
-        db = next(get_db())
-        await send_pending_reminder_emails(db)
-    except Exception as e:
-        logger.error(f"Error in scheduled reminder task: {str(e)}")
+        products_count = db.query(func.count(SallaProduct.id)).filter(SallaProduct.store_id == store_id).scalar() or 0
+    finally:
+        db.close()
+    return max(1, math.ceil(products_count / SYNC_PAGE_SIZE))
 
-async def sync_products_task(db: Session, store: SallaStore):
-    """مهمة مزامنة المنتجات"""
+async def sync_products_task(store_id: int, parallel: bool = True):
+    """مهمة مزامنة المنتجات عبر الطابور العادل بين المتاجر
+
+    المزامنات تنتظر slot من sync_fair_queue بتكلفة تساوي عدد صفحات المتجر،
+    فالمتاجر الصغيرة لا تنتظر خلف مزامنة متجر كبير.
+    """
+    async with sync_fair_queue.slot(store_id, cost=_estimated_sync_pages(store_id)):
+        return await _sync_store_products(store_id, parallel)
+
+async def _sync_store_products(store_id: int, parallel: bool = True):
+    """مزامنة منتجات متجر واحد
+
+    في الوضع المتوازي تُقرأ عدد الصفحات من أول صفحة ثم تُجلب بقية الصفحات
+    بالتوازي (حسب sync_concurrency للمتجر)، مع تطبيق النتائج بترتيب الصفحات.
+    الجلب والتطبيع والكتابة مراحل منفصلة بطوابير محدودة (ذاكرة ثابتة).
+    كل صفحة تُحفظ مع نقطة الاستئناف في commit واحد، والتشغيل المنقطع يُكمل
+    من آخر صفحة محفوظة. ترجع عدد المنتجات الجديدة والمتغيرة وغير المتغيرة.
+    """
+    counts = {"new": 0, "changed": 0, "unchanged": 0}
+    db = SessionLocal()
+    run = None
     try:
-        logger.info(f"Starting product sync for store: {store.store_name}")
+        store = db.query(SallaStore).filter(SallaStore.id == store_id).first()
+        if not store:
+            logger.warning(f"Store not found for sync: {store_id}")
+            return counts
+        
+        run = _start_sync_run(db, store, parallel)
+        if run is None:
+            logger.info(f"Sync already running for store: {store.store_name}")
+            return counts
+        
+        concurrency = (store.sync_concurrency or SYNC_CONCURRENCY) if parallel else 1
+        logger.info(f"Starting product sync for store: {store.store_name} (concurrency={concurrency}, page={run.last_page + 1})")
+        
+        def checkpoint(page: int, total_pages: Optional[int], result: dict):
+            # نقطة الاستئناف تُحفظ في نفس المعاملة مع منتجات الصفحة
+            run.last_page = page
+            run.total_pages = total_pages or run.total_pages
+            run.products_new = (run.products_new or 0) + result["new"]
+            run.products_changed = (run.products_changed or 0) + result["changed"]
+            run.products_unchanged = (run.products_unchanged or 0) + result["unchanged"]
+            run.updated_at = datetime.utcnow()
+            db.commit()
+            pages_written.append(page)
+        
+        def fetch_stopped(page: int, products_data: dict):
+            fetch_error["page"] = page
+            fetch_error["error"] = str(products_data.get("error_description") or products_data.get("error") or "request failed")
+        
+        pages_written: List[int] = []
+        fetch_error: dict = {}
+        counts = await sync_pipeline.run(
+            db,
+            store,
+            per_page=SYNC_PAGE_SIZE,
+            concurrency=concurrency,
+            start_page=run.last_page + 1,
+            on_batch=checkpoint,
+            keep=(store, run),
+            on_fetch_stop=fetch_stopped
+        )
         
-        page = 1
-        total_synced = 0
+        # لم تُجلب أي صفحة بسبب خطأ (رمز منتهي أو خطأ من سلة) - لا تُعتبر مزامنة ناجحة
+        if fetch_error and not pages_written and run.last_page == 0:
+            run.status = "failed"
+            run.error = f"page {fetch_error['page']} fetch failed: {fetch_error['error']}"[:2000]
+            run.finished_at = datetime.utcnow()
+            db.commit()
+            logger.warning(f"⚠️ Product sync for {store.store_name} failed: {run.error}")
+            return counts
         
-        while True:
-            products_data = await salla_service.get_products(
-                store.access_token, 
-                page=page, 
-                per_page=20
-            )
-            
-            if not products_data.get("data"):
-                break
-            
-            for product_data in products_data["data"]:
-                try:
-                    existing_product = db.query(SallaProduct).filter(
-                        SallaProduct.store_id == store.id,
-                        SallaProduct.salla_product_id == str(product_data["id"])
-                    ).first()
-                    
-                    price_data = product_data.get("price", {})
-                    category_data = product_data.get("category", {})
-                    metadata = product_data.get("metadata", {})
-                    
-                    product_info = {
-                        "store_id": store.id,
-                        "salla_product_id": str(product_data["id"]),
-                        "name": product_data.get("name", ""),
-                        "description": product_data.get("description", ""),
-                        "sku": product_data.get("sku", ""),
-                        "url_slug": product_data.get("url", ""),
-                        "price_amount": str(price_data.get("amount", 0)) if price_data else "0",
-                        "price_currency": price_data.get("currency", "SAR") if price_data else "SAR",
-                        "category_id": str(category_data.get("id", "")) if category_data else "",
-                        "category_name": category_data.get("name", "") if category_data else "",
-                        "images": product_data.get("images", []),
-                        "seo_title": metadata.get("title", "") if metadata else "",
-                        "seo_description": metadata.get("description", "") if metadata else "",
-                        "status": product_data.get("status", "sale"),
-                        "last_synced_at": datetime.utcnow(),
-                        "needs_update": False
-                    }
-                    
-                    if existing_product:
-                        for key, value in product_info.items():
-                            if key != "store_id":
-                                setattr(existing_product, key, value)
-                    else:
-                        new_product = SallaProduct(**product_info)
-                        db.add(new_product)
-                    
-                    total_synced += 1
-                    
-                except Exception as product_error:
-                    logger.error(f"Error processing product {product_data.get('id')}: {product_error}")
-                    continue
-            
-            page += 1
-            pagination = products_data.get("pagination", {})
-            if page > pagination.get("totalPages", 1):
-                break
+        # صفحة فشل جلبها توقف الجلب - يبقى التشغيل قابلاً للاستئناف منها
+        if fetch_error:
+            run.status = "failed"
+            run.error = f"stopped after page {run.last_page} of {run.total_pages or '?'}: {fetch_error['error']}"[:2000]
+            db.commit()
+            logger.warning(f"⚠️ Product sync for {store.store_name} {run.error}, will resume on next sync")
+            return counts
+        
+        # صفحة فارغة بدون خطأ نهاية الكتالوج - تقلّص عدد المنتجات منذ بداية التشغيل
+        if run.total_pages and run.last_page < run.total_pages:
+            logger.info(f"Catalogue for {store.store_name} shrank to {run.last_page} of {run.total_pages} pages")
+            run.total_pages = run.last_page
         
         store.last_sync_at = datetime.utcnow()
+        run.status = "completed"
+        run.finished_at = datetime.utcnow()
         db.commit()
         
-        logger.info(f"Product sync completed - {total_synced} products synced")
+        logger.info(
+            f"Product sync completed - {counts['new']} new, {counts['changed']} changed, "
+            f"{counts['unchanged']} unchanged"
+        )
         
     except Exception as e:
         logger.error(f"Error in product sync: {str(e)}")
         db.rollback()
+        if run is not None:
+            run.status = "failed"
+            run.error = str(e)[:2000]
+            db.commit()
+    finally:
+        db.close()
+    
+    return counts
+
+# المزامنة الدورية تستخدم نفس مهمة المزامنة اليدوية
+auto_sync_scheduler.register(sync_products_task)
 
 def verify_salla_signature(payload: bytes, signature: str) -> bool:
     """التحقق من صحة webhook signature"""
@@ -7,12 +7,15 @@ from datetime import datetime
 import logging
 from pydantic import BaseModel
 
-from app.database import get_db
+from app.database import get_db, SessionLocal
 from app.models.user import User
 from app.models.salla import SallaStore, SallaProduct
 from app.routers.auth import get_current_user
 from app.services.salla_api import SallaAPIService
 from app.services.ai_service import AIService
+from app.services.bulk_optimizer import BulkOptimizer
+from app.services.seo_scorer import seo_scorer
+from app.services.salla_push_service import salla_push_service, build_seo_payload
 
 # إعداد logging
 logger = logging.getLogger(__name__)
@@ -21,6 +24,7 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/products", tags=["products"])
 salla_service = SallaAPIService()
 ai_service = AIService()
+bulk_optimizer = BulkOptimizer(ai_service)
 
 # ===== Pydantic Models =====
 
@@ -318,7 +322,8 @@ async def update_product_seo(
             update_product_in_salla,
             product.store.access_token,
             product.salla_product_id,
-            seo_data.dict()
+            seo_data.dict(),
+            product.store
         )
         
         return {
@@ -349,19 +354,22 @@ async def bulk_product_operation(
     if len(products) != len(request.product_ids):
         raise HTTPException(status_code=400, detail="بعض المنتجات غير موجودة أو لا تملك صلاحية الوصول إليها")
     
+    job = None
     if request.operation == "analyze":
-        # جدولة تحليل SEO للمنتجات
-        background_tasks.add_task(bulk_analyze_products, products, db)
+        # جدولة تحليل SEO للمنتجات (حساب جماعي بجلسة مستقلة)
+        background_tasks.add_task(bulk_analyze_products, [product.id for product in products])
         message = f"بدأ تحليل SEO لـ {len(products)} منتج"
         
     elif request.operation == "optimize":
-        # جدولة تحسين SEO بالذكاء الاصطناعي
-        background_tasks.add_task(bulk_optimize_products, products, db)
+        # جدولة تحسين SEO بالذكاء الاصطناعي (بجلسات مستقلة وحفظ تدريجي)
+        job = bulk_optimizer.create_job(current_user.id, "optimize", [product.id for product in products])
+        background_tasks.add_task(bulk_optimize_products, [product.id for product in products], job["job_id"])
         message = f"بدأ تحسين SEO لـ {len(products)} منتج"
         
     elif request.operation == "sync":
-        # جدولة مزامنة مع سلة
-        background_tasks.add_task(bulk_sync_products, products, db)
+        # جدولة مزامنة مع سلة (النتيجة لكل منتج تُحفظ في سجل العملية)
+        job = bulk_optimizer.create_job(current_user.id, "sync", [product.id for product in products])
+        background_tasks.add_task(bulk_sync_products, [product.id for product in products], job["job_id"])
         message = f"بدأت مزامنة {len(products)} منتج مع سلة"
         
     else:
@@ -370,7 +378,23 @@ async def bulk_product_operation(
     return {
         "success": True,
         "message": message,
-        "products_count": len(products)
+        "products_count": len(products),
+        "job_id": job["job_id"] if job else None
+    }
+
+@router.get("/bulk-operation/{job_id}")
+async def get_bulk_operation_progress(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """تقدم عملية جماعية"""
+    job = bulk_optimizer.get_job(job_id)
+    if not job or job["user_id"] != current_user.id:
+        raise HTTPException(status_code=404, detail="العملية غير موجودة")
+    
+    return {
+        **{key: value for key, value in job.items() if key != "user_id"},
+        "progress": round(job["processed"] / job["total"] * 100, 1) if job["total"] else 100.0
     }
 
 @router.get("/stats/overview")
@@ -420,23 +444,14 @@ async def get_products_stats(
 
 # ===== مهام الخلفية =====
 
-async def update_product_in_salla(access_token: str, product_id: str, seo_data: dict):
+async def update_product_in_salla(access_token: str, product_id: str, seo_data: dict, store: Optional[SallaStore] = None):
     """تحديث المنتج في سلة"""
     try:
         # إعداد البيانات للتحديث في سلة
-        update_data = {
-            "metadata": {
-                "title": seo_data.get("seo_title"),
-                "description": seo_data.get("seo_description")
-            }
-        }
-        
-        # إضافة الكلمات المفتاحية إذا وجدت
-        if seo_data.get("keywords"):
-            update_data["tags"] = seo_data["keywords"]
+        update_data = build_seo_payload(seo_data)
         
         # استدعاء API سلة
-        result = await salla_service.update_product(access_token, product_id, update_data)
+        result = await salla_service.update_product(access_token, product_id, update_data, store=store)
         
         if result.get("status") == 200:
             logger.info(f"Product {product_id} updated successfully in Salla")
@@ -446,69 +461,44 @@ async def update_product_in_salla(access_token: str, product_id: str, seo_data:
     except Exception as e:
         logger.error(f"Error updating product in Salla: {str(e)}")
 
-async def bulk_analyze_products(products: List[SallaProduct], db: Session):
-    """تحليل SEO لمجموعة منتجات"""
+def bulk_analyze_products(product_ids: List[int]):
+    """تحليل SEO لمجموعة منتجات (حساب عمودي وتحديث جماعي بدون تحميل كائنات ORM)"""
+    db = SessionLocal()
     try:
-        for product in products:
-            analysis = ai_service.analyze_product_seo(product)
-            product.seo_score = analysis["score"]
-            product.optimization_status = "analyzed"
-        
-        db.commit()
-        logger.info(f"Analyzed SEO for {len(products)} products")
+        analyzed = seo_scorer.rescore(db, product_ids=product_ids)
+        logger.info(f"Analyzed SEO for {analyzed} products")
         
     except Exception as e:
         logger.error(f"Error in bulk analysis: {str(e)}")
         db.rollback()
+    finally:
+        db.close()
 
-async def bulk_optimize_products(products: List[SallaProduct], db: Session):
-    """تحسين SEO لمجموعة منتجات بالذكاء الاصطناعي"""
+async def bulk_optimize_products(product_ids: List[int], job_id: Optional[str] = None):
+    """تحسين SEO لمجموعة منتجات بالذكاء الاصطناعي (طلبات مجمعة متوازية مع حفظ كل دفعة)"""
     try:
-        for product in products:
-            optimized_data = await ai_service.optimize_product_seo(product)
-            
-            product.seo_title = optimized_data["seo_title"]
-            product.seo_description = optimized_data["seo_description"]
-            product.optimization_status = "optimized"
-            product.needs_update = True
-        
-        db.commit()
-        logger.info(f"Optimized SEO for {len(products)} products")
+        job = bulk_optimizer.get_job(job_id) if job_id else None
+        job = await bulk_optimizer.run(product_ids, job)
+        logger.info(f"Optimized SEO for {job['optimized']} of {job['total']} products")
+        return job
         
     except Exception as e:
         logger.error(f"Error in bulk optimization: {str(e)}")
-        db.rollback()
 
-async def bulk_sync_products(products: List[SallaProduct], db: Session):
-    """مزامنة مجموعة منتجات مع سلة"""
+async def bulk_sync_products(product_ids: List[int], job_id: Optional[str] = None):
+    """مزامنة مجموعة منتجات مع سلة (دفع متوازٍ لكل متجر مع حفظ كل منتج فور نجاحه)"""
+    job = bulk_optimizer.get_job(job_id) if job_id else None
     try:
-        # تجميع المنتجات حسب المتجر
-        stores_products = {}
-        for product in products:
-            if product.store_id not in stores_products:
-                stores_products[product.store_id] = []
-            stores_products[product.store_id].append(product)
-        
-        # مزامنة كل متجر
-        for store_id, store_products in stores_products.items():
-            store = db.query(SallaStore).filter(SallaStore.id == store_id).first()
-            if store and store.access_token:
-                for product in store_products:
-                    if product.needs_update:
-                        await update_product_in_salla(
-                            store.access_token,
-                            product.salla_product_id,
-                            {
-                                "seo_title": product.seo_title,
-                                "seo_description": product.seo_description
-                            }
-                        )
-                        product.needs_update = False
-                        product.last_synced_at = datetime.utcnow()
+        summary = await salla_push_service.push_products(product_ids, job)
         
-        db.commit()
-        logger.info(f"Synced {len(products)} products with Salla")
+        failed = [result for result in summary["results"] if result["status"] == "failed"]
+        if failed:
+            logger.warning(f"⚠️ {len(failed)} products failed to sync with Salla: {failed[:20]}")
+        
+        logger.info(f"Synced {summary['pushed']} of {summary['total']} products with Salla")
+        return summary
         
     except Exception as e:
         logger.error(f"Error in bulk sync: {str(e)}")
-        db.rollback()
\ No newline at end of file
+        if job is not None:
+            job.update({"status": "failed", "error": str(e)[:500], "finished_at": datetime.utcnow()})
@@ -0,0 +1,148 @@
+# app/scripts/bench_ai_generate.py
+"""
+اختبار حمل لـ /api/ai/generate: زمن استجابة /health أثناء تشغيل عمليات توليد متزامنة
+مع العميل غير المتزامن يجب أن يبقى p99 لـ /health قريباً من القيمة بدون حمل
+
+الاستخدام:
+    python -m app.scripts.bench_ai_generate --generations 20 --latency 2 --stream
+    python -m app.scripts.bench_ai_generate --blocking --generations 4 --latency 1   # محاكاة العميل المتزامن القديم (بطيء)
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+import tempfile
+import time
+from types import SimpleNamespace
+
+# قاعدة بيانات مؤقتة وإعدادات وهمية قبل استيراد التطبيق
+_db_file = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_file.name}"
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("ZOHO_EMAIL_USERNAME", "bench@example.com")
+os.environ.setdefault("ZOHO_EMAIL_PASSWORD", "bench")
+
+import httpx  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.routers import ai  # noqa: E402
+from app.routers.auth import get_current_user  # noqa: E402
+
+
+class FakeCompletions:
+    """يحاكي زمن OpenAI - بـ sleep غير متزامن أو متزامن (يوقف الـ event loop)"""
+
+    def __init__(self, latency: float, chunks: int, blocking: bool):
+        self.latency = latency
+        self.chunks = chunks
+        self.blocking = blocking
+
+    async def _wait(self, seconds: float):
+        if self.blocking:
+            time.sleep(seconds)
+        else:
+            await asyncio.sleep(seconds)
+
+    async def create(self, stream: bool = False, **kwargs):
+        if stream:
+            return self._stream()
+        await self._wait(self.latency)
+        message = SimpleNamespace(content="نص تجريبي " * self.chunks)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    async def _stream(self):
+        for _ in range(self.chunks):
+            await self._wait(self.latency / self.chunks)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content="نص "))])
+
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+async def probe_health(client: httpx.AsyncClient, duration: float, interval: float):
+    """الزمن من موعد الطلب المجدول حتى وصول الرد (يشمل تأخر الـ event loop في بدء الطلب)"""
+    latencies = []
+    deadline = time.perf_counter() + duration
+    scheduled = time.perf_counter()
+    while scheduled < deadline:
+        await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+        response = await client.get("/health")
+        response.raise_for_status()
+        finished = time.perf_counter()
+        latencies.append((finished - scheduled) * 1000)
+        scheduled = finished + interval
+    return latencies
+
+
+async def generate_loop(client: httpx.AsyncClient, stream: bool, stop: asyncio.Event, counter: list):
+    while not stop.is_set():
+        response = await client.post("/api/ai/generate", json={"prompt": "اكتب وصفاً", "stream": stream})
+        response.raise_for_status()
+        counter[0] += 1
+
+
+def report(label: str, latencies) -> str:
+    return (
+        f"{label:<28} n={len(latencies):<5} p50={statistics.median(latencies):7.2f}ms "
+        f"p95={percentile(latencies, 0.95):7.2f}ms p99={percentile(latencies, 0.99):7.2f}ms "
+        f"max={max(latencies):7.2f}ms"
+    )
+
+
+async def run(args):
+    ai.client = SimpleNamespace(chat=SimpleNamespace(
+        completions=FakeCompletions(args.latency, args.chunks, args.blocking)
+    ))
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(id=1, email="bench@example.com")
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        baseline = await probe_health(client, args.duration / 2, args.interval)
+
+        stop = asyncio.Event()
+        counter = [0]
+        generators = [
+            asyncio.create_task(generate_loop(client, args.stream, stop, counter))
+            for _ in range(args.generations)
+        ]
+        await asyncio.sleep(0.1)
+        loaded = await probe_health(client, args.duration, args.interval)
+        stop.set()
+        await asyncio.gather(*generators)
+
+    mode = "blocking client" if args.blocking else "async client"
+    return [
+        f"{mode}, {args.generations} concurrent generations ({'stream' if args.stream else 'json'}), "
+        f"{counter[0]} completed",
+        report("/health without load", baseline),
+        report("/health during generation", loaded),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--generations", type=int, default=20, help="عدد عمليات التوليد المتزامنة")
+    parser.add_argument("--latency", type=float, default=2.0, help="زمن كل عملية توليد (ثوانٍ)")
+    parser.add_argument("--chunks", type=int, default=20, help="عدد الأجزاء في وضع البث")
+    parser.add_argument("--duration", type=float, default=6.0)
+    parser.add_argument("--interval", type=float, default=0.01)
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--blocking", action="store_true")
+    args = parser.parse_args()
+
+    # طباعة الطلبات من middleware التطبيق تُخفى أثناء القياس
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            lines = asyncio.run(run(args))
+    finally:
+        os.unlink(_db_file.name)
+    print("\n".join(lines))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+# app/scripts/bench_ai_pipeline.py
+"""
+قياس أداء مسارات AI مقابل بديل OpenAI المحلي (app/scripts/openai_stub.py)
+يقيس optimize_product_seo و generate_product_description و bulk_optimize_products
+ويعرض الإنتاجية و p50/p99 لزمن كل استدعاء وعدد إعادة المحاولات
+
+الاستخدام:
+    python -m app.scripts.bench_ai_pipeline --calls 200 --concurrency 1 8 32
+    python -m app.scripts.bench_ai_pipeline --products 500 --bulk-concurrency 2 4 8 --batch-sizes 1 5 10 \\
+        --latency 0.8 --error-rate 0.02 --rate-limit 300 --window 10
+    python -m app.scripts.bench_ai_pipeline --base-url http://127.0.0.1:8099/v1   # خادم stub خارجي (الأخطاء في /stats)
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import List
+
+# قاعدة بيانات مؤقتة وإعدادات وهمية قبل استيراد التطبيق
+_db_file = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_file.name}"
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("ZOHO_EMAIL_USERNAME", "bench@example.com")
+os.environ.setdefault("ZOHO_EMAIL_PASSWORD", "bench")
+# الكاش يُلغى حتى يصل كل استدعاء للـ stub
+os.environ["AI_CACHE_ENABLED"] = "false"
+
+import httpx  # noqa: E402
+from openai import AsyncOpenAI  # noqa: E402
+
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.models.salla import SallaStore, SallaProduct  # noqa: E402
+from app.models import points  # noqa: E402,F401
+from app.routers.salla_products import ai_service, bulk_optimizer, bulk_optimize_products  # noqa: E402
+from app.scripts.openai_stub import OpenAIStub  # noqa: E402
+
+
+class TimedCompletions:
+    """يغلف chat.completions لقياس زمن كل استدعاء منطقي (شاملاً إعادة محاولات الـ SDK)"""
+
+    def __init__(self, completions):
+        self.completions = completions
+        self.latencies: List[float] = []
+
+    async def create(self, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await self.completions.create(**kwargs)
+        finally:
+            self.latencies.append((time.perf_counter() - started) * 1000)
+
+
+def make_client(args, stub: OpenAIStub) -> AsyncOpenAI:
+    if args.base_url:
+        client = AsyncOpenAI(api_key="bench", base_url=args.base_url, max_retries=args.max_retries)
+    else:
+        client = AsyncOpenAI(
+            api_key="bench",
+            base_url="http://openai-stub/v1",
+            max_retries=args.max_retries,
+            http_client=httpx.AsyncClient(transport=stub.transport()),
+        )
+    return client
+
+
+def make_product(index: int) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=index,
+        name=f"منتج تجريبي رقم {index}",
+        description=f"<p>وصف المنتج رقم {index} بجودة عالية.</p><p>شحن سريع وضمان أصلي.</p>" * 5,
+        category_name=f"تصنيف {index % 12}",
+        price_amount=100 + index % 50,
+        price_currency="SAR",
+    )
+
+
+def seed_products(count: int) -> List[int]:
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        user = User(full_name="Bench", email=f"bench-{time.time_ns()}@example.com", password="x")
+        db.add(user)
+        db.commit()
+        store = SallaStore(user_id=user.id, store_id=f"bench-{user.id}", store_name="Bench", access_token="token")
+        db.add(store)
+        db.commit()
+        for index in range(count):
+            product = make_product(index)
+            db.add(SallaProduct(
+                store_id=store.id,
+                salla_product_id=str(100000 + index),
+                name=product.name,
+                description=product.description,
+                category_name=product.category_name,
+                price_amount=product.price_amount,
+                price_currency=product.price_currency,
+            ))
+        db.commit()
+        return [row.id for row in db.query(SallaProduct.id).filter(SallaProduct.store_id == store.id)]
+    finally:
+        db.close()
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))] if ordered else 0.0
+
+
+def report(label: str, calls: int, elapsed: float, timed: TimedCompletions, stub: OpenAIStub, unit: str = "calls"):
+    latencies = timed.latencies
+    # كل طلب HTTP زائد عن الاستدعاءات المنطقية هو إعادة محاولة من الـ SDK
+    retries = stub.requests - len(latencies) if stub.requests else None
+    print(
+        f"{label:<44} {calls / elapsed:8.1f} {unit}/s  "
+        f"p50={statistics.median(latencies) if latencies else 0:8.1f}ms  p99={percentile(latencies, 0.99):8.1f}ms  "
+        f"requests={len(latencies):<5} retries={retries if retries is not None else '-'}  "
+        f"errors={stub.errors} throttled={stub.throttled}"
+    )
+
+
+async def run_calls(label: str, fn, items: List, concurrency: int, timed: TimedCompletions, stub: OpenAIStub):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(item):
+        async with semaphore:
+            await fn(item)
+
+    timed.latencies.clear()
+    stub.reset_counters()
+    started = time.perf_counter()
+    await asyncio.gather(*(one(item) for item in items))
+    report(f"{label} (concurrency={concurrency})", len(items), time.perf_counter() - started, timed, stub)
+
+
+async def run(args):
+    stub = OpenAIStub(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        window=args.window,
+    )
+    client = make_client(args, stub)
+    timed = TimedCompletions(client.chat.completions)
+    ai_service.client = SimpleNamespace(chat=SimpleNamespace(completions=timed))
+    try:
+        products = [make_product(index) for index in range(args.calls)]
+        for concurrency in args.concurrency:
+            await run_calls("optimize_product_seo", ai_service.optimize_product_seo, products, concurrency, timed, stub)
+        for concurrency in args.concurrency:
+            await run_calls(
+                "generate_product_description",
+                ai_service.generate_product_description,
+                [{"name": product.name, "category": product.category_name, "features": product.description} for product in products],
+                concurrency,
+                timed,
+                stub,
+            )
+
+        product_ids = seed_products(args.products)
+        for batch_size in args.batch_sizes:
+            for concurrency in args.bulk_concurrency:
+                ai_service.batch_size = batch_size
+                bulk_optimizer.concurrency = concurrency
+                timed.latencies.clear()
+                stub.reset_counters()
+                fallback_before = ai_service.get_metrics()["fallback_items"]
+
+                started = time.perf_counter()
+                job = await bulk_optimize_products(product_ids)
+                elapsed = time.perf_counter() - started
+
+                report(f"bulk_optimize (batch={batch_size}, concurrency={concurrency})", job["total"], elapsed, timed, stub,
+                       unit="products")
+                fallbacks = ai_service.get_metrics()["fallback_items"] - fallback_before
+                print(f"{'':<44} optimized={job['optimized']} failed={job['failed']} fallback_items={fallbacks}")
+    finally:
+        await client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=100, help="عدد الاستدعاءات المنفردة لكل سيناريو")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--products", type=int, default=200, help="عدد المنتجات في التحسين الجماعي")
+    parser.add_argument("--bulk-concurrency", type=int, nargs="+", default=[4])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, default=None, help="طلبات لكل نافذة في الـ stub")
+    parser.add_argument("--window", type=float, default=60.0)
+    parser.add_argument("--max-retries", type=int, default=2)
+    parser.add_argument("--base-url", default=None, help="خادم stub خارجي بدلاً من transport داخلي")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run(args))
+    finally:
+        os.unlink(_db_file.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# app/scripts/bench_email_templates.py
+"""
+قياس عدد مرات عرض قوالب الإيميل في الثانية
+يقارن الطريقة القديمة (قراءة الملف + Template جديد لكل إيميل) بالقوالب المترجمة المحفوظة
+
+الاستخدام:
+    python -m app.scripts.bench_email_templates --seconds 2
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+# إعدادات وهمية قبل استيراد خدمة الإيميل
+os.environ.setdefault("ZOHO_EMAIL_USERNAME", "bench@example.com")
+os.environ.setdefault("ZOHO_EMAIL_PASSWORD", "bench")
+
+from jinja2 import Template  # noqa: E402
+
+from app.services.email_service import ZohoEmailService  # noqa: E402
+
+
+def sample_variables() -> dict:
+    return {
+        'header_title': '🎉 Bench Store connected successfully',
+        'content': "<h2>Bench</h2>" + "<p>Product line</p>" * 40,
+    }
+
+
+def measure(label: str, render, seconds: float) -> float:
+    render()  # تسخين
+    count = 0
+    started = time.perf_counter()
+    deadline = started + seconds
+    while time.perf_counter() < deadline:
+        render()
+        count += 1
+    rate = count / (time.perf_counter() - started)
+    print(f"{label:<40} {rate:>12,.0f} renders/sec")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--bytecode-cache", action="store_true", help="تفعيل FileSystemBytecodeCache")
+    args = parser.parse_args()
+
+    if args.bytecode_cache:
+        os.environ["EMAIL_TEMPLATE_BYTECODE_CACHE_DIR"] = tempfile.mkdtemp(prefix="email-bytecode-")
+
+    service = ZohoEmailService()
+    service.templates_dir = Path(tempfile.mkdtemp(prefix="email-templates-"))
+    service.jinja_env.loader.searchpath = [str(service.templates_dir)]
+    # قالب حقيقي على القرص حتى يُقاس FileSystemLoader مع فحص mtime (وليس الرجوع للقالب الافتراضي)
+    template_path = service.templates_dir / "store_connected.html"
+    template_path.write_text(
+        service.get_default_template().replace("<body>", "<body>\n<!-- store_connected -->", 1), encoding="utf-8"
+    )
+
+    def legacy(template_name):
+        def render():
+            template_content = service.load_template(template_name)
+            variables = sample_variables()
+            variables.update(service._template_defaults())
+            return Template(template_content).render(**variables)
+        return render
+
+    def legacy_default():
+        variables = sample_variables()
+        variables.update(service._template_defaults())
+        return Template(service.get_default_template()).render(**variables)
+
+    def cached(template_name):
+        return lambda: service.render_email(template_name, sample_variables())
+
+    def cached_default():
+        variables = sample_variables()
+        variables.update(service._template_defaults())
+        return service.get_default_compiled_template().render(**variables)
+
+    assert service.get_template("store_connected").filename == str(template_path)
+    assert "<!-- store_connected -->" in cached("store_connected")()
+    assert legacy("store_connected")() == cached("store_connected")()
+
+    results = [
+        (
+            "store_connected",
+            measure("store_connected (read + compile)", legacy("store_connected"), args.seconds),
+            measure("store_connected (compiled cache)", cached("store_connected"), args.seconds),
+        ),
+        (
+            "default",
+            measure("default (compile per render)", legacy_default, args.seconds),
+            measure("default (compiled once)", cached_default, args.seconds),
+        ),
+    ]
+
+    print()
+    for name, before, after in results:
+        print(f"{name:<20} speedup x{after / before:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# app/scripts/bench_salla_sync.py
+"""
+قياس سرعة مزامنة المنتجات (صفحات/ثانية) مقابل بديل سلة المحلي
+
+الاستخدام:
+    python -m app.scripts.bench_salla_sync --products 2000 --latency 0.08
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+# قاعدة بيانات مؤقتة وإعدادات وهمية قبل استيراد التطبيق
+_db_file = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_file.name}"
+os.environ.setdefault("ZOHO_EMAIL_USERNAME", "bench@example.com")
+os.environ.setdefault("ZOHO_EMAIL_PASSWORD", "bench")
+# البديل المحلي هنا لا يفرض حصة، فلا نقيّد العميل بالحصة الافتراضية
+os.environ.setdefault("SALLA_RATE_LIMIT_PER_MINUTE", "1000000")
+
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.models.salla import SallaStore, SallaProduct  # noqa: E402
+from app.models import points  # noqa: E402,F401
+from app.routers.salla import SYNC_PAGE_SIZE, sync_products_task  # noqa: E402
+from app.services.salla_api import salla_http  # noqa: E402
+from app.scripts.salla_stub import SallaStub  # noqa: E402
+
+
+def create_store(db) -> SallaStore:
+    user = User(full_name="Bench", email="bench@example.com", password="x")
+    db.add(user)
+    db.commit()
+    store = SallaStore(user_id=user.id, store_id="bench-store", store_name="Bench", access_token="token")
+    db.add(store)
+    db.commit()
+    return store
+
+
+async def run_case(stub: SallaStub, store: SallaStore, parallel: bool, concurrency: int) -> float:
+    db = SessionLocal()
+    try:
+        db.query(SallaProduct).delete()
+        db.commit()
+        store = db.merge(store)
+        store.sync_concurrency = concurrency
+        db.commit()
+
+        stub.requests = 0
+        stub.max_in_flight = 0
+        await salla_http.startup(transport=stub.transport())
+
+        started = time.perf_counter()
+        await sync_products_task(store.id, parallel=parallel)
+        elapsed = time.perf_counter() - started
+
+        await salla_http.shutdown()
+        synced = db.query(SallaProduct).count()
+        assert synced == stub.total_products, f"expected {stub.total_products} products, got {synced}"
+        return elapsed
+    finally:
+        db.close()
+
+
+async def main(products: int, latency: float, concurrency_levels):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    store = create_store(db)
+    db.close()
+
+    stub = SallaStub(total_products=products, latency=latency)
+    pages = (products + SYNC_PAGE_SIZE - 1) // SYNC_PAGE_SIZE
+    print(f"📦 {products} products, {pages} pages, {latency * 1000:.0f}ms latency per request\n")
+
+    baseline = await run_case(stub, store, parallel=False, concurrency=1)
+    print(f"{'sequential':<16} {baseline:7.2f}s {pages / baseline:8.1f} pages/s")
+
+    for concurrency in concurrency_levels:
+        elapsed = await run_case(stub, store, parallel=True, concurrency=concurrency)
+        print(
+            f"{'parallel x' + str(concurrency):<16} {elapsed:7.2f}s {pages / elapsed:8.1f} pages/s "
+            f"({baseline / elapsed:4.1f}x, max in flight {stub.max_in_flight})"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark Salla product sync")
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.08)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[2, 4, 8])
+    args = parser.parse_args()
+    try:
+        asyncio.run(main(args.products, args.latency, args.concurrency))
+    finally:
+        os.unlink(_db_file.name)
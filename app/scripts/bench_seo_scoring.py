@@ -0,0 +1,152 @@
+# app/scripts/bench_seo_scoring.py
+"""
+قياس إعادة حساب seo_score لكتالوج كبير: الطريقة القديمة (كائنات ORM + analyze_product_seo
+لكل منتج) مقابل SEOBatchScorer (أعمدة + NumPy + UPDATE جماعي)
+يتحقق أيضاً من أن النقاط متطابقة تماماً لكل منتج
+
+الاستخدام:
+    python -m app.scripts.bench_seo_scoring --products 100000
+    python -m app.scripts.bench_seo_scoring --products 100000 --legacy-limit 20000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+# قاعدة بيانات مؤقتة وإعدادات وهمية قبل استيراد التطبيق
+_db_file = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_file.name}"
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+from sqlalchemy import insert, select  # noqa: E402
+
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.models.salla import SallaStore, SallaProduct  # noqa: E402
+from app.models import points  # noqa: E402,F401
+from app.services.ai_service import AIService  # noqa: E402
+from app.services.seo_scorer import seo_scorer  # noqa: E402
+
+WORDS = ["جودة", "عالية", "ضمان", "أصلي", "شحن", "سريع", "قطن", "مقاس", "لون", "أسود", "خصم", "عرض", "premium", "cotton"]
+
+
+def random_text(rng: random.Random, min_words: int, max_words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words)))
+
+
+def make_row(rng: random.Random, store_id: int, index: int) -> dict:
+    """بيانات متنوعة تغطي كل حدود القواعد (قيم فارغة، أطوال على الحد، عدد صور مختلف)"""
+    name = rng.choice([None, "", random_text(rng, 1, 4), random_text(rng, 4, 9), random_text(rng, 9, 16)])
+    description = rng.choice([None, "", random_text(rng, 2, 8), random_text(rng, 8, 30),
+                              "<p>" + random_text(rng, 30, 120) + ".</p>"])
+    seo_title = rng.choice([None, "", "x" * rng.randint(40, 70)])
+    seo_description = rng.choice([None, "", "y" * rng.randint(140, 170)])
+    images = rng.choice([None, [], [f"https://cdn.example.com/{index}-{i}.jpg" for i in range(rng.randint(1, 5))]])
+    return {
+        "store_id": store_id,
+        "salla_product_id": str(100000 + index),
+        "name": name,
+        "description": description,
+        "seo_title": seo_title,
+        "seo_description": seo_description,
+        "images": images,
+        "seo_score": 0,
+    }
+
+
+def seed(count: int, seed_value: int) -> int:
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        user = User(full_name="Bench", email=f"bench-{time.time_ns()}@example.com", password="x")
+        db.add(user)
+        db.commit()
+        store = SallaStore(user_id=user.id, store_id=f"bench-{user.id}", store_name="Bench", access_token="token")
+        db.add(store)
+        db.commit()
+
+        rng = random.Random(seed_value)
+        for start in range(0, count, 10000):
+            rows = [make_row(rng, store.id, index) for index in range(start, min(count, start + 10000))]
+            db.execute(insert(SallaProduct.__table__), rows)
+        db.commit()
+        return store.id
+    finally:
+        db.close()
+
+
+def legacy_rescore(ai: AIService, store_id: int, limit: int) -> int:
+    """الطريقة القديمة كما كانت في bulk_analyze_products: تحميل الكائنات وتحليل وحفظ كل منتج"""
+    db = SessionLocal()
+    try:
+        products = db.query(SallaProduct).filter(SallaProduct.store_id == store_id).order_by(SallaProduct.id).limit(limit).all()
+        for product in products:
+            product.seo_score = ai.analyze_product_seo(product)["score"]
+            product.optimization_status = "analyzed"
+        db.commit()
+        return len(products)
+    finally:
+        db.close()
+
+
+def scores_by_product(store_id: int) -> dict:
+    db = SessionLocal()
+    try:
+        return dict(db.execute(
+            select(SallaProduct.salla_product_id, SallaProduct.seo_score).where(SallaProduct.store_id == store_id)
+        ).all())
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--legacy-limit", type=int, default=None, help="عدد المنتجات في القياس القديم (الافتراضي: الكل)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    # متجران بنفس البيانات: واحد للطريقة القديمة وواحد للحساب الجماعي
+    legacy_store = seed(args.products, args.seed)
+    batch_store = seed(args.products, args.seed)
+    limit = args.legacy_limit or args.products
+
+    started = time.perf_counter()
+    legacy_count = legacy_rescore(AIService(), legacy_store, limit)
+    legacy_elapsed = time.perf_counter() - started
+
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        scored = seo_scorer.rescore(db, store_id=batch_store)
+        batch_elapsed = time.perf_counter() - started
+
+        started = time.perf_counter()
+        seo_scorer.rescore(db, store_id=batch_store)
+        repeat_elapsed = time.perf_counter() - started
+    finally:
+        db.close()
+
+    expected = scores_by_product(legacy_store)
+    actual = scores_by_product(batch_store)
+    expected = dict(sorted(expected.items(), key=lambda item: int(item[0]))[:legacy_count])
+    mismatches = [product_id for product_id, score in expected.items() if actual.get(product_id) != score]
+    legacy_rate = legacy_count / legacy_elapsed
+    batch_rate = scored / batch_elapsed
+    engine_name = seo_scorer.get_metrics()["engine"]
+    print(f"{'legacy (ORM + analyze_product_seo)':<40} {legacy_count:>7} products  {legacy_elapsed:7.2f}s  {legacy_rate:10.0f}/s")
+    print(f"{f'SEOBatchScorer ({engine_name})':<40} {scored:>7} products  {batch_elapsed:7.2f}s  {batch_rate:10.0f}/s")
+    print(f"{'SEOBatchScorer repeat (nothing changed)':<40} {scored:>7} products  {repeat_elapsed:7.2f}s  "
+          f"{scored / repeat_elapsed:10.0f}/s")
+    print(f"speedup: {batch_rate / legacy_rate:.1f}x  mismatches: {len(mismatches)} of {len(expected)}")
+    if mismatches:
+        raise SystemExit(f"score mismatch for products {mismatches[:10]}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    finally:
+        os.unlink(_db_file.name)
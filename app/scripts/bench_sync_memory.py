@@ -0,0 +1,98 @@
+# app/scripts/bench_sync_memory.py
+"""
+قياس ذروة الذاكرة أثناء مزامنة المنتجات لأحجام متاجر مختلفة
+الذروة يجب أن تبقى ثابتة تقريباً مهما زاد عدد المنتجات
+
+الاستخدام:
+    python -m app.scripts.bench_sync_memory --sizes 2000 10000 40000
+"""
+
+import argparse
+import asyncio
+import os
+import resource
+import tempfile
+import time
+import tracemalloc
+
+# قاعدة بيانات مؤقتة وإعدادات وهمية قبل استيراد التطبيق
+_db_file = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_file.name}"
+os.environ.setdefault("ZOHO_EMAIL_USERNAME", "bench@example.com")
+os.environ.setdefault("ZOHO_EMAIL_PASSWORD", "bench")
+os.environ.setdefault("SALLA_RATE_LIMIT_PER_MINUTE", "1000000")
+os.environ.setdefault("SALLA_SYNC_PAGE_SIZE", "100")
+
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.models.salla import SallaStore, SallaProduct  # noqa: E402
+from app.models import points  # noqa: E402,F401
+from app.routers.salla import sync_products_task  # noqa: E402
+from app.services.salla_api import salla_http  # noqa: E402
+from app.scripts.salla_stub import SallaStub  # noqa: E402
+
+
+def create_store(db, index: int) -> int:
+    store = SallaStore(user_id=1, store_id=f"bench-store-{index}", store_name=f"Bench {index}", access_token="token")
+    db.add(store)
+    db.commit()
+    return store.id
+
+
+async def run_case(size: int, index: int, concurrency: int):
+    db = SessionLocal()
+    try:
+        store_id = create_store(db, index)
+        db.query(SallaStore).filter(SallaStore.id == store_id).update({"sync_concurrency": concurrency})
+        db.commit()
+    finally:
+        db.close()
+
+    await salla_http.startup(transport=SallaStub(total_products=size, latency=0).transport())
+
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    counts = await sync_products_task(store_id, parallel=True)
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+
+    await salla_http.shutdown()
+
+    db = SessionLocal()
+    try:
+        synced = db.query(SallaProduct).filter(SallaProduct.store_id == store_id).count()
+    finally:
+        db.close()
+    assert synced == size, f"expected {size} products, got {synced} ({counts})"
+
+    max_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(
+        f"{size:>8} products {elapsed:7.2f}s {size / elapsed:8.0f} products/s "
+        f"peak {peak / 1024 / 1024:6.2f} MB  (process max RSS {max_rss_mb:.0f} MB)"
+    )
+
+
+async def main(sizes, concurrency: int):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    db.add(User(full_name="Bench", email="bench@example.com", password="x"))
+    db.commit()
+    db.close()
+
+    tracemalloc.start()
+    print(f"📦 page size {os.environ['SALLA_SYNC_PAGE_SIZE']}, concurrency {concurrency}\n")
+    for index, size in enumerate(sizes):
+        await run_case(size, index, concurrency)
+    tracemalloc.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark product sync peak memory")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2000, 10000, 40000])
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+    try:
+        asyncio.run(main(args.sizes, args.concurrency))
+    finally:
+        os.unlink(_db_file.name)
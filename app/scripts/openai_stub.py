@@ -0,0 +1,237 @@
+# app/scripts/openai_stub.py
+"""
+بديل محلي متوافق مع OpenAI (POST /v1/chat/completions) لقياس أداء مسارات AI بدون اتصال حقيقي
+الردود حتمية (نفس البرومبت = نفس الرد) مع زمن استجابة ونسبة أخطاء وحدود معدل قابلة للضبط
+
+داخل نفس العملية كـ httpx transport:
+    AsyncOpenAI(api_key="stub", base_url="http://openai-stub/v1",
+                http_client=httpx.AsyncClient(transport=OpenAIStub().transport()))
+
+أو كخادم محلي (ثم OPENAI_BASE_URL=http://127.0.0.1:8099/v1):
+    python -m app.scripts.openai_stub --port 8099 --latency 0.8 --error-rate 0.02 --rate-limit 500
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+ITEM_MARKER = re.compile(r"^\s*\[(\d+)\]\s*$", re.MULTILINE)
+
+
+class OpenAIStub:
+    """محاكاة chat completions مع أخطاء 500 عشوائية (بـ seed ثابت) و 429 عند تجاوز الحد"""
+
+    def __init__(
+        self,
+        latency: float = 0.5,
+        jitter: float = 0.2,
+        error_rate: float = 0.0,
+        rate_limit: Optional[int] = None,
+        window: float = 60.0,
+        stream_chunks: int = 20,
+        seed: int = 42,
+    ):
+        self.latency = latency
+        # نسبة تذبذب الزمن حول latency (0.2 = ±20%)
+        self.jitter = jitter
+        self.error_rate = error_rate
+        # rate_limit طلب لكل نافذة مدتها window ثانية
+        self.rate_limit = rate_limit
+        self.window = window
+        self.stream_chunks = stream_chunks
+        self._random = random.Random(seed)
+        self.window_started = time.time()
+        self.window_requests = 0
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    def reset_counters(self):
+        self.requests = self.errors = self.throttled = self.max_in_flight = 0
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content or b"{}")
+        status, payload, headers = await self.respond(request.url.path, body)
+        if isinstance(payload, str):
+            return httpx.Response(status, content=payload.encode("utf-8"), headers=headers)
+        return httpx.Response(status, json=payload, headers=headers)
+
+    async def respond(self, path: str, body: Dict) -> Tuple[int, object, Dict[str, str]]:
+        """(status, payload, headers) - payload نص SSE في وضع البث"""
+        self.requests += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if not path.endswith("/chat/completions"):
+                return 404, {"error": {"message": "not found", "type": "invalid_request_error"}}, {}
+
+            throttled = self._check_rate_limit()
+            if throttled is not None:
+                self.throttled += 1
+                return 429, {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}}, {
+                    "retry-after-ms": str(int(throttled * 1000)),
+                    "retry-after": str(max(1, round(throttled))),
+                }
+
+            delay = self.latency * (1 + self._random.uniform(-self.jitter, self.jitter))
+            await asyncio.sleep(max(0.0, delay))
+
+            if self._random.random() < self.error_rate:
+                self.errors += 1
+                return 500, {"error": {"message": "Internal server error", "type": "server_error"}}, {}
+
+            content = self.completion_content(body)
+            if body.get("stream"):
+                return 200, self._sse(body, content), {"Content-Type": "text/event-stream"}
+            return 200, self._completion(body, content), {}
+        finally:
+            self.in_flight -= 1
+
+    def _check_rate_limit(self) -> Optional[float]:
+        """الثواني حتى نهاية النافذة إذا تجاوز الطلب الحد، وإلا None"""
+        if self.rate_limit is None:
+            return None
+        now = time.time()
+        if now - self.window_started >= self.window:
+            self.window_started = now
+            self.window_requests = 0
+        self.window_requests += 1
+        if self.window_requests > self.rate_limit:
+            return max(0.05, self.window_started + self.window - now)
+        return None
+
+    @staticmethod
+    def _digest(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()[:8]
+
+    def completion_content(self, body: Dict) -> str:
+        """رد حتمي حسب شكل البرومبت: دفعة items، أو JSON لمنتج واحد، أو نص حر"""
+        messages: List[Dict] = body.get("messages") or []
+        prompt = messages[-1].get("content", "") if messages else ""
+        digest = self._digest(prompt)
+        json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+
+        if json_mode and '"items"' in prompt:
+            positions = sorted({int(position) for position in ITEM_MARKER.findall(prompt)})
+            return json.dumps({"items": [self._seo_item(f"{digest}-{position}", position) for position in positions]},
+                              ensure_ascii=False)
+        if json_mode:
+            return json.dumps(self._seo_item(digest), ensure_ascii=False)
+        return f"وصف تجريبي {digest}: منتج بجودة عالية وضمان أصلي مع شحن سريع لجميع المدن. " * 3
+
+    @staticmethod
+    def _seo_item(digest: str, position: Optional[int] = None) -> Dict:
+        item = {
+            "seo_title": f"عنوان SEO تجريبي {digest} - أفضل سعر وشحن سريع",
+            "seo_description": f"وصف SEO تجريبي {digest} يشرح مميزات المنتج وجودته العالية مع ضمان أصلي وشحن سريع لجميع مدن المملكة.",
+            "keywords": ["منتج", "جودة", "شحن سريع", "ضمان", digest],
+        }
+        if position is not None:
+            item = {"id": position, **item}
+        return item
+
+    @staticmethod
+    def _usage(body: Dict, content: str) -> Dict:
+        prompt_chars = sum(len(message.get("content") or "") for message in body.get("messages") or [])
+        prompt_tokens, completion_tokens = prompt_chars // 3 + 1, len(content) // 3 + 1
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+    def _completion(self, body: Dict, content: str) -> Dict:
+        return {
+            "id": f"chatcmpl-stub-{self.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": self._usage(body, content),
+        }
+
+    def _sse(self, body: Dict, content: str) -> str:
+        size = max(1, len(content) // self.stream_chunks)
+        events = []
+        for start in range(0, len(content), size):
+            chunk = {
+                "id": f"chatcmpl-stub-{self.requests}",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [{"index": 0, "delta": {"content": content[start:start + size]}, "finish_reason": None}],
+            }
+            events.append(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n")
+        events.append("data: [DONE]\n\n")
+        return "".join(events)
+
+
+def create_app(stub: OpenAIStub):
+    """تطبيق FastAPI صغير يعرض نفس الـ stub كخادم HTTP"""
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse, Response
+
+    app = FastAPI(title="OpenAI stub")
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        status, payload, headers = await stub.respond(request.url.path, await request.json())
+        if isinstance(payload, str):
+            return Response(payload, status_code=status, headers=headers, media_type="text/event-stream")
+        return JSONResponse(payload, status_code=status, headers=headers)
+
+    @app.get("/stats")
+    async def stats():
+        return {
+            "requests": stub.requests,
+            "errors": stub.errors,
+            "throttled": stub.throttled,
+            "max_in_flight": stub.max_in_flight,
+        }
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, default=None, help="طلبات لكل نافذة")
+    parser.add_argument("--window", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    stub = OpenAIStub(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        window=args.window,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(stub), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# app/scripts/salla_stub.py
+"""
+بديل محلي لـ API سلة يُستخدم في سكريبتات قياس الأداء
+يعمل كـ httpx transport بدون أي اتصال بالشبكة مع زمن استجابة قابل للضبط
+"""
+
+import asyncio
+import json
+import re
+import time
+from typing import Dict, Optional
+
+import httpx
+
+PRODUCT_URL = re.compile(r"/admin/v2/products/(?P<product_id>[^/]+)$")
+
+
+class SallaStub:
+    """محاكاة endpoints المنتجات في سلة"""
+
+    def __init__(self, total_products: int = 1000, latency: float = 0.05, rate_limit: Optional[int] = None, window: float = 60.0):
+        self.total_products = total_products
+        self.latency = latency
+        # محاكاة حدود المعدل: rate_limit طلب لكل نافذة مدتها window ثانية
+        self.rate_limit = rate_limit
+        self.window = window
+        self.window_started = time.time()
+        self.window_requests = 0
+        self.throttled = 0
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    @staticmethod
+    def make_product(index: int) -> Dict:
+        return {
+            "id": 100000 + index,
+            "name": f"منتج تجريبي رقم {index}",
+            "description": f"<p>وصف المنتج التجريبي رقم {index} بجودة عالية وشحن سريع</p>",
+            "sku": f"SKU-{index}",
+            "url": f"https://demo.salla.sa/p{index}",
+            "price": {"amount": 100 + index % 50, "currency": "SAR"},
+            "category": {"id": index % 12, "name": f"تصنيف {index % 12}"},
+            "images": [{"url": f"https://cdn.salla.sa/{index}.jpg"}],
+            "metadata": {"title": "", "description": ""},
+            "status": "sale",
+        }
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    def rate_limit_headers(self) -> Dict[str, str]:
+        now = time.time()
+        if now - self.window_started >= self.window:
+            self.window_started = now
+            self.window_requests = 0
+        self.window_requests += 1
+        remaining = max(0, self.rate_limit - self.window_requests)
+        return {
+            "X-RateLimit-Limit": str(self.rate_limit),
+            "X-RateLimit-Remaining": str(remaining),
+            "X-RateLimit-Reset": str(int(self.window_started + self.window)),
+        }
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            path = request.url.path
+
+            if self.rate_limit is not None:
+                headers = self.rate_limit_headers()
+                if self.window_requests > self.rate_limit:
+                    self.throttled += 1
+                    retry_after = max(0, int(self.window_started + self.window - time.time()))
+                    return httpx.Response(429, json={"status": 429, "error": {"message": "Too Many Requests"}},
+                                          headers={**headers, "Retry-After": str(retry_after)})
+                response = self.route(request, path)
+                response.headers.update(headers)
+                return response
+
+            return self.route(request, path)
+        finally:
+            self.in_flight -= 1
+
+    def route(self, request: httpx.Request, path: str) -> httpx.Response:
+
+        if path.endswith("/admin/v2/products") and request.method == "GET":
+            return self.list_products(request)
+
+        match = PRODUCT_URL.search(path)
+        if match and request.method == "PUT":
+            return httpx.Response(200, json={"status": 200, "success": True, "data": {"id": match.group("product_id")}})
+        if match:
+            return httpx.Response(200, json={"status": 200, "success": True, "data": self.make_product(1)})
+
+        if path.endswith("/store/info"):
+            return httpx.Response(200, json={"status": 200, "data": {"id": 1, "name": "متجر تجريبي"}})
+
+        return httpx.Response(404, json={"status": 404, "error": {"message": "not found"}})
+
+    def list_products(self, request: httpx.Request) -> httpx.Response:
+        page = int(request.url.params.get("page", 1))
+        per_page = int(request.url.params.get("per_page", 15))
+        total_pages = max(1, (self.total_products + per_page - 1) // per_page)
+        start = (page - 1) * per_page
+        # المنتجات تُولَّد عند الطلب حتى لا يؤثر حجم المتجر المحاكى على قياس الذاكرة
+        data = [self.make_product(index) for index in range(start + 1, min(start + per_page, self.total_products) + 1)]
+        body = {
+            "status": 200,
+            "success": True,
+            "data": data,
+            "pagination": {
+                "count": len(data),
+                "total": self.total_products,
+                "perPage": per_page,
+                "currentPage": page,
+                "totalPages": total_pages,
+            },
+        }
+        return httpx.Response(200, content=json.dumps(body).encode("utf-8"), headers={"Content-Type": "application/json"})
@@ -0,0 +1,133 @@
+# app/services/ai_cache.py
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+import logging
+
+from sqlalchemy import func, select, update
+
+from app.database import SessionLocal
+from app.models.ai_cache import AICacheEntry
+from app.utils.db import dialect_insert
+
+logger = logging.getLogger(__name__)
+
+
+class AIResultCache:
+    """كاش دائم لنتائج AI بمفتاح hash لمدخلات البرومبت والنموذج
+
+    نفس المنتج بنفس الاسم والوصف والتصنيف والسعر يعيد النتيجة المحفوظة بدون
+    طلب جديد لـ OpenAI. الإدخالات تنتهي بعد AI_CACHE_TTL_HOURS، وعند تجاوز
+    AI_CACHE_MAX_ENTRIES تُحذف الأقل استخداماً مؤخراً.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("AI_CACHE_ENABLED", "true").lower() == "true"
+        self.ttl = timedelta(hours=float(os.getenv("AI_CACHE_TTL_HOURS", "168")))
+        self.max_entries = int(os.getenv("AI_CACHE_MAX_ENTRIES", "20000"))
+        # فحص الحجم كل عدد من الإضافات بدلاً من كل إضافة
+        self.evict_every = int(os.getenv("AI_CACHE_EVICT_EVERY", "100"))
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evicted": 0, "errors": 0}
+
+    @staticmethod
+    def make_key(kind: str, model: str, inputs: Dict[str, Any]) -> str:
+        raw = json.dumps({"kind": kind, "model": model, "inputs": inputs}, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, kind: str, model: str, inputs: Dict[str, Any]) -> Optional[Any]:
+        """النتيجة المحفوظة إن وجدت ولم تنتهِ صلاحيتها"""
+        if not self.enabled:
+            return None
+        key = self.make_key(kind, model, inputs)
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            entry = db.query(AICacheEntry.id, AICacheEntry.result).filter(
+                AICacheEntry.cache_key == key,
+                AICacheEntry.expires_at > now
+            ).first()
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+
+            db.execute(
+                update(AICacheEntry)
+                .where(AICacheEntry.id == entry.id)
+                .values(hits=AICacheEntry.hits + 1, last_used_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+            self._stats["hits"] += 1
+            return entry.result
+        except Exception as e:
+            # الكاش لا يجب أن يوقف التحسين
+            db.rollback()
+            self._stats["errors"] += 1
+            logger.warning(f"⚠️ AI cache read failed: {str(e)}")
+            return None
+        finally:
+            db.close()
+
+    def set(self, kind: str, model: str, inputs: Dict[str, Any], result: Any):
+        """حفظ نتيجة (أو استبدال الموجودة بنفس المفتاح)"""
+        if not self.enabled:
+            return
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            values = {
+                "result": result,
+                "created_at": now,
+                "last_used_at": now,
+                "expires_at": now + self.ttl,
+            }
+            stmt = dialect_insert(db, AICacheEntry.__table__).values(
+                cache_key=self.make_key(kind, model, inputs),
+                kind=kind,
+                model=model,
+                hits=0,
+                **values
+            )
+            db.execute(stmt.on_conflict_do_update(index_elements=["cache_key"], set_=values))
+            db.commit()
+            self._stats["stores"] += 1
+
+            if self._stats["stores"] % self.evict_every == 0:
+                self.evict(db)
+        except Exception as e:
+            db.rollback()
+            self._stats["errors"] += 1
+            logger.warning(f"⚠️ AI cache write failed: {str(e)}")
+        finally:
+            db.close()
+
+    def evict(self, db) -> int:
+        """حذف المنتهية ثم الأقل استخداماً حتى يعود الحجم للحد الأقصى"""
+        now = datetime.utcnow()
+        deleted = db.query(AICacheEntry).filter(AICacheEntry.expires_at <= now).delete(synchronize_session=False)
+
+        overflow = (db.query(func.count(AICacheEntry.id)).scalar() or 0) - self.max_entries
+        if overflow > 0:
+            oldest = select(AICacheEntry.id).order_by(AICacheEntry.last_used_at).limit(overflow)
+            deleted += db.query(AICacheEntry).filter(
+                AICacheEntry.id.in_(oldest)
+            ).delete(synchronize_session=False)
+
+        db.commit()
+        if deleted:
+            self._stats["evicted"] += deleted
+            logger.info(f"🔄 Evicted {deleted} AI cache entries")
+        return deleted
+
+    def get_metrics(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+            "enabled": self.enabled,
+        }
+
+
+ai_cache = AIResultCache()
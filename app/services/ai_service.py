@@ -1,14 +1,22 @@
 # app/services/ai_service.py
 import os
-import re
 import json
 from typing import Dict, List, Any, Optional
 from openai import AsyncOpenAI
 import logging
 from datetime import datetime
 
+from app.services.ai_cache import ai_cache
+from app.services.prompt_compactor import prompt_compactor
+from app.utils.arabic_text import count_punctuation, contains_digit, extract_keywords, normalize, word_stats
+
 logger = logging.getLogger(__name__)
 
+SEO_MODEL = "gpt-4-turbo-preview"
+SEO_SYSTEM_PROMPT = "أنت خبير SEO متخصص في التجارة الإلكترونية العربية. تقدم تحسينات دقيقة ومؤثرة."
+# الكلمات المفتاحية الشائعة في التجارة الإلكترونية (موحدة لتطابق "جودة" و "جوده" و "الجوده")
+ECOMMERCE_KEYWORDS = tuple(normalize(keyword) for keyword in ('جودة', 'ضمان', 'شحن', 'سريع', 'أصلي', 'مميزات', 'خصم', 'عرض'))
+
 class AIService:
     """خدمة الذكاء الاصطناعي لتحليل وتحسين SEO"""
     
@@ -18,7 +26,18 @@ class AIService:
             logger.warning("OpenAI API key not configured")
             self.client = None
         else:
-            self.client = AsyncOpenAI(api_key=api_key)
+            # OPENAI_BASE_URL يسمح بتوجيه الطلبات لخادم متوافق (مثل app/scripts/openai_stub.py)
+            self.client = AsyncOpenAI(
+                api_key=api_key,
+                base_url=os.getenv("OPENAI_BASE_URL") or None,
+                max_retries=int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+            )
+        
+        # وضع الدفعات: عدة منتجات في طلب واحد بحد أقصى للعدد والتوكنز
+        self.batch_size = int(os.getenv("AI_SEO_BATCH_SIZE", "10"))
+        self.batch_max_input_tokens = int(os.getenv("AI_SEO_BATCH_MAX_INPUT_TOKENS", "3000"))
+        self.batch_output_tokens_per_item = int(os.getenv("AI_SEO_BATCH_OUTPUT_TOKENS_PER_ITEM", "200"))
+        self._stats = {"single_requests": 0, "batch_requests": 0, "batched_items": 0, "fallback_items": 0}
     
     def analyze_product_seo(self, product) -> Dict[str, Any]:
         """تحليل SEO للمنتج بدون AI (تحليل أساسي)"""
@@ -154,13 +173,19 @@ class AIService:
             # إذا لم يكن OpenAI متاحاً، نستخدم تحسين أساسي
             return self._basic_seo_optimization(product)
         
+        cache_inputs = self._seo_cache_inputs(product)
+        cached = ai_cache.get("seo", SEO_MODEL, cache_inputs)
+        if cached is not None:
+            return cached
+        
+        self._stats["single_requests"] += 1
         try:
             # إعداد البرومبت
             prompt = f"""
             أنت خبير SEO للتجارة الإلكترونية. قم بتحسين SEO لهذا المنتج:
             
             اسم المنتج: {product.name}
-            الوصف الحالي: {product.description or 'لا يوجد وصف'}
+            الوصف الحالي: {prompt_compactor.compact(product.description, "seo") or 'لا يوجد وصف'}
             التصنيف: {product.category_name or 'غير محدد'}
             السعر: {product.price_amount} {product.price_currency}
             
@@ -178,11 +203,11 @@ class AIService:
             """
             
             response = await self.client.chat.completions.create(
-                model="gpt-4-turbo-preview",
+                model=SEO_MODEL,
                 messages=[
                     {
                         "role": "system",
-                        "content": "أنت خبير SEO متخصص في التجارة الإلكترونية العربية. تقدم تحسينات دقيقة ومؤثرة."
+                        "content": SEO_SYSTEM_PROMPT
                     },
                     {
                         "role": "user",
@@ -197,27 +222,183 @@ class AIService:
             result = json.loads(response.choices[0].message.content)
             
             # التحقق من صحة النتائج
-            if not all(key in result for key in ["seo_title", "seo_description", "keywords"]):
+            if not self._is_valid_seo_result(result):
                 raise ValueError("Invalid AI response format")
             
+            ai_cache.set("seo", SEO_MODEL, cache_inputs, result)
             return result
             
         except Exception as e:
             logger.error(f"Error using OpenAI for SEO optimization: {str(e)}")
             return self._basic_seo_optimization(product)
     
+    async def optimize_products_seo_batch(self, products: List[Any]) -> List[Dict[str, Any]]:
+        """تحسين SEO لعدة منتجات بطلبات مجمعة - النتائج بنفس ترتيب المنتجات
+        
+        كل عنصر في الرد يُتحقق منه منفرداً، والعناصر الناقصة أو غير الصالحة فقط
+        تُعاد بطلب منفرد عبر optimize_product_seo.
+        """
+        if not self.client:
+            return [self._basic_seo_optimization(product) for product in products]
+        
+        # المنتجات المحفوظة في الكاش لا تدخل في أي طلب
+        results: List[Optional[Dict[str, Any]]] = [
+            ai_cache.get("seo", SEO_MODEL, self._seo_cache_inputs(product)) for product in products
+        ]
+        misses = [index for index, result in enumerate(results) if result is None]
+        blocks = [self._product_prompt_block(products[index]) for index in misses]
+        
+        for batch in self._plan_batches(blocks):
+            batch_indexes = [misses[position] for position in batch]
+            if len(batch_indexes) == 1:
+                # منتج واحد لا يحتاج صيغة الدفعات
+                results[batch_indexes[0]] = await self.optimize_product_seo(products[batch_indexes[0]])
+                continue
+            batch_results = await self._optimize_batch([blocks[position] for position in batch])
+            for index, result in zip(batch_indexes, batch_results):
+                if result is not None:
+                    ai_cache.set("seo", SEO_MODEL, self._seo_cache_inputs(products[index]), result)
+                results[index] = result
+        
+        # الرجوع لطلب منفرد للعناصر التي فشلت فقط
+        for index, result in enumerate(results):
+            if result is None:
+                self._stats["fallback_items"] += 1
+                results[index] = await self.optimize_product_seo(products[index])
+        
+        return results
+    
+    @staticmethod
+    def _seo_cache_inputs(product) -> Dict[str, Any]:
+        """مدخلات البرومبت التي تحدد نتيجة تحسين SEO (مفتاح الكاش)"""
+        return {
+            "name": product.name,
+            "description": product.description,
+            "category": product.category_name,
+            "price": str(product.price_amount),
+            "currency": product.price_currency,
+        }
+    
+    def _product_prompt_block(self, product) -> str:
+        return (
+            f"اسم المنتج: {product.name}\n"
+            f"الوصف الحالي: {prompt_compactor.compact(product.description, 'seo') or 'لا يوجد وصف'}\n"
+            f"التصنيف: {product.category_name or 'غير محدد'}\n"
+            f"السعر: {product.price_amount} {product.price_currency}"
+        )
+    
+    def _plan_batches(self, blocks: List[str]) -> List[List[int]]:
+        """تقسيم كتل المنتجات (بالفهارس) إلى دفعات لا تتجاوز الحد الأقصى للعدد والتوكنز"""
+        batches: List[List[int]] = []
+        current: List[int] = []
+        current_tokens = 0
+        for index, block in enumerate(blocks):
+            tokens = prompt_compactor.estimate_tokens(block)
+            if current and (len(current) >= self.batch_size or current_tokens + tokens > self.batch_max_input_tokens):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(index)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+    
+    async def _optimize_batch(self, blocks: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """طلب واحد لعدة منتجات (كتلة برومبت لكل منتج) - يرجع None للعناصر غير الصالحة"""
+        items = "\n\n".join(
+            f"[{position}]\n{block}"
+            for position, block in enumerate(blocks)
+        )
+        prompt = f"""
+            قم بتحسين SEO لكل منتج من المنتجات التالية ({len(blocks)} منتجات):
+            
+            {items}
+            
+            المطلوب لكل منتج:
+            1. عنوان SEO محسّن (50-60 حرف) - يجب أن يحتوي على الكلمات المفتاحية
+            2. وصف SEO (150-160 حرف) - ملخص جذاب يشجع على النقر
+            3. قائمة بـ 5 كلمات مفتاحية مقترحة
+            
+            أجب بصيغة JSON فقط، عنصر لكل منتج مع رقمه في id:
+            {{
+                "items": [
+                    {{
+                        "id": 0,
+                        "seo_title": "العنوان المحسن",
+                        "seo_description": "الوصف المحسن",
+                        "keywords": ["كلمة1", "كلمة2", "كلمة3", "كلمة4", "كلمة5"]
+                    }}
+                ]
+            }}
+            """
+        
+        self._stats["batch_requests"] += 1
+        try:
+            response = await self.client.chat.completions.create(
+                model=SEO_MODEL,
+                messages=[
+                    {"role": "system", "content": SEO_SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.7,
+                max_tokens=self.batch_output_tokens_per_item * len(blocks),
+                response_format={"type": "json_object"}
+            )
+            items_data = json.loads(response.choices[0].message.content).get("items")
+            if not isinstance(items_data, list):
+                raise ValueError("Invalid AI batch response format")
+        except Exception as e:
+            logger.error(f"Error using OpenAI for batch SEO optimization ({len(blocks)} products): {str(e)}")
+            return [None] * len(blocks)
+        
+        results: List[Optional[Dict[str, Any]]] = [None] * len(blocks)
+        for item in items_data:
+            if not isinstance(item, dict):
+                continue
+            position = item.get("id")
+            if isinstance(position, str) and position.isdigit():
+                position = int(position)
+            if not isinstance(position, int) or not 0 <= position < len(blocks) or results[position] is not None:
+                continue
+            result = {key: item.get(key) for key in ("seo_title", "seo_description", "keywords")}
+            if self._is_valid_seo_result(result):
+                results[position] = result
+        
+        self._stats["batched_items"] += sum(1 for result in results if result is not None)
+        return results
+    
+    @staticmethod
+    def _is_valid_seo_result(result: Any) -> bool:
+        if not isinstance(result, dict):
+            return False
+        if not all(key in result for key in ["seo_title", "seo_description", "keywords"]):
+            return False
+        return (
+            isinstance(result["seo_title"], str) and result["seo_title"].strip() != ""
+            and isinstance(result["seo_description"], str) and result["seo_description"].strip() != ""
+            and isinstance(result["keywords"], list)
+        )
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        return dict(self._stats)
+    
     async def generate_product_description(self, product_data: Dict[str, Any]) -> str:
         """توليد وصف احترافي للمنتج"""
         if not self.client:
             return self._generate_basic_description(product_data)
         
+        cache_inputs = {key: product_data.get(key) for key in ("name", "category", "features")}
+        cached = ai_cache.get("description", SEO_MODEL, cache_inputs)
+        if cached is not None:
+            return cached
+        
         try:
             prompt = f"""
             اكتب وصف احترافي ومقنع لهذا المنتج:
             
             الاسم: {product_data.get('name')}
             التصنيف: {product_data.get('category', 'غير محدد')}
-            المميزات: {product_data.get('features', 'غير محددة')}
+            المميزات: {prompt_compactor.compact(self._features_text(product_data.get('features')), "description") or 'غير محددة'}
             
             الوصف يجب أن يكون:
             - 100-150 كلمة
@@ -228,7 +409,7 @@ class AIService:
             """
             
             response = await self.client.chat.completions.create(
-                model="gpt-4-turbo-preview",
+                model=SEO_MODEL,
                 messages=[
                     {
                         "role": "system",
@@ -243,7 +424,9 @@ class AIService:
                 max_tokens=400
             )
             
-            return response.choices[0].message.content.strip()
+            description = response.choices[0].message.content.strip()
+            ai_cache.set("description", SEO_MODEL, cache_inputs, description)
+            return description
             
         except Exception as e:
             logger.error(f"Error generating description: {str(e)}")
@@ -272,29 +455,9 @@ class AIService:
         }
     
     def _extract_keywords(self, text: str) -> List[str]:
-        """استخراج الكلمات المفتاحية من النص"""
-        if not text:
-            return []
-        
-        # إزالة الأحرف الخاصة
-        text = re.sub(r'[^\w\s]', ' ', text)
-        
-        # تقسيم إلى كلمات
-        words = text.split()
-        
-        # إزالة الكلمات القصيرة جداً
-        keywords = [word for word in words if len(word) > 2]
-        
-        # حساب التكرار
-        word_freq = {}
-        for word in keywords:
-            word_freq[word] = word_freq.get(word, 0) + 1
-        
-        # ترتيب حسب التكرار
-        sorted_keywords = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)
-        
-        # إرجاع أكثر 10 كلمات تكراراً
-        return [word for word, freq in sorted_keywords[:10] if freq > 1]
+        """استخراج الكلمات المفتاحية من النص (بعد توحيد الحروف العربية وحذف كلمات التوقف)"""
+        # أكثر 10 كلمات تكراراً (المكررة فقط)
+        return extract_keywords(text, limit=10, min_freq=2)
     
     def _basic_seo_optimization(self, product) -> Dict[str, str]:
         """تحسين SEO أساسي بدون AI"""
@@ -323,11 +486,20 @@ class AIService:
             "keywords": keywords
         }
     
+    @staticmethod
+    def _features_text(features: Any) -> str:
+        """المميزات كنص واحد سواء وصلت قائمة أو نصاً"""
+        if not features:
+            return ""
+        if isinstance(features, (list, tuple)):
+            return "، ".join(str(feature) for feature in features if feature)
+        return str(features)
+    
     def _generate_basic_description(self, product_data: Dict[str, Any]) -> str:
         """توليد وصف أساسي بدون AI"""
         name = product_data.get('name', 'المنتج')
         category = product_data.get('category', '')
-        features = product_data.get('features', '')
+        features = self._features_text(product_data.get('features'))
         
         description = f"يقدم لكم {name}"
         
@@ -372,8 +544,10 @@ class AIService:
         score = 0
         issues = []
         
+        # كلمات موحدة: "مُنتَج" و "منتج" كلمة واحدة، وعلامات الترقيم لا تُعد كلمات
+        word_count, unique_words = word_stats(content)
+        
         # طول المحتوى
-        word_count = len(content.split())
         if word_count < 50:
             issues.append("المحتوى قصير جداً")
         elif word_count > 300:
@@ -382,8 +556,7 @@ class AIService:
             score += 10
         
         # تنوع الكلمات
-        unique_words = len(set(content.split()))
-        diversity_ratio = unique_words / word_count if word_count > 0 else 0
+        diversity_ratio = len(unique_words) / word_count if word_count > 0 else 0
         
         if diversity_ratio > 0.7:
             score += 20
@@ -393,22 +566,21 @@ class AIService:
             issues.append("المحتوى يحتاج لتنوع أكثر في الكلمات")
         
         # وجود أرقام (مفيد للمواصفات)
-        if re.search(r'\d+', content):
+        if contains_digit(content):
             score += 10
         
         # وجود علامات ترقيم
-        punctuation_count = len(re.findall(r'[.,!?؛:]', content))
+        punctuation_count = count_punctuation(content)
         if punctuation_count > 3:
             score += 10
         
         # الفقرات
-        paragraphs = content.split('\n\n')
-        if len(paragraphs) > 1:
+        if '\n\n' in content:
             score += 10
         
         # الكلمات المفتاحية الشائعة في التجارة الإلكترونية
-        ecommerce_keywords = ['جودة', 'ضمان', 'شحن', 'سريع', 'أصلي', 'مميزات', 'خصم', 'عرض']
-        found_keywords = sum(1 for keyword in ecommerce_keywords if keyword in content)
+        normalized_words = " ".join(unique_words)
+        found_keywords = sum(1 for keyword in ECOMMERCE_KEYWORDS if keyword in normalized_words)
         score += min(found_keywords * 5, 20)
         
         return {
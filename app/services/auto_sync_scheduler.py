@@ -0,0 +1,205 @@
+# app/services/auto_sync_scheduler.py
+import asyncio
+import math
+import os
+import random
+import zlib
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+import logging
+
+from sqlalchemy import func
+
+from app.database import SessionLocal
+from app.models.salla import SallaStore, SallaSyncRun
+from app.models.webhook_event import WebhookEvent
+
+logger = logging.getLogger(__name__)
+
+SyncHandler = Callable[[int], Awaitable[Dict]]
+
+
+class AutoSyncScheduler:
+    """مزامنة دورية لكل المتاجر المفعّل فيها auto_sync_enabled
+
+    موعد كل متجر = آخر مزامنة + الفترة + إزاحة ثابتة خاصة بالمتجر، فلا تستحق
+    كل المتاجر في نفس اللحظة. المتاجر المستحقة تُرتب حسب التقادم ونشاط
+    webhooks الأخير، ولا يعمل أكثر من AUTO_SYNC_MAX_CONCURRENT مزامنة معاً.
+    المتجر الذي فشلت مزامنته ينتظر مهلة تتضاعف مع كل فشل متتالٍ (حتى الفترة
+    العادية) قبل إعادة المحاولة.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("AUTO_SYNC_ENABLED", "true").lower() == "true"
+        self.interval = timedelta(minutes=int(os.getenv("AUTO_SYNC_INTERVAL_MINUTES", "360")))
+        self.jitter = timedelta(minutes=int(os.getenv("AUTO_SYNC_JITTER_MINUTES", "30")))
+        self.tick_seconds = float(os.getenv("AUTO_SYNC_TICK_SECONDS", "60"))
+        self.max_concurrent = int(os.getenv("AUTO_SYNC_MAX_CONCURRENT", "3"))
+        self.activity_window = timedelta(hours=int(os.getenv("AUTO_SYNC_ACTIVITY_WINDOW_HOURS", "24")))
+        self.activity_weight = float(os.getenv("AUTO_SYNC_ACTIVITY_WEIGHT", "0.5"))
+        self.retry_base = timedelta(minutes=int(os.getenv("AUTO_SYNC_RETRY_BASE_MINUTES", "5")))
+
+        self.handler: Optional[SyncHandler] = None
+        self._task: Optional[asyncio.Task] = None
+        self._running: Set[int] = set()
+        self._sync_tasks: Set[asyncio.Task] = set()
+        # عدد مرات الفشل المتتالية وموعد المحاولة التالية لكل متجر
+        self._failures: Dict[int, int] = {}
+        self._retry_at: Dict[int, datetime] = {}
+        self._stats = {"ticks": 0, "dispatched": 0, "completed": 0, "failed": 0, "last_due": 0}
+
+    def register(self, handler: SyncHandler):
+        """تسجيل دالة المزامنة (تستقبل id المتجر)"""
+        self.handler = handler
+
+    def store_offset(self, store_id: int) -> timedelta:
+        """إزاحة ثابتة لكل متجر داخل نافذة الـ jitter لتوزيع المواعيد"""
+        if not self.jitter:
+            return timedelta(0)
+        fraction = zlib.crc32(str(store_id).encode()) / 0xFFFFFFFF
+        return self.jitter * fraction
+
+    async def start(self):
+        if not self.enabled or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._loop())
+        logger.info(f"✅ Auto-sync scheduler started (every {self.interval}, max {self.max_concurrent} concurrent)")
+
+    async def stop(self):
+        tasks = [task for task in [self._task, *self._sync_tasks] if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        self._sync_tasks.clear()
+        self._running.clear()
+        logger.info("🛑 Auto-sync scheduler stopped")
+
+    async def _loop(self):
+        # تأخير عشوائي عند الإقلاع حتى لا تبدأ كل النسخ معاً بعد النشر
+        await asyncio.sleep(random.uniform(0, self.tick_seconds))
+        while True:
+            try:
+                self.tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Auto-sync scheduler error: {str(e)}")
+            await asyncio.sleep(self.tick_seconds * random.uniform(0.8, 1.2))
+
+    def tick(self) -> List[int]:
+        """اختيار المتاجر المستحقة حسب الأولوية وبدء مزامنتها ضمن الحد العام"""
+        self._stats["ticks"] += 1
+        free_slots = self.max_concurrent - len(self._running)
+        if self.handler is None or free_slots <= 0:
+            return []
+
+        due = self.due_stores()
+        self._stats["last_due"] = len(due)
+
+        dispatched = []
+        for store_id in due[:free_slots]:
+            self._running.add(store_id)
+            task = asyncio.create_task(self._sync(store_id))
+            self._sync_tasks.add(task)
+            task.add_done_callback(self._sync_tasks.discard)
+            dispatched.append(store_id)
+
+        self._stats["dispatched"] += len(dispatched)
+        return dispatched
+
+    def due_stores(self) -> List[int]:
+        """المتاجر التي حان موعدها مرتبة من الأعلى أولوية"""
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            stores = db.query(SallaStore.id, SallaStore.store_id, SallaStore.last_sync_at).filter(
+                SallaStore.auto_sync_enabled == True,
+                SallaStore.access_token.isnot(None)
+            ).all()
+
+            activity = dict(
+                db.query(WebhookEvent.merchant_id, func.count(WebhookEvent.id))
+                .filter(WebhookEvent.received_at >= now - self.activity_window)
+                .group_by(WebhookEvent.merchant_id)
+                .all()
+            )
+        finally:
+            db.close()
+
+        scored = []
+        for store_pk, merchant_id, last_sync_at in stores:
+            if store_pk in self._running:
+                continue
+            retry_at = self._retry_at.get(store_pk)
+            if retry_at is not None and retry_at > now:
+                continue
+
+            if last_sync_at is None:
+                # متجر لم يُزامن أبداً له الأولوية القصوى
+                staleness = float("inf")
+            else:
+                if last_sync_at + self.interval + self.store_offset(store_pk) > now:
+                    continue
+                staleness = (now - last_sync_at) / self.interval
+
+            events = activity.get(merchant_id, 0)
+            score = staleness + self.activity_weight * math.log1p(events)
+            scored.append((score, store_pk))
+
+        scored.sort(reverse=True)
+        return [store_pk for _, store_pk in scored]
+
+    def retry_delay(self, failures: int) -> timedelta:
+        """مهلة إعادة المحاولة بعد عدد من مرات الفشل المتتالية"""
+        return min(self.retry_base * 2 ** (failures - 1), self.interval)
+
+    @staticmethod
+    def _last_run_failed(store_id: int) -> bool:
+        """دالة المزامنة تسجل فشلها في SallaSyncRun بدلاً من رفع استثناء"""
+        db = SessionLocal()
+        try:
+            status = db.query(SallaSyncRun.status).filter(
+                SallaSyncRun.store_id == store_id
+            ).order_by(SallaSyncRun.id.desc()).limit(1).scalar()
+        finally:
+            db.close()
+        return status == "failed"
+
+    def _record_result(self, store_id: int, failed: bool, reason: str = ""):
+        if not failed:
+            self._stats["completed"] += 1
+            self._failures.pop(store_id, None)
+            self._retry_at.pop(store_id, None)
+            return
+
+        self._stats["failed"] += 1
+        failures = self._failures.get(store_id, 0) + 1
+        self._failures[store_id] = failures
+        delay = self.retry_delay(failures)
+        self._retry_at[store_id] = datetime.utcnow() + delay
+        logger.error(f"❌ Auto-sync failed for store {store_id} ({failures}x, retry in {delay}){reason}")
+
+    async def _sync(self, store_id: int):
+        try:
+            await self.handler(store_id)
+            failed = self._last_run_failed(store_id)
+            self._record_result(store_id, failed)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._record_result(store_id, True, f": {str(e)}")
+        finally:
+            self._running.discard(store_id)
+
+    def get_metrics(self) -> Dict:
+        return {
+            **self._stats,
+            "enabled": self.enabled,
+            "running": sorted(self._running),
+            "backing_off": len(self._retry_at),
+            "max_concurrent": self.max_concurrent,
+        }
+
+
+auto_sync_scheduler = AutoSyncScheduler()
@@ -0,0 +1,192 @@
+# app/services/bulk_optimizer.py
+import asyncio
+import os
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+import logging
+
+from sqlalchemy import update
+
+from app.database import SessionLocal
+from app.models.salla import SallaProduct
+from app.services.ai_service import AIService
+
+logger = logging.getLogger(__name__)
+
+
+class BulkOptimizer:
+    """تحسين SEO جماعي بتوازٍ محدود وحفظ تدريجي على دفعات صغيرة
+
+    كل دفعة منتجات تُرسل لـ AI بطلب مجمع، وحتى AI_BULK_CONCURRENCY دفعة تعمل
+    معاً. النتائج تُحفظ كل AI_BULK_COMMIT_CHUNK منتج مع optimization_status لكل
+    منتج، فتوقف العملية في المنتصف لا يضيع ما تم تحسينه. المنتجات التي بقيت
+    optimizing بعد انتهاء العملية، أو من عملية توقفت مع الخادم، تُعلّم failed.
+    """
+
+    def __init__(self, ai: AIService):
+        self.ai = ai
+        self.concurrency = int(os.getenv("AI_BULK_CONCURRENCY", "4"))
+        self.commit_chunk = int(os.getenv("AI_BULK_COMMIT_CHUNK", "20"))
+        self.jobs_to_keep = int(os.getenv("AI_BULK_JOBS_KEEP", "200"))
+        self.stale_after = timedelta(minutes=int(os.getenv("AI_BULK_STALE_MINUTES", "60")))
+        self.jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def create_job(self, user_id: int, operation: str, product_ids: List[int]) -> Dict[str, Any]:
+        """تسجيل عملية جماعية جديدة لمتابعة تقدمها"""
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "user_id": user_id,
+            "operation": operation,
+            "status": "queued",
+            "total": len(product_ids),
+            "processed": 0,
+            "optimized": 0,
+            "failed": 0,
+            "committed": 0,
+            "error": None,
+            "created_at": datetime.utcnow(),
+            "started_at": None,
+            "finished_at": None,
+        }
+        self.jobs[job["job_id"]] = job
+        while len(self.jobs) > self.jobs_to_keep:
+            self.jobs.popitem(last=False)
+        return job
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.jobs.get(job_id)
+
+    async def run(self, product_ids: List[int], job: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """تحسين المنتجات وحفظها تدريجياً - يرجع حالة العملية"""
+        job = job or self.create_job(0, "optimize", product_ids)
+        job["status"] = "running"
+        job["started_at"] = datetime.utcnow()
+
+        db = SessionLocal()
+        try:
+            self._reset_stale(db)
+            db.query(SallaProduct).filter(SallaProduct.id.in_(product_ids)).update(
+                {"optimization_status": "optimizing", "updated_at": datetime.utcnow()}, synchronize_session=False
+            )
+            db.commit()
+            products = db.query(SallaProduct).filter(SallaProduct.id.in_(product_ids)).all()
+            job["total"] = len(products)
+            # نسخ منفصلة عن الجلسة تُمرر لـ AI (تحتاج الحقول المحملة فقط)
+            db.expunge_all()
+        finally:
+            db.close()
+
+        chunks = [products[i:i + self.ai.batch_size] for i in range(0, len(products), self.ai.batch_size)]
+        semaphore = asyncio.Semaphore(self.concurrency)
+        pending: List[Dict[str, Any]] = []
+
+        async def optimize_chunk(chunk: List[SallaProduct]):
+            async with semaphore:
+                try:
+                    results = await self.ai.optimize_products_seo_batch(chunk)
+                except Exception as e:
+                    logger.error(f"Error optimizing {len(chunk)} products: {str(e)}")
+                    results = [None] * len(chunk)
+
+            for product, result in zip(chunk, results):
+                pending.append({"id": product.id, "result": result})
+                job["processed"] += 1
+            if len(pending) >= self.commit_chunk:
+                self._commit(pending, job)
+
+        errors: List[BaseException] = []
+        try:
+            # كل الدفعات تنتهي حتى لو فشل حفظ إحداها
+            results = await asyncio.gather(*(optimize_chunk(chunk) for chunk in chunks), return_exceptions=True)
+            errors = [result for result in results if isinstance(result, Exception)]
+        finally:
+            try:
+                self._commit(pending, job)
+            except Exception as e:
+                errors.append(e)
+            try:
+                self._release(product_ids, job)
+            except Exception as e:
+                errors.append(e)
+            job["finished_at"] = datetime.utcnow()
+
+        if errors:
+            job["status"] = "failed"
+            job["error"] = str(errors[0])[:500]
+            logger.error(f"❌ Bulk optimization job {job['job_id']} failed: {str(errors[0])}")
+        else:
+            job["status"] = "completed"
+
+        logger.info(
+            f"✅ Bulk optimization {job['job_id']}: {job['optimized']}/{job['total']} optimized "
+            f"({job['failed']} failed)"
+        )
+        return job
+
+    def _reset_stale(self, db):
+        """منتجات بقيت optimizing من عملية توقفت (إعادة تشغيل الخادم مثلاً)"""
+        stale = db.query(SallaProduct).filter(
+            SallaProduct.optimization_status == "optimizing",
+            SallaProduct.updated_at < datetime.utcnow() - self.stale_after
+        ).update({"optimization_status": "failed"}, synchronize_session=False)
+        if stale:
+            logger.warning(f"⚠️ Reset {stale} products stuck in optimizing")
+
+    def _release(self, product_ids: List[int], job: Dict[str, Any]):
+        """المنتجات التي لم تُحفظ نتيجتها تُعلّم failed بدلاً من بقائها optimizing"""
+        db = SessionLocal()
+        try:
+            leftover = db.query(SallaProduct).filter(
+                SallaProduct.id.in_(product_ids),
+                SallaProduct.optimization_status == "optimizing"
+            ).update({"optimization_status": "failed", "updated_at": datetime.utcnow()}, synchronize_session=False)
+            db.commit()
+            job["failed"] += leftover
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _commit(self, pending: List[Dict[str, Any]], job: Dict[str, Any]):
+        """حفظ النتائج المتراكمة في معاملة واحدة وتفريغها"""
+        if not pending:
+            return
+        items = pending[:]
+        pending.clear()
+
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            optimized = failed = 0
+            for item in items:
+                result = item["result"]
+                if result:
+                    values = {
+                        "seo_title": result["seo_title"],
+                        "seo_description": result["seo_description"],
+                        "optimization_status": "optimized",
+                        "needs_update": True,
+                        "updated_at": now,
+                    }
+                    optimized += 1
+                else:
+                    values = {"optimization_status": "failed", "updated_at": now}
+                    failed += 1
+                db.execute(
+                    update(SallaProduct)
+                    .where(SallaProduct.id == item["id"])
+                    .values(**values)
+                    .execution_options(synchronize_session=False)
+                )
+            db.commit()
+            job["optimized"] += optimized
+            job["failed"] += failed
+            job["committed"] += len(items)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
@@ -0,0 +1,176 @@
+# app/services/delayed_jobs.py
+import math
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+import logging
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.delayed_job import DelayedJob
+from app.utils.db import QueueWorker, dialect_insert
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[Session, dict], Awaitable[None]]
+
+
+class DelayedJobScheduler(QueueWorker):
+    """مهام مؤجلة دائمة مع مؤقت يحجز المهام المستحقة على دفعات وينفذها بالتتابع
+
+    المواعيد تُقرّب إلى خانات بطول DELAYED_JOBS_TICK_SECONDS (مثل عجلة توقيت)،
+    والـ poller ينام حتى أقرب خانة فيها مهمة بدلاً من إبقاء coroutine نائمة
+    لكل مهمة، فالذاكرة ثابتة مهما زاد عدد المهام المؤجلة.
+    """
+
+    name = "Delayed jobs poller"
+    model = DelayedJob
+    active_status = "running"
+    available_column = "run_at"
+
+    def __init__(self):
+        super().__init__(
+            batch_size=int(os.getenv("DELAYED_JOBS_BATCH_SIZE", "100")),
+            max_attempts=int(os.getenv("DELAYED_JOBS_MAX_ATTEMPTS", "3")),
+            retry_delay=120,
+            lock_timeout=timedelta(seconds=int(os.getenv("DELAYED_JOBS_LOCK_TIMEOUT", "600"))),
+            poll_interval=float(os.getenv("DELAYED_JOBS_TICK_SECONDS", "5")),
+        )
+        self.tick_seconds = self.poll_interval
+        self.idle_seconds = float(os.getenv("DELAYED_JOBS_IDLE_SECONDS", "60"))
+
+        self.handlers: Dict[str, JobHandler] = {}
+        self.recurring: Dict[str, timedelta] = {}
+        self._next_wakeup: Optional[datetime] = None
+        self._stats.update({"scheduled": 0, "fired": 0, "batches": 0})
+
+    def register(self, job_type: str, handler: JobHandler):
+        """تسجيل معالج لنوع مهمة"""
+        self.handlers[job_type] = handler
+
+    def register_recurring(self, job_type: str, handler: JobHandler, every: timedelta):
+        """مهمة دورية - تُجدول تلقائياً في بداية كل فترة"""
+        self.handlers[job_type] = handler
+        self.recurring[job_type] = every
+
+    def schedule(
+        self,
+        db: Session,
+        job_type: str,
+        run_at: datetime,
+        payload: Optional[dict] = None,
+        dedupe_key: Optional[str] = None
+    ) -> bool:
+        """حفظ مهمة مؤجلة (يتجاهل التكرار بنفس dedupe_key) - يرجع False للتكرار"""
+        stmt = dialect_insert(db, DelayedJob.__table__).values(
+            job_type=job_type,
+            dedupe_key=dedupe_key,
+            payload=payload or {},
+            status="pending",
+            attempts=0,
+            run_at=run_at,
+            created_at=datetime.utcnow(),
+        ).on_conflict_do_nothing(index_elements=["dedupe_key"])
+
+        result = db.execute(stmt)
+        db.commit()
+
+        inserted = result.rowcount != 0
+        if inserted:
+            self._stats["scheduled"] += 1
+            # إيقاظ الـ poller إذا كانت المهمة أقرب من موعد استيقاظه
+            if self._next_wakeup is None or run_at < self._next_wakeup:
+                self._notify()
+        return inserted
+
+    def _schedule_recurring(self):
+        db = SessionLocal()
+        try:
+            now = time.time()
+            for job_type, every in self.recurring.items():
+                period = every.total_seconds()
+                slot = math.floor(now / period) + 1
+                # نفس المفتاح من كل النسخ - تُنفذ مرة واحدة في كل فترة
+                self.schedule(
+                    db,
+                    job_type,
+                    run_at=datetime.utcfromtimestamp(slot * period),
+                    dedupe_key=f"{job_type}@{slot}",
+                )
+        finally:
+            db.close()
+
+    async def start(self):
+        self._schedule_recurring()
+        await super().start()
+
+    def _next_delay(self) -> float:
+        """الثواني حتى بداية خانة أقرب مهمة معلقة"""
+        db = SessionLocal()
+        try:
+            next_run_at = db.query(func.min(DelayedJob.run_at)).filter(DelayedJob.status == "pending").scalar()
+        finally:
+            db.close()
+
+        now = datetime.utcnow()
+        if next_run_at is None:
+            self._next_wakeup = now + timedelta(seconds=self.idle_seconds)
+            return self.idle_seconds
+
+        seconds = (next_run_at - now).total_seconds()
+        # التقريب لنهاية الخانة يجمع المهام المتقاربة في دفعة واحدة
+        seconds = math.ceil(max(0.0, seconds) / self.tick_seconds) * self.tick_seconds
+        seconds = min(seconds, self.idle_seconds)
+        self._next_wakeup = now + timedelta(seconds=seconds)
+        return seconds
+
+    def _as_dict(self, job: DelayedJob) -> Dict:
+        return {
+            "id": job.id,
+            "job_type": job.job_type,
+            "payload": job.payload or {},
+            "attempts": job.attempts or 0,
+        }
+
+    async def process_batch(self) -> int:
+        """حجز دفعة من المهام المستحقة وتنفيذها واحدة تلو الأخرى - يرجع عدد المهام المحجوزة"""
+        jobs = self._claim()
+        if not jobs:
+            return 0
+
+        self._stats["batches"] += 1
+        done_ids = []
+        for job in jobs:
+            if await self._run(job):
+                done_ids.append(job["id"])
+
+        self._mark_done(done_ids)
+
+        fired_recurring = {job["job_type"] for job in jobs if job["job_type"] in self.recurring}
+        if fired_recurring:
+            self._schedule_recurring()
+        return len(jobs)
+
+    async def _run(self, job: Dict) -> bool:
+        handler = self.handlers.get(job["job_type"])
+        if handler is None:
+            logger.warning(f"⚠️ No handler for delayed job type: {job['job_type']}")
+            self._mark_failed(job, "no handler registered", give_up=True)
+            return False
+
+        if await self._run_handler(job, f"delayed job {job['job_type']}", lambda db: handler(db, job["payload"])):
+            self._stats["fired"] += 1
+            return True
+        return False
+
+    def get_metrics(self) -> Dict:
+        return {
+            **super().get_metrics(),
+            "next_wakeup": self._next_wakeup.isoformat() if self._next_wakeup else None,
+        }
+
+
+delayed_jobs = DelayedJobScheduler()
@@ -0,0 +1,122 @@
+# app/services/email_outbox.py
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Tuple
+import logging
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.models.email_outbox import EmailOutbox
+from app.services.email_service import email_service
+from app.utils.db import QueueWorker, dialect_insert
+
+logger = logging.getLogger(__name__)
+
+EmailBuilder = Callable[..., Tuple[str, str]]
+
+
+class EmailOutboxWorker(QueueWorker):
+    """صندوق صادر للإيميلات مع worker يرسلها على دفعات عبر جلسات SMTP المحفوظة
+
+    المسارات (OAuth callback، معالجات webhooks، التذكيرات) تكتب صف الإيميل في
+    نفس معاملة التغيير الذي سببه بدون أي اتصال SMTP، فإذا فشلت المعاملة لا
+    يُرسل شيء وإذا نجحت يُرسل الإيميل حتماً. حالة إعادة المحاولة محفوظة في
+    الجدول، والتكرار ممنوع لكل (مستلم، قالب، كيان).
+    """
+
+    name = "Email outbox worker"
+    model = EmailOutbox
+    active_status = "sending"
+    done_status = "sent"
+    finished_column = "sent_at"
+    failed_column = None
+
+    def __init__(self):
+        super().__init__(
+            batch_size=int(os.getenv("EMAIL_OUTBOX_BATCH_SIZE", "20")),
+            max_attempts=int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", "5")),
+            retry_delay=float(os.getenv("EMAIL_OUTBOX_RETRY_DELAY", "30")),
+            lock_timeout=timedelta(seconds=int(os.getenv("EMAIL_OUTBOX_LOCK_TIMEOUT", "300"))),
+            poll_interval=float(os.getenv("EMAIL_OUTBOX_POLL_INTERVAL", "5")),
+        )
+
+        self.builders: Dict[str, EmailBuilder] = {
+            "store_welcome": email_service.build_store_welcome_email,
+            "store_reminder": email_service.build_store_reminder_email,
+            "store_connected": email_service.build_store_connected_email,
+        }
+        self._stats.update({"queued": 0, "duplicates": 0, "sent": 0, "batches": 0})
+
+    def enqueue(self, db: Session, template: str, recipient: str, entity_key: str, context: dict) -> bool:
+        """إضافة إيميل للصندوق ضمن معاملة الجلسة الحالية (بدون commit) - يرجع False للتكرار"""
+        stmt = dialect_insert(db, EmailOutbox.__table__).values(
+            template=template,
+            recipient=recipient,
+            entity_key=entity_key,
+            dedupe_key=f"{recipient}:{template}:{entity_key}",
+            context=context,
+            status="pending",
+            attempts=0,
+            available_at=datetime.utcnow(),
+            created_at=datetime.utcnow(),
+        ).on_conflict_do_nothing(index_elements=["dedupe_key"])
+
+        inserted = db.execute(stmt).rowcount != 0
+        if inserted:
+            self._stats["queued"] += 1
+            # إيقاظ الـ worker بعد commit المعاملة وليس قبله
+            event.listen(db, "after_commit", self._notify, once=True)
+        else:
+            self._stats["duplicates"] += 1
+        return inserted
+
+    def _as_dict(self, email: EmailOutbox) -> Dict:
+        return {
+            "id": email.id,
+            "template": email.template,
+            "recipient": email.recipient,
+            "context": email.context or {},
+            "attempts": email.attempts or 0,
+        }
+
+    async def process_batch(self) -> int:
+        """إرسال دفعة من الإيميلات المستحقة - يرجع عدد الإيميلات المحجوزة"""
+        emails = self._claim()
+        if not emails:
+            return 0
+
+        self._stats["batches"] += 1
+        # التوازي الفعلي محدود بحجم مجموعة جلسات SMTP
+        results = await asyncio.gather(*(self._deliver(email) for email in emails))
+
+        sent_ids = [email["id"] for email, error in zip(emails, results) if error is None]
+        self._mark_done(sent_ids)
+        self._stats["sent"] += len(sent_ids)
+        for email, error in zip(emails, results):
+            if error is None:
+                continue
+            if self._mark_failed(email, error):
+                logger.error(f"❌ Giving up on {email['template']} email to {email['recipient']}: {error}")
+            else:
+                logger.warning(f"⚠️ {email['template']} email to {email['recipient']} failed (attempt {email['attempts'] + 1}): {error}")
+
+        logger.info(f"✅ Email outbox batch: {len(sent_ids)}/{len(emails)} sent")
+        return len(emails)
+
+    async def _deliver(self, email: Dict) -> Optional[str]:
+        """إرسال إيميل واحد - يرجع None عند النجاح أو نص الخطأ"""
+        builder = self.builders.get(email["template"])
+        if builder is None:
+            return f"unknown template: {email['template']}"
+        try:
+            subject, html_content = builder(**email["context"])
+            if await email_service.send_email_smtp(email["recipient"], subject, html_content):
+                return None
+            return "smtp send failed"
+        except Exception as e:
+            return str(e)
+
+
+email_outbox = EmailOutboxWorker()
@@ -7,12 +7,14 @@ from email.mime.multipart import MIMEMultipart
 import os
 import asyncio
 import aiosmtplib
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 from datetime import datetime, timedelta
 import logging
-from jinja2 import Template
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Template, TemplateNotFound
 from pathlib import Path
 
+from app.services.smtp_pool import SMTPConnectionPool
+
 logger = logging.getLogger(__name__)
 
 class ZohoEmailService:
@@ -34,10 +36,26 @@ class ZohoEmailService:
         self.templates_dir = Path(__file__).parent.parent / "templates" / "emails"
         self.templates_dir.mkdir(parents=True, exist_ok=True)
         
+        # القوالب تُترجم مرة واحدة وتُحفظ في الذاكرة، وتُعاد ترجمتها فقط إذا تغيّر mtime الملف
+        bytecode_dir = os.getenv("EMAIL_TEMPLATE_BYTECODE_CACHE_DIR")
+        if bytecode_dir:
+            Path(bytecode_dir).mkdir(parents=True, exist_ok=True)
+        self.jinja_env = Environment(
+            loader=FileSystemLoader(str(self.templates_dir)),
+            auto_reload=True,
+            cache_size=int(os.getenv("EMAIL_TEMPLATE_CACHE_SIZE", "50")),
+            bytecode_cache=FileSystemBytecodeCache(bytecode_dir) if bytecode_dir else None,
+        )
+        self._default_template: Optional[Template] = None
+        self._string_templates: Dict[str, Template] = {}
+        
         # التحقق من الإعدادات
         if not self.username or not self.password:
             logger.error("Zoho email credentials not configured")
             raise ValueError("Zoho email credentials are required")
+        
+        # جلسات SMTP مسجّلة الدخول يُعاد استخدامها بين الرسائل
+        self.smtp_pool = SMTPConnectionPool(self.smtp_server, self.username, self.password)
             
         logger.info("Zoho Email Service initialized successfully")
 
@@ -77,37 +95,10 @@ class ZohoEmailService:
 
             logger.info(f"Sending email to {to_email}")
             
-            # محاولة إرسال عبر SSL (منفذ 465)
-            try:
-                async with aiosmtplib.SMTP(
-                    hostname=self.smtp_server,
-                    port=465,
-                    use_tls=True,
-                    timeout=60
-                ) as server:
-                    await server.login(self.username, self.password)
-                    await server.send_message(message)
-                    logger.info(f"Email sent successfully to {to_email}")
-                    
-                return True
-                
-            except Exception as ssl_error:
-                logger.warning(f"SSL failed, trying STARTTLS: {str(ssl_error)}")
-                
-                # محاولة إرسال عبر STARTTLS (منفذ 587)
-                async with aiosmtplib.SMTP(
-                    hostname=self.smtp_server,
-                    port=587,
-                    use_tls=False,
-                    start_tls=False,
-                    timeout=60
-                ) as server:
-                    await server.starttls()
-                    await server.login(self.username, self.password)
-                    await server.send_message(message)
-                    logger.info(f"Email sent successfully to {to_email} via STARTTLS")
-                    
-                return True
+            # إرسال عبر جلسة محفوظة (SSL 465 أو STARTTLS 587 حسب ما نجح)
+            await self.smtp_pool.send_message(message)
+            logger.info(f"Email sent successfully to {to_email}")
+            return True
 
         except aiosmtplib.SMTPAuthenticationError as auth_error:
             logger.error(f"SMTP authentication failed: {str(auth_error)}")
@@ -196,18 +187,27 @@ class ZohoEmailService:
             logger.error(f"Connection test failed: {str(e)}")
             return False
 
+    def get_template(self, template_name: str) -> Template:
+        """قالب مترجم من الذاكرة - القالب الافتراضي إذا لم يوجد ملف (بدون الكتابة في مجلد القوالب)"""
+        try:
+            return self.jinja_env.get_template(f"{template_name}.html")
+        except TemplateNotFound:
+            return self.get_default_compiled_template()
+
+    def get_default_compiled_template(self) -> Template:
+        """القالب الافتراضي مترجماً مرة واحدة"""
+        if self._default_template is None:
+            self._default_template = self.jinja_env.from_string(self.get_default_template())
+        return self._default_template
+
     def load_template(self, template_name: str) -> str:
-        """تحميل قالب HTML"""
+        """تحميل قالب HTML (القالب الافتراضي إذا لم يوجد الملف)"""
         template_path = self.templates_dir / f"{template_name}.html"
         
         if template_path.exists():
             with open(template_path, 'r', encoding='utf-8') as f:
                 return f.read()
-        else:
-            default_template = self.get_default_template()
-            with open(template_path, 'w', encoding='utf-8') as f:
-                f.write(default_template)
-            return default_template
+        return self.get_default_template()
 
     def get_default_template(self) -> str:
         """قالب HTML افتراضي احترافي"""
@@ -339,32 +339,54 @@ class ZohoEmailService:
 </html>
         """
 
+    def _template_defaults(self) -> Dict[str, Any]:
+        now = datetime.now()
+        return {
+            'frontend_url': self.frontend_url,
+            'support_email': self.support_email,
+            'current_year': now.year,
+            'current_date': now.strftime('%Y-%m-%d')
+        }
+
+    def render_email(self, template_name: str, variables: Dict[str, Any]) -> str:
+        """تطبيق المتغيرات على قالب مسمى باستخدام النسخة المترجمة"""
+        try:
+            template = self.get_template(template_name)
+        except Exception as e:
+            logger.error(f"Template loading error ({template_name}): {str(e)}")
+            template = self.get_default_compiled_template()
+        try:
+            variables.update(self._template_defaults())
+            return template.render(**variables)
+        except Exception as e:
+            logger.error(f"Template rendering error: {str(e)}")
+            return self.load_template(template_name)
+
     def render_template(self, template_content: str, variables: Dict[str, Any]) -> str:
         """تطبيق المتغيرات على القالب"""
         try:
-            default_vars = {
-                'frontend_url': self.frontend_url,
-                'support_email': self.support_email,
-                'current_year': datetime.now().year,
-                'current_date': datetime.now().strftime('%Y-%m-%d')
-            }
-            variables.update(default_vars)
+            variables.update(self._template_defaults())
             
-            template = Template(template_content)
+            template = self._string_templates.get(template_content)
+            if template is None:
+                if len(self._string_templates) >= self.jinja_env.cache_size:
+                    self._string_templates.clear()
+                template = self.jinja_env.from_string(template_content)
+                self._string_templates[template_content] = template
             return template.render(**variables)
         except Exception as e:
             logger.error(f"Template rendering error: {str(e)}")
             return template_content
 
-    async def send_store_welcome_email(
+    def build_store_welcome_email(
         self,
         store_email: str,
         store_name: str,
         store_id: str,
         verification_token: str,
         products_count: int = 0
-    ) -> bool:
-        """إرسال إيميل ترحيب للمتجر الجديد"""
+    ) -> Tuple[str, str]:
+        """عنوان ومحتوى إيميل الترحيب"""
         
         verification_link = f"{self.frontend_url}/connect-store?token={verification_token}"
         
@@ -405,24 +427,36 @@ class ZohoEmailService:
             'content': content
         }
         
-        template_content = self.load_template('store_welcome')
-        html_content = self.render_template(template_content, variables)
+        html_content = self.render_email('store_welcome', variables)
+        
+        return f"🎉 Welcome! {store_name} connected successfully", html_content
+
+    async def send_store_welcome_email(
+        self,
+        store_email: str,
+        store_name: str,
+        store_id: str,
+        verification_token: str,
+        products_count: int = 0
+    ) -> bool:
+        """إرسال إيميل ترحيب للمتجر الجديد"""
+        subject, html_content = self.build_store_welcome_email(store_email, store_name, store_id, verification_token, products_count)
         
         return await self.send_email_with_retry(
             to_email=store_email,
-            subject=f"🎉 Welcome! {store_name} connected successfully",
+            subject=subject,
             html_content=html_content
         )
 
-    async def send_store_reminder_email(
+    def build_store_reminder_email(
         self,
         store_email: str,
         store_name: str,
         store_id: str,
         verification_token: str,
         days_remaining: int
-    ) -> bool:
-        """إرسال إيميل تذكير للمتجر"""
+    ) -> Tuple[str, str]:
+        """عنوان ومحتوى إيميل التذكير"""
         
         verification_link = f"{self.frontend_url}/connect-store?token={verification_token}"
         
@@ -462,23 +496,35 @@ class ZohoEmailService:
             'content': content
         }
         
-        template_content = self.load_template('store_reminder')
-        html_content = self.render_template(template_content, variables)
+        html_content = self.render_email('store_reminder', variables)
+        
+        return f"⏰ Important reminder: Connect {store_name} ({days_remaining} days remaining)", html_content
+
+    async def send_store_reminder_email(
+        self,
+        store_email: str,
+        store_name: str,
+        store_id: str,
+        verification_token: str,
+        days_remaining: int
+    ) -> bool:
+        """إرسال إيميل تذكير للمتجر"""
+        subject, html_content = self.build_store_reminder_email(store_email, store_name, store_id, verification_token, days_remaining)
         
         return await self.send_email_with_retry(
             to_email=store_email,
-            subject=f"⏰ Important reminder: Connect {store_name} ({days_remaining} days remaining)",
+            subject=subject,
             html_content=html_content
         )
 
-    async def send_store_connected_email(
+    def build_store_connected_email(
         self,
         user_email: str,
         user_name: str,
         store_name: str,
         products_synced: int = 0
-    ) -> bool:
-        """إرسال إيميل تأكيد الربط"""
+    ) -> Tuple[str, str]:
+        """عنوان ومحتوى إيميل تأكيد الربط"""
         
         dashboard_link = f"{self.frontend_url}/products"
         
@@ -519,12 +565,23 @@ class ZohoEmailService:
             'content': content
         }
         
-        template_content = self.load_template('store_connected')
-        html_content = self.render_template(template_content, variables)
+        html_content = self.render_email('store_connected', variables)
+        
+        return f"🎉 Store {store_name} connected successfully!", html_content
+
+    async def send_store_connected_email(
+        self,
+        user_email: str,
+        user_name: str,
+        store_name: str,
+        products_synced: int = 0
+    ) -> bool:
+        """إرسال إيميل تأكيد الربط"""
+        subject, html_content = self.build_store_connected_email(user_email, user_name, store_name, products_synced)
         
         return await self.send_email_with_retry(
             to_email=user_email,
-            subject=f"🎉 Store {store_name} connected successfully!",
+            subject=subject,
             html_content=html_content
         )
 
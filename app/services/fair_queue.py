@@ -0,0 +1,196 @@
+# app/services/fair_queue.py
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _Waiter:
+    __slots__ = ("future", "cost", "enqueued_at")
+
+    def __init__(self, future: asyncio.Future, cost: float):
+        self.future = future
+        self.cost = cost
+        self.enqueued_at = time.monotonic()
+
+
+class _Tenant:
+    __slots__ = ("key", "weight", "deficit", "waiters", "active", "stats")
+
+    def __init__(self, key: str, weight: float):
+        self.key = key
+        self.weight = weight
+        self.deficit = 0.0
+        self.waiters: Deque[_Waiter] = deque()
+        self.active = 0
+        self.stats = {"jobs": 0, "wait_total": 0.0, "wait_max": 0.0, "wait_last": 0.0}
+
+
+class WeightedFairQueue:
+    """توزيع عادل لعدد محدود من الـ slots بين المستأجرين (المتاجر) بخوارزمية Deficit Round Robin
+
+    كل متجر له طابور خاص، والمتاجر التي لديها عمل تُخدم بالتناوب حسب وزنها
+    وتكلفة كل مهمة، فلا يستطيع متجر كبير احتلال كل الـ slots وتأخير المتاجر
+    الصغيرة. `max_per_tenant` يحد ما يشغله متجر واحد في نفس الوقت.
+    """
+
+    def __init__(self, name: str, capacity: int, max_per_tenant: Optional[int] = None, quantum: float = 1.0):
+        self.name = name
+        self.capacity = max(1, capacity)
+        self.max_per_tenant = max_per_tenant
+        self.quantum = quantum
+        self.weights: Dict[str, float] = {}
+        self._tenants: Dict[str, _Tenant] = {}
+        self._ring: Deque[_Tenant] = deque()  # المتاجر التي لديها مهام منتظرة
+        self._in_use = 0
+
+    def set_weight(self, tenant: str, weight: float):
+        """وزن أعلى = حصة أكبر من الـ slots عند التزاحم"""
+        self.weights[str(tenant)] = max(0.01, weight)
+        if str(tenant) in self._tenants:
+            self._tenants[str(tenant)].weight = self.weights[str(tenant)]
+
+    @asynccontextmanager
+    async def slot(self, tenant, cost: float = 1.0):
+        """انتظار slot للمتجر ثم تحريره عند الخروج"""
+        key = str(tenant)
+        state = self._tenants.get(key)
+        if state is None:
+            state = _Tenant(key, self.weights.get(key, 1.0))
+            self._tenants[key] = state
+
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), max(cost, 0.01))
+        if not state.waiters:
+            self._ring.append(state)
+        state.waiters.append(waiter)
+        self._dispatch()
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # حصل على slot لحظة الإلغاء - نعيده
+                self._release(state)
+            else:
+                self._forget(state, waiter)
+            raise
+
+        waited = time.monotonic() - waiter.enqueued_at
+        stats = state.stats
+        stats["jobs"] += 1
+        stats["wait_total"] += waited
+        stats["wait_last"] = waited
+        stats["wait_max"] = max(stats["wait_max"], waited)
+
+        try:
+            yield
+        finally:
+            self._release(state)
+
+    def _eligible(self, state: _Tenant) -> bool:
+        return self.max_per_tenant is None or state.active < self.max_per_tenant
+
+    def _dispatch(self):
+        while self._in_use < self.capacity and self._ring:
+            state = self._next_tenant()
+            if state is None:
+                return
+
+            waiter = state.waiters.popleft()
+            if not waiter.future.done():
+                state.deficit -= waiter.cost
+                state.active += 1
+                self._in_use += 1
+                waiter.future.set_result(None)
+
+            if not state.waiters:
+                # المتجر خرج من الدورة - لا يحتفظ برصيد متراكم
+                self._ring.remove(state)
+                state.deficit = 0.0
+
+    def _next_tenant(self) -> Optional[_Tenant]:
+        """المتجر التالي في الدورة الذي يكفي رصيده لتكلفة مهمته الأولى"""
+        eligible = [state for state in self._ring if self._eligible(state)]
+        if not eligible:
+            return None
+
+        while True:
+            for _ in range(len(self._ring)):
+                state = self._ring[0]
+                if self._eligible(state) and state.deficit >= state.waiters[0].cost:
+                    return state
+                self._ring.rotate(-1)
+                if self._eligible(state):
+                    state.deficit += self.quantum * state.weight
+
+            # لا أحد يكفي رصيده - نقفز مباشرة بعدد الدورات اللازمة لأقرب متجر
+            rounds = min(
+                math.ceil((state.waiters[0].cost - state.deficit) / (self.quantum * state.weight))
+                for state in eligible
+            )
+            if rounds > 0:
+                for state in eligible:
+                    state.deficit += rounds * self.quantum * state.weight
+
+    def _release(self, state: _Tenant):
+        state.active -= 1
+        self._in_use -= 1
+        self._dispatch()
+
+    def _forget(self, state: _Tenant, waiter: _Waiter):
+        try:
+            state.waiters.remove(waiter)
+        except ValueError:
+            return
+        if not state.waiters and state in self._ring:
+            self._ring.remove(state)
+            state.deficit = 0.0
+        self._dispatch()
+
+    def get_metrics(self) -> Dict:
+        """أزمنة الانتظار لكل متجر (بالثواني) وحالة الـ slots"""
+        tenants = {}
+        for key, state in self._tenants.items():
+            jobs = state.stats["jobs"]
+            tenants[key] = {
+                "waiting": len(state.waiters),
+                "active": state.active,
+                "jobs": jobs,
+                "avg_wait": round(state.stats["wait_total"] / jobs, 3) if jobs else 0.0,
+                "max_wait": round(state.stats["wait_max"], 3),
+                "last_wait": round(state.stats["wait_last"], 3),
+            }
+        return {
+            "capacity": self.capacity,
+            "in_use": self._in_use,
+            "waiting": sum(len(state.waiters) for state in self._ring),
+            "tenants": tenants,
+        }
+
+
+sync_fair_queue = WeightedFairQueue(
+    "sync",
+    capacity=int(os.getenv("FAIR_SYNC_SLOTS", "4")),
+    max_per_tenant=1,
+)
+webhook_fair_queue = WeightedFairQueue(
+    "webhooks",
+    capacity=int(os.getenv("FAIR_WEBHOOK_SLOTS", "8")),
+    # أحداث التاجر الواحد تُعالج بالترتيب
+    max_per_tenant=1,
+)
+push_fair_queue = WeightedFairQueue(
+    "push",
+    capacity=int(os.getenv("FAIR_PUSH_SLOTS", "16")),
+    max_per_tenant=int(os.getenv("SALLA_PUSH_CONCURRENCY", "4")),
+)
+
+
+def get_fair_queue_metrics() -> Dict:
+    return {queue.name: queue.get_metrics() for queue in (sync_fair_queue, webhook_fair_queue, push_fair_queue)}
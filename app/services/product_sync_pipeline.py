@@ -0,0 +1,139 @@
+# app/services/product_sync_pipeline.py
+import asyncio
+import os
+from typing import Callable, Dict, List, Optional, Tuple
+import logging
+
+from sqlalchemy.orm import Session
+
+from app.models.salla import SallaStore
+from app.services.salla_api import SallaAPIService
+from app.services.product_sync_service import product_sync_service, build_product_info
+
+logger = logging.getLogger(__name__)
+
+# نهاية تدفق الصفحات بين المراحل
+_DONE = object()
+
+BatchCallback = Callable[[int, Optional[int], Dict[str, int]], None]
+
+
+class ProductSyncPipeline:
+    """مزامنة المنتجات كسلسلة مراحل: جلب الصفحات → تطبيع البيانات → كتابة الدفعات
+
+    المراحل متصلة بطوابير محدودة الحجم، فإذا تأخر الكاتب يتوقف الجلب تلقائياً
+    (backpressure) ولا يبقى في الذاكرة إلا عدد ثابت من الصفحات. الكاتب يحمّل
+    بصمات منتجات الدفعة فقط ثم يفرّغ الجلسة بعد كل دفعة.
+    """
+
+    def __init__(self, api: SallaAPIService, queue_size: Optional[int] = None):
+        self.api = api
+        self.queue_size = queue_size or int(os.getenv("SALLA_SYNC_QUEUE_SIZE", "4"))
+
+    async def run(
+        self,
+        db: Session,
+        store: SallaStore,
+        per_page: int,
+        concurrency: int = 1,
+        start_page: int = 1,
+        on_batch: Optional[BatchCallback] = None,
+        keep: Tuple = (),
+        on_fetch_stop: Optional[Callable[[int, Dict], None]] = None
+    ) -> Dict[str, int]:
+        """تشغيل المراحل حتى آخر صفحة - `on_batch` تُستدعى بعد كتابة كل صفحة (لحفظ نقطة الاستئناف)
+        و `on_fetch_stop` عند توقف الجلب بسبب صفحة فاشلة.
+
+        `keep` كائنات ORM تبقى في الجلسة بعد تفريغها (المتجر وسجل التشغيل مثلاً).
+        """
+        pages: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        batches: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+
+        stages = [
+            asyncio.create_task(self._fetch(store, per_page, concurrency, start_page, pages, on_fetch_stop)),
+            asyncio.create_task(self._normalize(store.id, pages, batches)),
+        ]
+
+        counts = {"new": 0, "changed": 0, "unchanged": 0}
+        try:
+            while True:
+                item = await self._get(batches, stages)
+                if item is _DONE:
+                    break
+
+                page, total_pages, rows = item
+                existing = product_sync_service.load_existing_products(
+                    db, store.id, [row["salla_product_id"] for row in rows]
+                )
+                result = product_sync_service.upsert_products(db, rows, existing)
+                for key, value in result.items():
+                    counts[key] += value
+
+                if on_batch is not None:
+                    on_batch(page, total_pages, result)
+                self._release(db, keep)
+        finally:
+            for stage in stages:
+                stage.cancel()
+            await asyncio.gather(*stages, return_exceptions=True)
+
+        return counts
+
+    async def _fetch(
+        self,
+        store: SallaStore,
+        per_page: int,
+        concurrency: int,
+        start_page: int,
+        pages: asyncio.Queue,
+        on_stop: Optional[Callable[[int, Dict], None]] = None
+    ):
+        async for page, products_data in self.api.iter_product_pages(
+            store.access_token,
+            per_page=per_page,
+            concurrency=concurrency,
+            start_page=start_page,
+            store=store,
+            on_stop=on_stop
+        ):
+            await pages.put((page, products_data))
+        await pages.put(_DONE)
+
+    async def _normalize(self, store_id: int, pages: asyncio.Queue, batches: asyncio.Queue):
+        while True:
+            item = await pages.get()
+            if item is _DONE:
+                break
+
+            page, products_data = item
+            rows: List[dict] = []
+            for product_data in products_data["data"]:
+                try:
+                    rows.append(build_product_info(store_id, product_data))
+                except Exception as product_error:
+                    logger.error(f"Error processing product {product_data.get('id')}: {product_error}")
+                    continue
+
+            total_pages = products_data.get("pagination", {}).get("totalPages")
+            await batches.put((page, total_pages, rows))
+        await batches.put(_DONE)
+
+    @staticmethod
+    async def _get(queue: asyncio.Queue, stages: List[asyncio.Task]):
+        """انتظار العنصر التالي مع التوقف فوراً إذا فشلت مرحلة سابقة"""
+        getter = asyncio.ensure_future(queue.get())
+        while not getter.done():
+            failed = [stage for stage in stages if stage.done() and not stage.cancelled() and stage.exception()]
+            if failed:
+                getter.cancel()
+                raise failed[0].exception()
+            await asyncio.wait([getter, *[stage for stage in stages if not stage.done()]], return_when=asyncio.FIRST_COMPLETED)
+        return getter.result()
+
+    @staticmethod
+    def _release(db: Session, keep: Tuple):
+        """تفريغ الجلسة بعد كل دفعة حتى لا تكبر خريطة الهوية مع حجم المتجر"""
+        db.flush()
+        for obj in list(db.identity_map.values()):
+            if obj not in keep:
+                db.expunge(obj)
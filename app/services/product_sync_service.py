@@ -0,0 +1,147 @@
+# app/services/product_sync_service.py
+from sqlalchemy.orm import Session
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime
+import hashlib
+import json
+import logging
+
+from app.models.salla import SallaProduct
+from app.utils.db import dialect_insert, rows_per_statement
+
+logger = logging.getLogger(__name__)
+
+# الحقول التي تُحدَّث من سلة عند وجود المنتج مسبقاً
+SYNCED_FIELDS = [
+    "name", "description", "sku", "url_slug",
+    "price_amount", "price_currency",
+    "category_id", "category_name", "images",
+    "seo_title", "seo_description", "status",
+    "last_synced_at", "needs_update", "content_hash",
+]
+
+# الحقول التي تدخل في بصمة المحتوى (بدون حقول التوقيت والحالة المحلية)
+HASHED_FIELDS = [
+    "name", "description", "sku", "url_slug",
+    "price_amount", "price_currency",
+    "category_id", "category_name", "images",
+    "seo_title", "seo_description", "status",
+]
+
+
+def build_product_info(store_id: int, product_data: dict) -> dict:
+    """تحويل بيانات منتج سلة إلى حقول SallaProduct"""
+    price_data = product_data.get("price", {})
+    category_data = product_data.get("category", {})
+    metadata = product_data.get("metadata", {})
+    
+    return {
+        "store_id": store_id,
+        "salla_product_id": str(product_data["id"]),
+        "name": product_data.get("name", ""),
+        "description": product_data.get("description", ""),
+        "sku": product_data.get("sku", ""),
+        "url_slug": product_data.get("url", ""),
+        "price_amount": str(price_data.get("amount", 0)) if price_data else "0",
+        "price_currency": price_data.get("currency", "SAR") if price_data else "SAR",
+        "category_id": str(category_data.get("id", "")) if category_data else "",
+        "category_name": category_data.get("name", "") if category_data else "",
+        "images": product_data.get("images", []),
+        "seo_title": metadata.get("title", "") if metadata else "",
+        "seo_description": metadata.get("description", "") if metadata else "",
+        "status": product_data.get("status", "sale"),
+        "last_synced_at": datetime.utcnow(),
+        "needs_update": False
+    }
+
+
+def compute_content_hash(product_info: dict) -> str:
+    """بصمة ثابتة لبيانات المنتج بعد التطبيع (لا تتأثر بترتيب المفاتيح)"""
+    normalized = {field: product_info.get(field) for field in HASHED_FIELDS}
+    payload = json.dumps(normalized, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ProductSyncService:
+    """كتابة منتجات سلة المتزامنة دفعة واحدة لكل صفحة"""
+    
+    def load_existing_products(
+        self,
+        db: Session,
+        store_id: int,
+        salla_product_ids: Optional[List[str]] = None
+    ) -> Dict[str, Tuple[Optional[int], Optional[str]]]:
+        """تحميل خريطة salla_product_id -> (id, content_hash) لمنتجات المتجر في استعلام واحد
+
+        مع `salla_product_ids` تُحمّل منتجات الدفعة فقط (ذاكرة ثابتة مهما كبر المتجر).
+        """
+        query = db.query(SallaProduct.salla_product_id, SallaProduct.id, SallaProduct.content_hash).filter(
+            SallaProduct.store_id == store_id
+        )
+        if salla_product_ids is not None:
+            query = query.filter(SallaProduct.salla_product_id.in_(salla_product_ids))
+        rows = query.all()
+        return {
+            salla_product_id: (product_id, content_hash)
+            for salla_product_id, product_id, content_hash in rows
+        }
+    
+    def upsert_products(
+        self,
+        db: Session,
+        rows: List[dict],
+        existing: Dict[str, Tuple[Optional[int], Optional[str]]]
+    ) -> Dict[str, int]:
+        """إدراج/تحديث المنتجات بـ INSERT ... ON CONFLICT متعدد الصفوف
+
+        المنتجات التي لم تتغير بصمتها تُتخطى تماماً (بدون تحديث updated_at).
+        `existing` هي الخريطة المحمّلة مسبقاً وتُحدَّث بما تمت كتابته.
+        لا يتم عمل commit هنا - المستدعي يحدد حدود المعاملة.
+        """
+        # إزالة التكرار داخل الدفعة (PostgreSQL يرفض تحديث نفس الصف مرتين)
+        unique_rows = list({row["salla_product_id"]: row for row in rows}.values())
+        counts = {"new": 0, "changed": 0, "unchanged": 0}
+        
+        now = datetime.utcnow()
+        pending_rows = []
+        for row in unique_rows:
+            row["content_hash"] = compute_content_hash(row)
+            current = existing.get(row["salla_product_id"])
+            
+            if current is None:
+                counts["new"] += 1
+            elif current[1] == row["content_hash"]:
+                counts["unchanged"] += 1
+                continue
+            else:
+                counts["changed"] += 1
+            
+            row.setdefault("created_at", now)
+            row["updated_at"] = now
+            pending_rows.append(row)
+        
+        if not pending_rows:
+            return counts
+        
+        table = SallaProduct.__table__
+        chunk_size = rows_per_statement(db, len(pending_rows[0]))
+        
+        for start in range(0, len(pending_rows), chunk_size):
+            chunk = pending_rows[start:start + chunk_size]
+            stmt = dialect_insert(db, table).values(chunk)
+            update_columns = {field: stmt.excluded[field] for field in SYNCED_FIELDS + ["updated_at"]}
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.store_id, table.c.salla_product_id],
+                set_=update_columns
+            )
+            db.execute(stmt)
+        
+        for row in pending_rows:
+            # المعرّف الفعلي للمنتجات الجديدة غير مطلوب هنا، يكفي تسجيل البصمة
+            product_id = existing.get(row["salla_product_id"], (None, None))[0]
+            existing[row["salla_product_id"]] = (product_id, row["content_hash"])
+        
+        return counts
+
+
+product_sync_service = ProductSyncService()
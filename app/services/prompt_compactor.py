@@ -0,0 +1,119 @@
+# app/services/prompt_compactor.py
+import html
+import os
+import re
+from typing import Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+except ImportError:  # اختياري - بدونه نستخدم تقديراً بعدد الأحرف
+    tiktoken = None
+
+_SCRIPT_STYLE_RE = re.compile(r"<(script|style)\b[^>]*>.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+_BLOCK_TAG_RE = re.compile(r"<\s*(br|/p|/div|/li|/h[1-6]|/tr)\b[^>]*>", re.IGNORECASE)
+_TAG_RE = re.compile(r"<[^>]+>")
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?؟؛])\s+|\n+")
+_SPACES_RE = re.compile(r"[ \t\r\f\v\u00a0]+")
+
+
+class PromptCompactor:
+    """تجهيز النصوص قبل إدخالها في البرومبت: إزالة HTML، ضغط المسافات، حذف الجمل
+    المكررة، ثم القص إلى ميزانية توكنز لكل خدمة
+
+    عدد التوكنز يُحسب بـ tiktoken إذا كان مثبتاً، وإلا بتقدير ~3 أحرف لكل توكن.
+    """
+
+    def __init__(self):
+        self.budgets = {
+            "seo": int(os.getenv("AI_PROMPT_BUDGET_SEO", "400")),
+            "description": int(os.getenv("AI_PROMPT_BUDGET_DESCRIPTION", "300")),
+        }
+        self._encoding = None
+        if tiktoken is not None:
+            try:
+                self._encoding = tiktoken.get_encoding(os.getenv("AI_PROMPT_TOKENIZER", "cl100k_base"))
+            except Exception as e:
+                logger.warning(f"⚠️ tiktoken encoding unavailable, using character estimate: {str(e)}")
+        self._stats = {"calls": 0, "tokens_before": 0, "tokens_after": 0, "truncated": 0}
+
+    def estimate_tokens(self, text: str) -> int:
+        if not text:
+            return 0
+        if self._encoding is not None:
+            return len(self._encoding.encode(text))
+        # تقدير تقريبي: النص العربي حوالي 3 أحرف لكل توكن
+        return len(text) // 3 + 1
+
+    @staticmethod
+    def strip_html(text: str) -> str:
+        text = _SCRIPT_STYLE_RE.sub(" ", text)
+        text = _BLOCK_TAG_RE.sub("\n", text)
+        text = _TAG_RE.sub(" ", text)
+        return html.unescape(text)
+
+    @staticmethod
+    def collapse_whitespace(text: str) -> str:
+        lines = (_SPACES_RE.sub(" ", line).strip() for line in text.split("\n"))
+        return "\n".join(line for line in lines if line)
+
+    @staticmethod
+    def dedupe_sentences(text: str) -> str:
+        seen = set()
+        kept = []
+        for sentence in _SENTENCE_SPLIT_RE.split(text):
+            sentence = sentence.strip()
+            if not sentence:
+                continue
+            key = sentence.casefold()
+            if key in seen:
+                continue
+            seen.add(key)
+            kept.append(sentence)
+        return " ".join(kept)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """قص النص إلى max_tokens عند حدود كلمة"""
+        if self.estimate_tokens(text) <= max_tokens:
+            return text
+        if self._encoding is not None:
+            text = self._encoding.decode(self._encoding.encode(text)[:max_tokens])
+        else:
+            text = text[:max_tokens * 3]
+        cut = text.rfind(" ")
+        if cut > len(text) // 2:
+            text = text[:cut]
+        return text.rstrip() + "…"
+
+    def compact(self, text: Optional[str], service: str = "seo") -> str:
+        """النص بعد التجهيز - يسجل التوكنز الموفرة لكل استدعاء"""
+        if not text:
+            return ""
+
+        before = self.estimate_tokens(text)
+        compacted = self.dedupe_sentences(self.collapse_whitespace(self.strip_html(text)))
+        budget = self.budgets.get(service)
+        if budget and self.estimate_tokens(compacted) > budget:
+            compacted = self.truncate(compacted, budget)
+            self._stats["truncated"] += 1
+        after = self.estimate_tokens(compacted)
+
+        self._stats["calls"] += 1
+        self._stats["tokens_before"] += before
+        self._stats["tokens_after"] += after
+        if before > after:
+            logger.info(f"🔄 Prompt compaction ({service}): {before} → {after} tokens (saved {before - after})")
+        return compacted
+
+    def get_metrics(self) -> Dict:
+        return {
+            **self._stats,
+            "tokens_saved": self._stats["tokens_before"] - self._stats["tokens_after"],
+            "tokenizer": "tiktoken" if self._encoding is not None else "estimate",
+            "budgets": self.budgets,
+        }
+
+
+prompt_compactor = PromptCompactor()
@@ -1,19 +1,140 @@
 # app/services/salla_api.py - محدث للعمل مع Render Backend
 import httpx
+import asyncio
 import hashlib
 import hmac
 import os
-from typing import Dict, Optional
+from collections import deque
+from typing import AsyncIterator, Callable, Dict, Optional, Tuple
 import logging
 
+from app.models.salla import SallaStore
+from app.services.salla_rate_limiter import salla_rate_limiter
+from app.services.salla_token_manager import salla_token_manager
+
 logger = logging.getLogger(__name__)
 
+SALLA_API_HOST = "https://api.salla.dev"
+SALLA_ACCOUNTS_HOST = "https://accounts.salla.sa"
+
+
+class SallaHTTPPool:
+    """عميل HTTP مشترك وطويل العمر لطلبات سلة (يُنشأ ويُغلق مع دورة حياة التطبيق)
+
+    يحتفظ بعميل منفصل لكل host حتى يكون لكل منهما حد اتصالات خاص به،
+    ويعيد استخدام اتصالات TCP/TLS بدلاً من فتح اتصال جديد في كل طلب.
+    """
+
+    def __init__(self):
+        self.max_connections = int(os.getenv("SALLA_HTTP_MAX_CONNECTIONS", "50"))
+        self.max_keepalive_connections = int(os.getenv("SALLA_HTTP_MAX_KEEPALIVE", "20"))
+        self.keepalive_expiry = float(os.getenv("SALLA_HTTP_KEEPALIVE_EXPIRY", "30"))
+        self.timeout = float(os.getenv("SALLA_HTTP_TIMEOUT", "30"))
+        self.http2 = os.getenv("SALLA_HTTP2", "true").lower() == "true"
+
+        if self.http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("⚠️ h2 package not installed, falling back to HTTP/1.1 for Salla")
+                self.http2 = False
+
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._transport: Optional[httpx.AsyncBaseTransport] = None
+        self._stats = {
+            "requests": 0,
+            "new_connections": 0,
+            "http2_requests": 0,
+        }
+
+    async def startup(self, transport: Optional[httpx.AsyncBaseTransport] = None):
+        """تهيئة العملاء عند بدء التطبيق (يمكن تمرير transport بديل للاختبار)"""
+        self._transport = transport
+        for host in (SALLA_API_HOST, SALLA_ACCOUNTS_HOST):
+            self._get_client(host)
+        logger.info(
+            f"✅ Salla HTTP pool started (http2={self.http2}, "
+            f"max_connections={self.max_connections}/host, keepalive={self.max_keepalive_connections})"
+        )
+
+    async def shutdown(self):
+        """إغلاق جميع الاتصالات عند إيقاف التطبيق"""
+        clients = list(self._clients.values())
+        self._clients = {}
+        for client in clients:
+            await client.aclose()
+        logger.info("🛑 Salla HTTP pool closed")
+
+    def client_for(self, url: str) -> httpx.AsyncClient:
+        """الحصول على العميل المشترك المناسب للرابط"""
+        host = SALLA_ACCOUNTS_HOST if url.startswith(SALLA_ACCOUNTS_HOST) else SALLA_API_HOST
+        return self._get_client(host)
+
+    def _get_client(self, host: str) -> httpx.AsyncClient:
+        client = self._clients.get(host)
+        if client is None or client.is_closed:
+            limits = httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            )
+            kwargs = {
+                "timeout": self.timeout,
+                "limits": limits,
+                "event_hooks": {"request": [self._on_request]},
+            }
+            if self._transport is not None:
+                kwargs["transport"] = self._transport
+            else:
+                kwargs["http2"] = self.http2
+            client = httpx.AsyncClient(**kwargs)
+            self._clients[host] = client
+        return client
+
+    async def _on_request(self, request: httpx.Request):
+        self._stats["requests"] += 1
+        request.extensions["trace"] = self._trace
+
+    async def _trace(self, event_name: str, info: Dict):
+        if event_name == "connection.connect_tcp.complete":
+            self._stats["new_connections"] += 1
+        elif event_name == "http2.send_request_headers.started":
+            self._stats["http2_requests"] += 1
+
+    def get_metrics(self) -> Dict:
+        """إحصائيات إعادة استخدام الاتصالات"""
+        requests = self._stats["requests"]
+        new_connections = self._stats["new_connections"]
+        reused = max(0, requests - new_connections)
+        return {
+            "http2_enabled": self.http2,
+            "open_clients": len(self._clients),
+            "requests": requests,
+            "new_connections": new_connections,
+            "reused_connections": reused,
+            "reuse_ratio": round(reused / requests, 3) if requests else 0.0,
+            "http2_requests": self._stats["http2_requests"],
+            "limits": {
+                "max_connections_per_host": self.max_connections,
+                "max_keepalive_connections": self.max_keepalive_connections,
+                "keepalive_expiry": self.keepalive_expiry,
+            },
+        }
+
+
+# عميل مشترك لجميع نسخ SallaAPIService
+salla_http = SallaHTTPPool()
+
+
 class SallaAPIService:
     
     def __init__(self):
-        self.base_url = "https://api.salla.dev/admin/v2"
-        self.auth_url = "https://accounts.salla.sa/oauth2/auth"
-        self.token_url = "https://accounts.salla.sa/oauth2/token"
+        self.base_url = f"{SALLA_API_HOST}/admin/v2"
+        self.auth_url = f"{SALLA_ACCOUNTS_HOST}/oauth2/auth"
+        self.token_url = f"{SALLA_ACCOUNTS_HOST}/oauth2/token"
+        self.http = salla_http
+        self.rate_limiter = salla_rate_limiter
+        self.token_manager = salla_token_manager
         
         # التحقق من متغيرات البيئة المطلوبة
         self.client_id = os.getenv("SALLA_CLIENT_ID")
@@ -26,6 +147,71 @@ class SallaAPIService:
             logger.warning(f"Client Secret: {'✅' if self.client_secret else '❌'}")
             logger.warning(f"Backend URL: {'✅' if self.backend_url else '❌'}")
     
+    async def _send(
+        self,
+        method: str,
+        url: str,
+        access_token: Optional[str] = None,
+        retry: bool = True,
+        headers: Optional[Dict] = None,
+        store: Optional[SallaStore] = None,
+        merchant_id: Optional[str] = None,
+        **kwargs
+    ) -> httpx.Response:
+        """إرسال طلب عبر العميل المشترك مع احترام حصة التاجر وإعادة المحاولة عند 429/5xx
+
+        عند تمرير `store` يُؤخذ رمز الوصول من مدير الرموز (مع تحديثه قبل انتهائه)
+        ويُعاد الطلب مرة واحدة برمز جديد إذا رفضت سلة الرمز الحالي (401).
+        حصة المعدل مفتاحها رقم التاجر (`store` أو `merchant_id`)، والطلب بدونهما
+        (قبل معرفة التاجر) لا يُحسب على أي حصة.
+        """
+        client = self.http.client_for(url)
+        request_headers = dict(headers or {})
+        key = str(merchant_id) if merchant_id else None
+        if store is not None:
+            access_token = await self.token_manager.get_access_token(store, self)
+            key = str(store.store_id)
+        if access_token:
+            request_headers["Authorization"] = f"Bearer {access_token}"
+        
+        token_refreshed = False
+        attempt = 0
+        while True:
+            if key:
+                await self.rate_limiter.acquire(key)
+            
+            try:
+                response = await client.request(method, url, headers=request_headers, **kwargs)
+            except httpx.TransportError as transport_error:
+                if not retry or not self.rate_limiter.should_retry(None, attempt):
+                    raise
+                logger.warning(f"⚠️ {method} {url} failed ({transport_error.__class__.__name__}), retrying...")
+                await self.rate_limiter.backoff(attempt)
+                attempt += 1
+                continue
+            
+            if key:
+                self.rate_limiter.record_response(key, response)
+            
+            if response.status_code == 401 and store is not None and store.refresh_token and not token_refreshed:
+                token_refreshed = True
+                try:
+                    access_token = await self.token_manager.refresh(store, self, stale_token=access_token)
+                except Exception as refresh_error:
+                    logger.error(f"❌ Could not refresh token after 401: {str(refresh_error)}")
+                    return response
+                request_headers["Authorization"] = f"Bearer {access_token}"
+                continue
+            
+            if retry and response.status_code in self.rate_limiter.RETRY_STATUSES \
+                    and self.rate_limiter.should_retry(response, attempt):
+                logger.warning(f"⚠️ {method} {url} returned {response.status_code}, retrying (attempt {attempt + 1})")
+                await self.rate_limiter.backoff(attempt)
+                attempt += 1
+                continue
+            
+            return response
+    
     def get_authorization_url(self, state: str) -> str:
         """إنشاء رابط التفويض - محدث لاستخدام Backend URL"""
         if not self.client_id or not self.backend_url:
@@ -72,25 +258,26 @@ class SallaAPIService:
         }
         
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    self.token_url, 
-                    data=payload,
-                    headers={"Content-Type": "application/x-www-form-urlencoded"}
-                )
-                
-                result = response.json()
-                
-                if response.status_code == 200:
-                    logger.info(f"✅ Token exchange successful")
-                    # إزالة client_secret من الـ logs
-                    safe_result = {k: v for k, v in result.items() if k != 'client_secret'}
-                    logger.info(f"📊 Token data: {safe_result}")
-                else:
-                    logger.error(f"❌ Token exchange failed: {response.status_code}")
-                    logger.error(f"📄 Error response: {result}")
-                
-                return result
+            response = await self._send(
+                "POST",
+                self.token_url, 
+                data=payload,
+                headers={"Content-Type": "application/x-www-form-urlencoded"},
+                retry=False
+            )
+            
+            result = response.json()
+            
+            if response.status_code == 200:
+                logger.info(f"✅ Token exchange successful")
+                # إزالة client_secret من الـ logs
+                safe_result = {k: v for k, v in result.items() if k != 'client_secret'}
+                logger.info(f"📊 Token data: {safe_result}")
+            else:
+                logger.error(f"❌ Token exchange failed: {response.status_code}")
+                logger.error(f"📄 Error response: {result}")
+            
+            return result
                 
         except httpx.TimeoutException:
             logger.error("⏰ Timeout during token exchange")
@@ -114,131 +301,218 @@ class SallaAPIService:
         }
         
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    self.token_url,
-                    data=payload,
-                    headers={"Content-Type": "application/x-www-form-urlencoded"}
-                )
-                
-                result = response.json()
-                
-                if response.status_code == 200:
-                    logger.info(f"✅ Token refresh successful")
-                else:
-                    logger.error(f"❌ Token refresh failed: {response.status_code}")
-                    logger.error(f"📄 Error response: {result}")
-                
-                return result
+            response = await self._send(
+                "POST",
+                self.token_url,
+                data=payload,
+                headers={"Content-Type": "application/x-www-form-urlencoded"},
+                retry=False
+            )
+            
+            result = response.json()
+            
+            if response.status_code == 200:
+                logger.info(f"✅ Token refresh successful")
+            else:
+                logger.error(f"❌ Token refresh failed: {response.status_code}")
+                logger.error(f"📄 Error response: {result}")
+            
+            return result
                 
         except Exception as e:
             logger.error(f"❌ Exception during token refresh: {str(e)}")
             return {"error": "refresh_failed", "error_description": str(e)}
     
-    async def get_store_info(self, access_token: str) -> Dict:
+    async def get_store_info(
+        self,
+        access_token: str,
+        store: Optional[SallaStore] = None,
+        merchant_id: Optional[str] = None
+    ) -> Dict:
         """جلب معلومات المتجر من سلة"""
         logger.info(f"🏪 Fetching store info...")
         
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(
-                    f"{self.base_url}/store/info",
-                    headers={"Authorization": f"Bearer {access_token}"}
-                )
-                
-                result = response.json()
-                
-                if response.status_code == 200:
-                    logger.info(f"✅ Store info retrieved successfully")
-                    store_name = result.get("data", {}).get("name", "Unknown")
-                    logger.info(f"🏷️ Store name: {store_name}")
-                else:
-                    logger.error(f"❌ Store info fetch failed: {response.status_code}")
-                    logger.error(f"📄 Error response: {result}")
-                
-                return result
+            response = await self._send(
+                "GET", f"{self.base_url}/store/info", access_token, store=store, merchant_id=merchant_id
+            )
+            
+            result = response.json()
+            
+            if response.status_code == 200:
+                logger.info(f"✅ Store info retrieved successfully")
+                store_name = result.get("data", {}).get("name", "Unknown")
+                logger.info(f"🏷️ Store name: {store_name}")
+            else:
+                logger.error(f"❌ Store info fetch failed: {response.status_code}")
+                logger.error(f"📄 Error response: {result}")
+            
+            return result
                 
         except Exception as e:
             logger.error(f"❌ Exception during store info fetch: {str(e)}")
             return {"error": "store_info_failed", "error_description": str(e)}
     
-    async def get_products(self, access_token: str, page: int = 1, per_page: int = 15) -> Dict:
+    async def get_products(
+        self,
+        access_token: str,
+        page: int = 1,
+        per_page: int = 15,
+        store: Optional[SallaStore] = None,
+        merchant_id: Optional[str] = None
+    ) -> Dict:
         """جلب منتجات المتجر من سلة"""
         logger.info(f"📦 Fetching products - Page {page}, Per page: {per_page}")
         
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(
-                    f"{self.base_url}/products",
-                    headers={"Authorization": f"Bearer {access_token}"},
-                    params={"page": page, "per_page": per_page}
-                )
-                
-                result = response.json()
-                
-                if response.status_code == 200:
-                    products_count = len(result.get("data", []))
-                    logger.info(f"✅ Retrieved {products_count} products from page {page}")
-                else:
-                    logger.error(f"❌ Products fetch failed: {response.status_code}")
-                    logger.error(f"📄 Error response: {result}")
-                
-                return result
+            response = await self._send(
+                "GET",
+                f"{self.base_url}/products",
+                access_token,
+                params={"page": page, "per_page": per_page},
+                store=store,
+                merchant_id=merchant_id
+            )
+            
+            result = response.json()
+            
+            if response.status_code == 200:
+                products_count = len(result.get("data", []))
+                logger.info(f"✅ Retrieved {products_count} products from page {page}")
+            else:
+                logger.error(f"❌ Products fetch failed: {response.status_code}")
+                logger.error(f"📄 Error response: {result}")
+            
+            return result
                 
         except Exception as e:
             logger.error(f"❌ Exception during products fetch: {str(e)}")
             return {"error": "products_fetch_failed", "error_description": str(e)}
     
-    async def get_product(self, access_token: str, product_id: str) -> Dict:
+    async def iter_product_pages(
+        self,
+        access_token: str,
+        per_page: int = 20,
+        concurrency: int = 1,
+        start_page: int = 1,
+        first_page: Optional[Dict] = None,
+        store: Optional[SallaStore] = None,
+        on_stop: Optional[Callable[[int, Dict], None]] = None
+    ) -> AsyncIterator[Tuple[int, Dict]]:
+        """جلب صفحات المنتجات بالترتيب مع جلب الصفحات التالية بالتوازي
+
+        تُقرأ pagination.totalPages من أول صفحة، ثم يُبقى حتى `concurrency`
+        طلب قيد التنفيذ في نفس الوقت، وتُعاد الصفحات دائماً بترتيبها.
+        تتوقف عند أول صفحة فارغة أو فاشلة. الصفحة الفارغة بدون خطأ نهاية طبيعية
+        للكتالوج (قد يتقلص أثناء المزامنة)، و `on_stop` تُستدعى فقط عند خطأ حقيقي
+        برقم الصفحة ورد سلة.
+        """
+        def end_of_pages(page: int, products_data: Dict) -> bool:
+            if products_data.get("data"):
+                return False
+            if products_data.get("error") or products_data.get("success") is False:
+                logger.warning(f"⚠️ Stopping page fetch at page {page}: {products_data.get('error')}")
+                if on_stop is not None:
+                    on_stop(page, products_data)
+            else:
+                logger.info(f"📦 No products on page {page}, catalogue ends at page {page - 1}")
+            return True
+
+        if first_page is None:
+            first_page = await self.get_products(access_token, page=start_page, per_page=per_page, store=store)
+
+        if end_of_pages(start_page, first_page):
+            return
+
+        total_pages = first_page.get("pagination", {}).get("totalPages")
+        yield start_page, first_page
+
+        if total_pages is None:
+            # سلة لم ترجع عدد الصفحات - نكمل صفحة بصفحة حتى أول صفحة فارغة
+            page = start_page + 1
+            while True:
+                products_data = await self.get_products(access_token, page=page, per_page=per_page, store=store)
+                if end_of_pages(page, products_data):
+                    return
+                yield page, products_data
+                page += 1
+
+        concurrency = max(1, concurrency)
+        in_flight = deque()
+        next_page = start_page + 1
+
+        def schedule_next():
+            nonlocal next_page
+            while next_page <= total_pages and len(in_flight) < concurrency:
+                task = asyncio.create_task(
+                    self.get_products(access_token, page=next_page, per_page=per_page, store=store)
+                )
+                in_flight.append((next_page, task))
+                next_page += 1
+
+        try:
+            schedule_next()
+            while in_flight:
+                page, task = in_flight.popleft()
+                products_data = await task
+                if end_of_pages(page, products_data):
+                    return
+                schedule_next()
+                yield page, products_data
+        finally:
+            for _, task in in_flight:
+                task.cancel()
+
+    async def get_product(self, access_token: str, product_id: str, store: Optional[SallaStore] = None) -> Dict:
         """جلب منتج واحد من سلة"""
         logger.info(f"📦 Fetching product: {product_id}")
         
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(
-                    f"{self.base_url}/products/{product_id}",
-                    headers={"Authorization": f"Bearer {access_token}"}
-                )
-                
-                result = response.json()
-                
-                if response.status_code == 200:
-                    product_name = result.get("data", {}).get("name", "Unknown")
-                    logger.info(f"✅ Product retrieved: {product_name}")
-                else:
-                    logger.error(f"❌ Product fetch failed: {response.status_code}")
-                    logger.error(f"📄 Error response: {result}")
-                
-                return result
+            response = await self._send("GET", f"{self.base_url}/products/{product_id}", access_token, store=store)
+            
+            result = response.json()
+            
+            if response.status_code == 200:
+                product_name = result.get("data", {}).get("name", "Unknown")
+                logger.info(f"✅ Product retrieved: {product_name}")
+            else:
+                logger.error(f"❌ Product fetch failed: {response.status_code}")
+                logger.error(f"📄 Error response: {result}")
+            
+            return result
                 
         except Exception as e:
             logger.error(f"❌ Exception during product fetch: {str(e)}")
             return {"error": "product_fetch_failed", "error_description": str(e)}
     
-    async def update_product(self, access_token: str, product_id: str, product_data: Dict) -> Dict:
+    async def update_product(
+        self,
+        access_token: str,
+        product_id: str,
+        product_data: Dict,
+        store: Optional[SallaStore] = None
+    ) -> Dict:
         """تحديث منتج في سلة"""
         logger.info(f"✏️ Updating product: {product_id}")
         
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.put(
-                    f"{self.base_url}/products/{product_id}",
-                    headers={
-                        "Authorization": f"Bearer {access_token}",
-                        "Content-Type": "application/json"
-                    },
-                    json=product_data
-                )
-                
-                result = response.json()
-                
-                if response.status_code == 200:
-                    logger.info(f"✅ Product updated successfully: {product_id}")
-                else:
-                    logger.error(f"❌ Product update failed: {response.status_code}")
-                    logger.error(f"📄 Error response: {result}")
-                
-                return result
+            response = await self._send(
+                "PUT",
+                f"{self.base_url}/products/{product_id}",
+                access_token,
+                json=product_data,
+                store=store
+            )
+            
+            result = response.json()
+            
+            if response.status_code == 200:
+                logger.info(f"✅ Product updated successfully: {product_id}")
+            else:
+                logger.error(f"❌ Product update failed: {response.status_code}")
+                logger.error(f"📄 Error response: {result}")
+            
+            return result
                 
         except Exception as e:
             logger.error(f"❌ Exception during product update: {str(e)}")
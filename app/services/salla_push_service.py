@@ -0,0 +1,178 @@
+# app/services/salla_push_service.py
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import logging
+
+from sqlalchemy import update
+
+from app.database import SessionLocal
+from app.models.salla import SallaStore, SallaProduct
+from app.services.fair_queue import push_fair_queue
+from app.services.salla_api import SallaAPIService
+
+logger = logging.getLogger(__name__)
+
+
+def build_seo_payload(seo_data: dict) -> dict:
+    """تحويل بيانات SEO إلى صيغة تحديث المنتج في سلة"""
+    update_data = {
+        "metadata": {
+            "title": seo_data.get("seo_title"),
+            "description": seo_data.get("seo_description")
+        }
+    }
+
+    # إضافة الكلمات المفتاحية إذا وجدت
+    if seo_data.get("keywords"):
+        update_data["tags"] = seo_data["keywords"]
+
+    return update_data
+
+
+class SallaPushService:
+    """دفع تحديثات SEO إلى سلة بتوازٍ محدود لكل متجر عبر الطابور العادل بين المتاجر
+
+    كل منتج يُحفظ فور نجاح دفعه (commit مستقل) حتى لا يضيع التقدم عند فشل
+    منتج آخر، والمنتجات الفاشلة تبقى needs_update لإعادة دفعها لاحقاً.
+    إعادة المحاولة عند 429/5xx وأخطاء الشبكة تتم في SallaAPIService._send فقط.
+    """
+
+    def __init__(self, api: Optional[SallaAPIService] = None):
+        # حد التوازي لكل متجر هو max_per_tenant في push_fair_queue
+        self.concurrency = push_fair_queue.max_per_tenant
+        self.api = api or SallaAPIService()
+        self._stats = {"pushed": 0, "failed": 0, "skipped": 0}
+
+    async def push_products(self, product_ids: List[int], job: Optional[Dict[str, Any]] = None) -> Dict:
+        """دفع منتجات إلى سلة - يرجع ملخصاً ونتيجة لكل منتج
+
+        مع `job` (سجل عملية من BulkOptimizer.create_job) يُحدَّث التقدم بعد كل منتج
+        وتُحفظ النتائج فيه لتعيدها GET /bulk-operation/{job_id}.
+        """
+        if job is not None:
+            job.update({"status": "running", "started_at": datetime.utcnow(), "pushed": 0, "skipped": 0, "results": []})
+        db = SessionLocal()
+        try:
+            products = db.query(SallaProduct).filter(SallaProduct.id.in_(product_ids)).all()
+            store_ids = {product.store_id for product in products}
+            stores = {
+                store.id: store
+                for store in db.query(SallaStore).filter(SallaStore.id.in_(store_ids)).all()
+            } if store_ids else {}
+
+            items = [
+                {
+                    "id": product.id,
+                    "store_id": product.store_id,
+                    "salla_product_id": product.salla_product_id,
+                    "needs_update": product.needs_update,
+                    "payload": build_seo_payload({
+                        "seo_title": product.seo_title,
+                        "seo_description": product.seo_description
+                    }),
+                }
+                for product in products
+            ]
+            # المتاجر تُستخدم بعد إغلاق الجلسة (مدير الرموز يحدّثها في الذاكرة)
+            db.expunge_all()
+        finally:
+            db.close()
+
+        results = []
+        tasks = []
+        pushed_items = []
+        for item in items:
+            store = stores.get(item["store_id"])
+            if not item["needs_update"]:
+                self._stats["skipped"] += 1
+                results.append(self._track(job, {"product_id": item["id"], "status": "skipped"}))
+            elif not store or not store.access_token:
+                self._stats["failed"] += 1
+                results.append(self._track(job, {"product_id": item["id"], "status": "failed", "error": "store_not_connected"}))
+            else:
+                tasks.append(self._push_tracked(job, store, item))
+                pushed_items.append(item)
+
+        # خطأ غير متوقع في منتج لا يلغي دفع بقية منتجات المتجر ولا الملخص
+        for item, result in zip(pushed_items, await asyncio.gather(*tasks, return_exceptions=True)):
+            if isinstance(result, Exception):
+                self._stats["failed"] += 1
+                logger.error(f"❌ Failed to push product {item['salla_product_id']}: {str(result)}")
+                result = self._track(job, {"product_id": item["id"], "status": "failed", "error": str(result)[:500]})
+            results.append(result)
+
+        summary = {
+            "total": len(items),
+            "pushed": sum(1 for result in results if result["status"] == "pushed"),
+            "failed": sum(1 for result in results if result["status"] == "failed"),
+            "skipped": sum(1 for result in results if result["status"] == "skipped"),
+            "results": results,
+        }
+        logger.info(
+            f"✅ Pushed {summary['pushed']}/{summary['total']} products to Salla "
+            f"({summary['failed']} failed, {summary['skipped']} skipped)"
+        )
+        if job is not None:
+            job.update({"status": "completed", "results": results, "finished_at": datetime.utcnow()})
+        return summary
+
+    @staticmethod
+    def _track(job: Optional[Dict[str, Any]], result: Dict) -> Dict:
+        """تحديث تقدم العملية بنتيجة منتج واحد"""
+        if job is not None:
+            job["processed"] += 1
+            job[result["status"]] += 1
+        return result
+
+    async def _push_tracked(self, job: Optional[Dict[str, Any]], store: SallaStore, item: Dict) -> Dict:
+        return self._track(job, await self._push_one(store, item))
+
+    async def _push_one(self, store: SallaStore, item: Dict) -> Dict:
+        async with push_fair_queue.slot(store.id):
+            result = await self.api.update_product(
+                store.access_token,
+                item["salla_product_id"],
+                item["payload"],
+                store=store
+            )
+
+        if result.get("status") == 200 or result.get("success") is True:
+            try:
+                self._mark_pushed(item["id"])
+            except Exception as e:
+                # المنتج دُفع لسلة لكن لم يُحفظ - يبقى needs_update ويُعاد دفعه لاحقاً
+                self._stats["failed"] += 1
+                logger.error(f"❌ Pushed product {item['salla_product_id']} but could not save it: {str(e)}")
+                return {"product_id": item["id"], "status": "failed", "error": f"db_error: {str(e)[:480]}"}
+            self._stats["pushed"] += 1
+            return {"product_id": item["id"], "status": "pushed"}
+
+        # _send أعاد المحاولة عند 429/5xx وأخطاء الشبكة - ما يصل هنا فشل نهائي (مثل أخطاء التحقق 4xx)
+        error = result.get("error_description") or result.get("error") or str(result)
+        self._stats["failed"] += 1
+        logger.error(f"❌ Failed to push product {item['salla_product_id']}: {error}")
+        return {"product_id": item["id"], "status": "failed", "error": str(error)[:500]}
+
+    def _mark_pushed(self, product_id: int):
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            db.execute(
+                update(SallaProduct)
+                .where(SallaProduct.id == product_id)
+                .values(needs_update=False, last_synced_at=now, updated_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def get_metrics(self) -> Dict:
+        return {**self._stats, "concurrency_per_store": self.concurrency}
+
+
+salla_push_service = SallaPushService()
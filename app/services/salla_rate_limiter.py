@@ -0,0 +1,198 @@
+# app/services/salla_rate_limiter.py
+import asyncio
+import os
+import random
+import time
+from typing import Dict, Optional
+import logging
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+def _header_number(headers: httpx.Headers, name: str) -> Optional[float]:
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class TokenBucket:
+    """دلو رموز لمتجر واحد يتكيف مع حدود سلة المعلنة في الـ headers"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate  # رموز في الثانية
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.last_used = self.updated_at
+        self.blocked_until = 0.0
+        self.waiting = 0
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+
+    async def acquire(self):
+        """انتظار رمز متاح (الطلبات تُخدم بترتيب وصولها)"""
+        self.waiting += 1
+        self.last_used = time.monotonic()
+        try:
+            async with self._lock:
+                while True:
+                    now = time.monotonic()
+                    if self.blocked_until > now:
+                        await asyncio.sleep(self.blocked_until - now)
+                        continue
+
+                    self._refill(now)
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+
+                    await asyncio.sleep((1 - self.tokens) / self.rate)
+        finally:
+            self.waiting -= 1
+
+    def update(self, limit: Optional[float], remaining: Optional[float], reset_in: Optional[float], min_rate: float):
+        """مزامنة الدلو مع ما تعلنه سلة عن الحصة المتبقية"""
+        now = time.monotonic()
+        self._refill(now)
+
+        if limit:
+            self.limit = int(limit)
+            self.capacity = max(1.0, limit)
+
+        if remaining is None:
+            return
+
+        self.remaining = int(remaining)
+        # سلة هي المرجع - لا نسمح بأكثر مما تبقى فعلاً
+        self.tokens = min(self.tokens, remaining)
+
+        if remaining <= 0 and reset_in:
+            self.blocked_until = max(self.blocked_until, now + reset_in)
+        elif reset_in and reset_in > 0:
+            # توزيع الحصة المتبقية بالتساوي حتى بداية النافذة التالية
+            self.rate = max(min_rate, remaining / reset_in)
+
+    def is_idle(self, now: float, idle_after: float) -> bool:
+        """لا طلبات منتظرة ولا حظر قائم ولم يُستخدم منذ idle_after ثانية"""
+        return self.waiting == 0 and self.blocked_until <= now and now - self.last_used >= idle_after
+
+    def block_for(self, seconds: float):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+
+class SallaRateLimiter:
+    """جدولة طلبات سلة لكل تاجر حسب حدود المعدل مع إعادة المحاولة عند 429/5xx
+
+    دلو التاجر الخامل أكثر من SALLA_RATE_LIMIT_IDLE_SECONDS يُحذف (نافذة سلة تكون
+    قد انتهت)، ويُنشأ من جديد عند أول طلب تالٍ.
+    """
+
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self):
+        self.requests_per_minute = float(os.getenv("SALLA_RATE_LIMIT_PER_MINUTE", "120"))
+        self.max_retries = int(os.getenv("SALLA_MAX_RETRIES", "4"))
+        self.backoff_base = float(os.getenv("SALLA_RETRY_BACKOFF_BASE", "0.5"))
+        self.backoff_max = float(os.getenv("SALLA_RETRY_BACKOFF_MAX", "30"))
+        self.idle_after = float(os.getenv("SALLA_RATE_LIMIT_IDLE_SECONDS", "900"))
+        self.min_rate = 0.1
+        self.buckets: Dict[str, TokenBucket] = {}
+        self._last_eviction = time.monotonic()
+        self._stats = {
+            "throttled_responses": 0,
+            "server_errors": 0,
+            "retries": 0,
+            "exhausted_retries": 0,
+            "evicted_buckets": 0,
+        }
+
+    def bucket(self, key: str) -> TokenBucket:
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            self._evict_idle()
+            rate = self.requests_per_minute / 60.0
+            bucket = TokenBucket(rate=rate, capacity=max(1.0, rate * 10))
+            self.buckets[key] = bucket
+        return bucket
+
+    def _evict_idle(self):
+        """حذف دلاء التجار الخاملة (مرة كل idle_after على الأكثر)"""
+        now = time.monotonic()
+        if now - self._last_eviction < self.idle_after:
+            return
+        self._last_eviction = now
+        idle = [key for key, bucket in self.buckets.items() if bucket.is_idle(now, self.idle_after)]
+        for key in idle:
+            del self.buckets[key]
+        self._stats["evicted_buckets"] += len(idle)
+
+    async def acquire(self, key: str):
+        await self.bucket(key).acquire()
+
+    def record_response(self, key: str, response: httpx.Response):
+        """قراءة X-RateLimit-* من استجابة سلة وتحديث الدلو"""
+        bucket = self.bucket(key)
+        headers = response.headers
+
+        limit = _header_number(headers, "X-RateLimit-Limit")
+        remaining = _header_number(headers, "X-RateLimit-Remaining")
+        reset = _header_number(headers, "X-RateLimit-Reset")
+
+        reset_in = None
+        if reset is not None:
+            # سلة ترسل وقت إعادة الضبط كـ Unix timestamp، ونقبل أيضاً عدد الثواني
+            reset_in = max(0.0, reset - time.time()) if reset > 1_000_000_000 else reset
+
+        bucket.update(limit, remaining, reset_in, self.min_rate)
+
+        if response.status_code == 429:
+            self._stats["throttled_responses"] += 1
+            retry_after = _header_number(headers, "Retry-After")
+            bucket.block_for(retry_after if retry_after is not None else (reset_in or self.backoff_base))
+        elif response.status_code >= 500:
+            self._stats["server_errors"] += 1
+
+    def should_retry(self, response: Optional[httpx.Response], attempt: int) -> bool:
+        if attempt >= self.max_retries:
+            self._stats["exhausted_retries"] += 1
+            return False
+        return response is None or response.status_code in self.RETRY_STATUSES
+
+    async def backoff(self, attempt: int):
+        """انتظار تصاعدي مع jitter كامل قبل إعادة المحاولة"""
+        self._stats["retries"] += 1
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        await asyncio.sleep(delay)
+
+    def get_metrics(self) -> Dict:
+        """عمق الطابور وحالة الحصة لكل تاجر (مفتاحها رقم التاجر في سلة)"""
+        return {
+            **self._stats,
+            "stores": {
+                key: {
+                    "queue_depth": bucket.waiting,
+                    "tokens": round(bucket.tokens, 2),
+                    "rate_per_second": round(bucket.rate, 3),
+                    "limit": bucket.limit,
+                    "remaining": bucket.remaining,
+                }
+                for key, bucket in self.buckets.items()
+            },
+        }
+
+
+salla_rate_limiter = SallaRateLimiter()
@@ -0,0 +1,133 @@
+# app/services/salla_token_manager.py
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+import logging
+
+from app.database import SessionLocal
+from app.models.salla import SallaStore
+
+logger = logging.getLogger(__name__)
+
+
+class TokenRefreshError(Exception):
+    """فشل تحديث رمز الوصول لمتجر"""
+
+
+class SallaTokenManager:
+    """إدارة رموز وصول سلة: تحديث استباقي قبل الانتهاء مع طلب تحديث واحد لكل متجر
+
+    أي عدد من المستدعين المتزامنين لنفس المتجر ينتظرون نفس عملية التحديث،
+    والرمز الجديد يُحفظ في قاعدة البيانات بجلسة مستقلة وبشرط ألا تكون عملية
+    أخرى قد حفظت رمزاً جديداً في الأثناء.
+    """
+
+    def __init__(self):
+        self.refresh_margin = timedelta(minutes=int(os.getenv("SALLA_TOKEN_REFRESH_MARGIN_MINUTES", "60")))
+        self._inflight: Dict[int, asyncio.Task] = {}
+        self._stats = {"refreshes": 0, "coalesced": 0, "failures": 0, "lost_races": 0}
+
+    def needs_refresh(self, store: SallaStore) -> bool:
+        if not store.refresh_token or not store.token_expires_at:
+            return False
+        return store.token_expires_at - self.refresh_margin <= datetime.utcnow()
+
+    async def get_access_token(self, store: SallaStore, api) -> Optional[str]:
+        """رمز وصول صالح للمتجر (يُحدَّث تلقائياً إذا اقترب انتهاؤه)"""
+        if not self.needs_refresh(store):
+            return store.access_token
+
+        try:
+            return await self.refresh(store, api)
+        except TokenRefreshError as e:
+            logger.error(f"❌ Token refresh failed for store {store.store_id}: {str(e)}")
+            # نرجع الرمز الحالي - قد يكون ما زال صالحاً لبضع دقائق
+            return store.access_token
+
+    async def refresh(self, store: SallaStore, api, stale_token: Optional[str] = None) -> str:
+        """تحديث الرمز مع دمج الطلبات المتزامنة لنفس المتجر في طلب واحد"""
+        task = self._inflight.get(store.id)
+        if task is None:
+            task = asyncio.ensure_future(self._refresh(store.id, api, stale_token or store.access_token))
+            self._inflight[store.id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(store.id, None))
+        else:
+            self._stats["coalesced"] += 1
+
+        access_token, refresh_token, expires_at = await asyncio.shield(task)
+
+        # تحديث الكائن في ذاكرة المستدعي أيضاً
+        store.access_token = access_token
+        store.refresh_token = refresh_token
+        store.token_expires_at = expires_at
+        return access_token
+
+    async def _refresh(self, store_pk: int, api, stale_token: Optional[str]):
+        """تحديث الرمز عبر سلة ثم حفظه بشرط أن الرمز لم يتغير منذ قراءته (compare-and-set)
+
+        لا يُبقى أي قفل أو معاملة مفتوحة أثناء انتظار سلة - قفل صف في جلسة متزامنة
+        يوقف الـ event loop إذا حاول مستدعٍ آخر في نفس العملية تحديث نفس الصف.
+        """
+        db = SessionLocal()
+        try:
+            store = db.query(SallaStore).filter(SallaStore.id == store_pk).first()
+            if not store or not store.refresh_token:
+                raise TokenRefreshError("store has no refresh token")
+
+            # عملية أخرى حدّثت الرمز بالفعل
+            if store.access_token != stale_token and not self.needs_refresh(store):
+                return store.access_token, store.refresh_token, store.token_expires_at
+
+            seen_token = store.access_token
+            refresh_token = store.refresh_token
+            store_id = store.store_id
+            # إنهاء معاملة القراءة قبل طلب الشبكة
+            db.commit()
+
+            result = await api.refresh_access_token(refresh_token)
+            if "access_token" not in result:
+                self._stats["failures"] += 1
+                raise TokenRefreshError(result.get("error_description") or result.get("error") or "no access_token")
+
+            values = {
+                "access_token": result["access_token"],
+                "refresh_token": result.get("refresh_token", refresh_token),
+                "token_expires_at": self._expires_at(result),
+                "updated_at": datetime.utcnow(),
+            }
+            unchanged = SallaStore.access_token.is_(None) if seen_token is None else SallaStore.access_token == seen_token
+            written = db.query(SallaStore).filter(SallaStore.id == store_pk, unchanged).update(
+                values, synchronize_session=False
+            )
+            db.commit()
+
+            if not written:
+                # عملية أخرى حفظت رمزاً جديداً أولاً - نعتمد رمزها المحفوظ
+                self._stats["lost_races"] += 1
+                store = db.query(SallaStore).filter(SallaStore.id == store_pk).first()
+                logger.warning(f"⚠️ Token for store {store_id} was refreshed elsewhere, using the stored one")
+                return store.access_token, store.refresh_token, store.token_expires_at
+
+            self._stats["refreshes"] += 1
+            logger.info(f"🔑 Access token refreshed for store {store_id}")
+            return values["access_token"], values["refresh_token"], values["token_expires_at"]
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    @staticmethod
+    def _expires_at(token_data: Dict) -> datetime:
+        if token_data.get("expires_in"):
+            return datetime.utcnow() + timedelta(seconds=int(token_data["expires_in"]))
+        if token_data.get("expires"):
+            return datetime.utcfromtimestamp(int(token_data["expires"]))
+        return datetime.utcnow() + timedelta(days=14)
+
+    def get_metrics(self) -> Dict:
+        return {**self._stats, "in_flight": len(self._inflight)}
+
+
+salla_token_manager = SallaTokenManager()
@@ -0,0 +1,156 @@
+# app/services/seo_scorer.py
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence
+import logging
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.orm import Session
+
+from app.models.salla import SallaProduct
+from app.utils.arabic_text import has_repeated_keywords
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+except ImportError:  # اختياري - بدونه نحسب النقاط صفاً بصف بنفس القواعد
+    np = None
+
+_products = SallaProduct.__table__
+
+
+def _length(value: Any) -> int:
+    return len(value) if value else 0
+
+
+def _has_keywords(name: Optional[str], description: Optional[str]) -> bool:
+    """نفس شرط AIService.analyze_product_seo: 3 كلمات مفتاحية مكررة على الأقل"""
+    return has_repeated_keywords(f"{name} {description or ''}", 3)
+
+
+class SEOBatchScorer:
+    """إعادة حساب seo_score لعدد كبير من المنتجات دفعة واحدة
+
+    يقرأ الأعمدة المطلوبة فقط باستعلام Core على دفعات، ويحسب النقاط كمصفوفات
+    أطوال وأعلام (NumPy إن وُجد)، ثم يكتبها بـ UPDATE واحد (executemany) لكل
+    دفعة. القواعد مطابقة لـ AIService.analyze_product_seo والنتيجة نفسها تماماً.
+    """
+
+    def __init__(self):
+        self.chunk_size = int(os.getenv("SEO_SCORE_CHUNK_SIZE", "5000"))
+        self._stats = {"runs": 0, "products_scored": 0, "products_updated": 0, "last_duration_ms": None, "last_rate_per_sec": None}
+
+    def score_columns(
+        self,
+        names: Sequence[Optional[str]],
+        descriptions: Sequence[Optional[str]],
+        seo_titles: Sequence[Optional[str]],
+        seo_descriptions: Sequence[Optional[str]],
+        images: Sequence[Any],
+    ) -> List[int]:
+        """نقاط SEO لأعمدة متوازية (نفس ترتيب الصفوف)"""
+        keyword_flags = [_has_keywords(name, description) for name, description in zip(names, descriptions)]
+        if np is None:
+            return [
+                self._score_row(_length(name), _length(description), _length(seo_title),
+                                _length(seo_description), _length(image_list), has_keywords)
+                for name, description, seo_title, seo_description, image_list, has_keywords
+                in zip(names, descriptions, seo_titles, seo_descriptions, images, keyword_flags)
+            ]
+
+        count = len(names)
+        title = np.fromiter((_length(value) for value in names), dtype=np.int64, count=count)
+        desc = np.fromiter((_length(value) for value in descriptions), dtype=np.int64, count=count)
+        seo_title = np.fromiter((_length(value) for value in seo_titles), dtype=np.int64, count=count)
+        seo_desc = np.fromiter((_length(value) for value in seo_descriptions), dtype=np.int64, count=count)
+        image_count = np.fromiter((_length(value) for value in images), dtype=np.int64, count=count)
+        has_keywords = np.fromiter(keyword_flags, dtype=bool, count=count)
+
+        score = np.where((title >= 30) & (title <= 60), 20, 0)
+        score += np.where(desc > 160, 20, np.where(desc >= 50, 10, 0))
+        # الحقول الفارغة طولها 0 فلا تقع في المدى المثالي
+        score += np.where((seo_title >= 50) & (seo_title <= 60), 20, 0)
+        score += np.where((seo_desc >= 150) & (seo_desc <= 160), 20, 0)
+        score += np.where(image_count >= 3, 10, np.where(image_count > 0, 5, 0))
+        score += np.where(has_keywords, 10, 0)
+        return np.minimum(score, 100).tolist()
+
+    @staticmethod
+    def _score_row(title: int, desc: int, seo_title: int, seo_desc: int, image_count: int, has_keywords: bool) -> int:
+        score = 20 if 30 <= title <= 60 else 0
+        score += 20 if desc > 160 else 10 if desc >= 50 else 0
+        score += 20 if 50 <= seo_title <= 60 else 0
+        score += 20 if 150 <= seo_desc <= 160 else 0
+        score += 10 if image_count >= 3 else 5 if image_count > 0 else 0
+        score += 10 if has_keywords else 0
+        return min(score, 100)
+
+    def rescore(
+        self,
+        db: Session,
+        product_ids: Optional[List[int]] = None,
+        store_id: Optional[int] = None,
+        status: Optional[str] = "analyzed",
+    ) -> int:
+        """إعادة حساب وحفظ seo_score للمنتجات المحددة (أو كل منتجات المتجر) - يرجع عدد المنتجات"""
+        started = time.perf_counter()
+        query = select(
+            _products.c.id,
+            _products.c.name,
+            _products.c.description,
+            _products.c.seo_title,
+            _products.c.seo_description,
+            _products.c.images,
+            _products.c.seo_score,
+            _products.c.optimization_status,
+        ).order_by(_products.c.id)
+        if product_ids is not None:
+            query = query.where(_products.c.id.in_(product_ids))
+        if store_id is not None:
+            query = query.where(_products.c.store_id == store_id)
+
+        values = {"seo_score": bindparam("_score")}
+        if status:
+            values["optimization_status"] = status
+        statement = update(_products).where(_products.c.id == bindparam("_id")).values(**values)
+
+        # الكتابة بعد انتهاء القراءة - بعض القواعد لا تسمح بالتحديث أثناء مؤشر مفتوح على نفس الجدول
+        updates: List[Dict[str, int]] = []
+        total = 0
+        result = db.execute(query)
+        try:
+            while True:
+                rows = result.fetchmany(self.chunk_size)
+                if not rows:
+                    break
+                ids, names, descriptions, seo_titles, seo_descriptions, images, current_scores, statuses = zip(*rows)
+                scores = self.score_columns(names, descriptions, seo_titles, seo_descriptions, images)
+                # المنتجات التي لم تتغير نقاطها ولا حالتها لا تُكتب
+                updates.extend(
+                    {"_id": product_id, "_score": score}
+                    for product_id, score, current, current_status in zip(ids, scores, current_scores, statuses)
+                    if score != current or (status and current_status != status)
+                )
+                total += len(rows)
+        finally:
+            result.close()
+
+        for start in range(0, len(updates), self.chunk_size):
+            db.execute(statement, updates[start:start + self.chunk_size])
+        db.commit()
+
+        elapsed = time.perf_counter() - started
+        self._stats["runs"] += 1
+        self._stats["products_scored"] += total
+        self._stats["products_updated"] += len(updates)
+        self._stats["last_duration_ms"] = round(elapsed * 1000, 1)
+        self._stats["last_rate_per_sec"] = round(total / elapsed) if elapsed > 0 else None
+        logger.info(f"✅ Rescored SEO for {total} products ({len(updates)} changed) in {elapsed:.2f}s")
+        return total
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {**self._stats, "engine": "numpy" if np is not None else "python", "chunk_size": self.chunk_size}
+
+
+seo_scorer = SEOBatchScorer()
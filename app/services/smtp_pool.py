@@ -0,0 +1,157 @@
+# app/services/smtp_pool.py
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from email.message import Message
+from typing import Deque, Dict, Optional
+import logging
+
+import aiosmtplib
+
+logger = logging.getLogger(__name__)
+
+# أخطاء تعني أن الاتصال نفسه لم يعد صالحاً (وليس الرسالة)
+CONNECTION_ERRORS = (
+    aiosmtplib.SMTPServerDisconnected,
+    aiosmtplib.SMTPConnectError,
+    aiosmtplib.SMTPTimeoutError,
+    ConnectionError,
+    OSError,
+)
+
+
+class _PooledConnection:
+    __slots__ = ("smtp", "created_at", "last_used", "messages")
+
+    def __init__(self, smtp: aiosmtplib.SMTP):
+        self.smtp = smtp
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.messages = 0
+
+
+class SMTPConnectionPool:
+    """مجموعة جلسات SMTP مسجّلة الدخول يُعاد استخدامها بين الإيميلات
+
+    بدلاً من TLS + LOGIN لكل رسالة، تُحفظ الجلسات الخاملة وتُفحص بـ NOOP إذا
+    طال خمولها، وتُغلق بعد مهلة الخمول أو عدد محدد من الرسائل. عدد الجلسات
+    المفتوحة معاً لا يتجاوز SMTP_POOL_SIZE.
+    """
+
+    def __init__(self, hostname: str, username: str, password: str):
+        self.hostname = hostname
+        self.username = username
+        self.password = password
+        self.size = int(os.getenv("SMTP_POOL_SIZE", "3"))
+        self.idle_timeout = float(os.getenv("SMTP_POOL_IDLE_TIMEOUT", "240"))
+        self.healthcheck_after = float(os.getenv("SMTP_POOL_HEALTHCHECK_SECONDS", "30"))
+        self.max_messages = int(os.getenv("SMTP_POOL_MAX_MESSAGES", "100"))
+        self.timeout = float(os.getenv("SMTP_TIMEOUT", "60"))
+
+        self._idle: Deque[_PooledConnection] = deque()
+        self._semaphore = asyncio.Semaphore(self.size)
+        self._mode: Optional[str] = None  # "ssl" أو "starttls" حسب ما نجح أولاً
+        self._stats = {
+            "connects": 0,
+            "reuses": 0,
+            "healthcheck_failures": 0,
+            "discarded": 0,
+            "sent": 0,
+        }
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        # نبدأ بالطريقة التي نجحت سابقاً ونرجع للأخرى إذا فشلت
+        modes = ["starttls", "ssl"] if self._mode == "starttls" else ["ssl", "starttls"]
+        last_error = None
+        for mode in modes:
+            try:
+                if mode == "ssl":
+                    # SSL مباشر (منفذ 465)
+                    smtp = aiosmtplib.SMTP(hostname=self.hostname, port=465, use_tls=True, timeout=self.timeout)
+                    await smtp.connect()
+                else:
+                    # STARTTLS (منفذ 587)
+                    smtp = aiosmtplib.SMTP(hostname=self.hostname, port=587, use_tls=False, start_tls=False, timeout=self.timeout)
+                    await smtp.connect()
+                    await smtp.starttls()
+                await smtp.login(self.username, self.password)
+                self._mode = mode
+                self._stats["connects"] += 1
+                return smtp
+            except aiosmtplib.SMTPAuthenticationError:
+                raise
+            except Exception as e:
+                last_error = e
+                logger.warning(f"SMTP {mode} connection failed: {str(e)}")
+        raise last_error
+
+    async def _healthy(self, connection: _PooledConnection) -> bool:
+        idle_for = time.monotonic() - connection.last_used
+        if not connection.smtp.is_connected or idle_for > self.idle_timeout:
+            return False
+        if connection.messages >= self.max_messages:
+            return False
+        if idle_for > self.healthcheck_after:
+            try:
+                await connection.smtp.noop()
+            except Exception:
+                self._stats["healthcheck_failures"] += 1
+                return False
+        return True
+
+    async def _close(self, connection: _PooledConnection):
+        self._stats["discarded"] += 1
+        try:
+            if connection.smtp.is_connected:
+                await connection.smtp.quit()
+        except Exception:
+            connection.smtp.close()
+
+    @asynccontextmanager
+    async def connection(self):
+        """جلسة SMTP جاهزة للإرسال - تعود للمجموعة بعد الاستخدام ما لم يفشل الاتصال"""
+        async with self._semaphore:
+            connection = None
+            while self._idle:
+                candidate = self._idle.pop()
+                if await self._healthy(candidate):
+                    connection = candidate
+                    self._stats["reuses"] += 1
+                    break
+                await self._close(candidate)
+
+            if connection is None:
+                connection = _PooledConnection(await self._connect())
+
+            try:
+                yield connection.smtp
+            except BaseException:
+                # انقطاع أو خطأ أثناء الإرسال - حالة الجلسة غير معروفة فلا نعيدها
+                await self._close(connection)
+                raise
+            else:
+                connection.messages += 1
+                connection.last_used = time.monotonic()
+                self._idle.append(connection)
+
+    async def send_message(self, message: Message):
+        """إرسال رسالة مع إعادة المحاولة مرة واحدة بجلسة جديدة إذا انقطعت الجلسة المحفوظة"""
+        for attempt in range(2):
+            try:
+                async with self.connection() as smtp:
+                    result = await smtp.send_message(message)
+                self._stats["sent"] += 1
+                return result
+            except CONNECTION_ERRORS as e:
+                if attempt == 1:
+                    raise
+                logger.warning(f"SMTP session dropped ({e.__class__.__name__}), reconnecting...")
+
+    async def close(self):
+        while self._idle:
+            await self._close(self._idle.pop())
+
+    def get_metrics(self) -> Dict:
+        return {**self._stats, "idle": len(self._idle), "size": self.size, "mode": self._mode}
@@ -0,0 +1,302 @@
+# app/services/webhook_inbox.py
+import asyncio
+import hashlib
+import os
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+import logging
+
+from sqlalchemy import or_, and_, exists, func
+from sqlalchemy.orm import Session, aliased
+
+from app.database import SessionLocal
+from app.models.webhook_event import WebhookEvent
+from app.services.fair_queue import webhook_fair_queue
+from app.utils.db import QueueWorker, dialect_insert
+
+logger = logging.getLogger(__name__)
+
+WebhookHandler = Callable[[Session, str, dict], Awaitable[None]]
+BatchWebhookHandler = Callable[[Session, str, List[dict]], Awaitable[None]]
+
+
+class WebhookInbox(QueueWorker):
+    """صندوق وارد دائم لأحداث سلة مع workers تعالجها على دفعات
+
+    الـ endpoint يحفظ الحدث بـ INSERT واحد ويرد فوراً، ثم تحجز الـ workers
+    دفعات من الأحداث وتمرر كل حدث لمعالجه بجلسة قاعدة بيانات مستقلة.
+
+    الأحداث المسجلة بمعالج دفعات (مثل product.updated) تنتظر نافذة الدمج،
+    ثم يُطبق آخر payload فقط لكل (تاجر، كيان) وتُجمع الكتابات في معاملة
+    واحدة لكل متجر. أحداث الكيان الواحد لا تُحجز قبل انتهاء الأحداث الأقدم منها
+    لنفس الكيان، فلا يسبق product.deleted تحديثات وصلت قبله وما زالت تنتظر.
+    """
+
+    name = "Webhook inbox"
+    model = WebhookEvent
+    finished_column = "processed_at"
+    failed_column = "processed_at"
+
+    def __init__(self):
+        super().__init__(
+            batch_size=int(os.getenv("WEBHOOK_BATCH_SIZE", "50")),
+            max_attempts=int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "5")),
+            retry_delay=2,
+            lock_timeout=timedelta(seconds=int(os.getenv("WEBHOOK_LOCK_TIMEOUT", "300"))),
+            poll_interval=float(os.getenv("WEBHOOK_POLL_INTERVAL", "1.0")),
+            workers_count=int(os.getenv("WEBHOOK_WORKERS", "4")),
+        )
+        self.coalesce_window = timedelta(seconds=float(os.getenv("WEBHOOK_COALESCE_WINDOW", "2")))
+
+        self.handlers: Dict[str, WebhookHandler] = {}
+        self.batch_handlers: Dict[str, BatchWebhookHandler] = {}
+        self._stats.update({
+            "received": 0,
+            "duplicates": 0,
+            "processed": 0,
+            "ignored": 0,
+            "coalesced": 0,
+            "coalesced_applied": 0,
+            "coalesced_transactions": 0,
+        })
+
+    def register(self, event: str, handler: WebhookHandler):
+        """تسجيل معالج لنوع حدث - المعالج يرفع الاستثناء عند الفشل ليُعاد الحدث لاحقاً"""
+        self.handlers[event] = handler
+
+    def register_batch(self, event: str, handler: BatchWebhookHandler):
+        """تسجيل معالج دفعات لحدث قابل للدمج (يستقبل آخر payload لكل كيان في المتجر)"""
+        self.batch_handlers[event] = handler
+
+    @staticmethod
+    def idempotency_key(raw_body: bytes) -> str:
+        return hashlib.sha256(raw_body).hexdigest()
+
+    def enqueue(self, db: Session, event: str, merchant_id: str, data: dict, raw_body: bytes) -> bool:
+        """حفظ الحدث في الصندوق (يتجاهل الأحداث المكررة) - يرجع False للتكرار"""
+        now = datetime.utcnow()
+        entity_id = data.get("id") if isinstance(data, dict) else None
+        # الأحداث القابلة للدمج تنتظر نافذة الدمج قبل أن تصبح متاحة للمعالجة
+        available_at = now + self.coalesce_window if event in self.batch_handlers else now
+        
+        stmt = dialect_insert(db, WebhookEvent.__table__).values(
+            idempotency_key=self.idempotency_key(raw_body),
+            event=event,
+            merchant_id=merchant_id,
+            entity_id=str(entity_id) if entity_id is not None else None,
+            payload=data,
+            status="pending",
+            attempts=0,
+            received_at=now,
+            available_at=available_at,
+        ).on_conflict_do_nothing(index_elements=["idempotency_key"])
+
+        result = db.execute(stmt)
+        db.commit()
+
+        inserted = result.rowcount != 0
+        if inserted:
+            self._stats["received"] += 1
+            self._notify()
+        else:
+            self._stats["duplicates"] += 1
+        return inserted
+
+    @staticmethod
+    def _earlier_open_event(*conditions):
+        """يوجد حدث أقدم لنفس (التاجر، الكيان) لم ينتهِ بعد (pending أو processing)"""
+        earlier = aliased(WebhookEvent)
+        return exists().where(
+            earlier.merchant_id == WebhookEvent.merchant_id,
+            earlier.entity_id == WebhookEvent.entity_id,
+            earlier.id < WebhookEvent.id,
+            earlier.status.in_(["pending", "processing"]),
+            *(condition(earlier) for condition in conditions),
+        )
+
+    def _claim_ready(self, db: Session) -> List[Dict]:
+        """حجز دفعة موزعة بالتساوي على التجار الذين لديهم أحداث جاهزة
+
+        تاجر يرسل آلاف الأحداث لا يملأ الدفعة وحده، فحدث تاجر صغير لا ينتظر
+        خلف كل أحداثه.
+        """
+        # ترتيب أحداث الكيان الواحد: الحدث ينتظر كل ما قبله لنفس الكيان
+        ready = and_(
+            self._ready(datetime.utcnow()),
+            or_(WebhookEvent.entity_id.is_(None), ~self._earlier_open_event()),
+        )
+        merchants = [
+            merchant_id
+            for merchant_id, in db.query(WebhookEvent.merchant_id)
+            .filter(ready)
+            .group_by(WebhookEvent.merchant_id)
+            .order_by(func.min(WebhookEvent.id))
+            .limit(self.batch_size)
+            .all()
+        ]
+        if not merchants:
+            return []
+
+        quota = max(1, self.batch_size // len(merchants))
+        claimed = []
+        for merchant_id in merchants:
+            merchant_filter = WebhookEvent.merchant_id.is_(None) if merchant_id is None \
+                else WebhookEvent.merchant_id == merchant_id
+            claimed.extend(self._claim_where(
+                db,
+                conditions=[ready, merchant_filter],
+                order_by=[WebhookEvent.id],
+                limit=quota if len(merchants) > 1 else self.batch_size,
+            ))
+        return claimed
+
+    def _claim_siblings(self, events: List[Dict]) -> List[Dict]:
+        """حجز الأحداث المعلقة لنفس الكيانات (حتى لو لم تنتهِ نافذتها) لدمجها
+
+        لا تُحجز الأحداث التي وصلت بعد حدث غير قابل للدمج لنفس الكيان (مثل الحذف)،
+        فتُطبق بعده بترتيبها.
+        """
+        entities = {event["entity_id"] for event in events if event["entity_id"] is not None}
+        if not entities:
+            return []
+
+        return self._claim(lambda db: self._claim_where(
+            db,
+            conditions=[
+                WebhookEvent.status == "pending",
+                WebhookEvent.event.in_({event["event"] for event in events}),
+                WebhookEvent.merchant_id.in_({event["merchant_id"] for event in events}),
+                WebhookEvent.entity_id.in_(entities),
+                ~self._earlier_open_event(
+                    lambda earlier: earlier.event.notin_(list(self.batch_handlers))
+                ),
+            ],
+            order_by=[WebhookEvent.id],
+            limit=self.batch_size * 10,
+        ))
+
+    def _as_dict(self, event: WebhookEvent) -> Dict:
+        return {
+            "id": event.id,
+            "event": event.event,
+            "merchant_id": event.merchant_id,
+            "entity_id": event.entity_id,
+            "payload": event.payload or {},
+            "attempts": event.attempts or 0,
+            "received_at": event.received_at,
+        }
+
+    async def process_batch(self) -> int:
+        """حجز دفعة ومعالجتها - يرجع عدد الأحداث المحجوزة
+
+        أحداث كل تاجر تُعالج بالترتيب داخل slot من الطابور العادل، والتجار
+        المختلفون يُعالجون بالتوازي.
+        """
+        events = self._claim()
+        if not events:
+            return 0
+
+        by_merchant: Dict[str, List[Dict]] = {}
+        for event in events:
+            by_merchant.setdefault(str(event["merchant_id"]), []).append(event)
+
+        results = await asyncio.gather(*(
+            self._process_merchant(merchant_id, merchant_events)
+            for merchant_id, merchant_events in by_merchant.items()
+        ))
+
+        self._mark_done([event_id for done_ids in results for event_id in done_ids])
+        return len(events)
+
+    @staticmethod
+    def _entity_key(event: Dict) -> Optional[tuple]:
+        """(نوع الكيان، id) - product.updated و product.deleted لنفس المنتج لهما نفس المفتاح"""
+        if event["entity_id"] is None:
+            return None
+        return event["event"].split(".")[0], event["entity_id"]
+
+    async def _process_merchant(self, merchant_id: str, events: List[Dict]) -> List[int]:
+        async with webhook_fair_queue.slot(merchant_id, cost=len(events)):
+            # آخر حدث غير قابل للدمج لكل كيان (مثل product.deleted): التحديثات التي قبله
+            # تُعالج منفردة بترتيبها حتى لا يُطبق تحديث قديم بعد الحذف
+            last_ordered: Dict[tuple, int] = {}
+            for event in events:
+                key = self._entity_key(event)
+                if key is not None and event["event"] not in self.batch_handlers:
+                    last_ordered[key] = max(last_ordered.get(key, 0), event["id"])
+
+            done_ids = []
+            coalescable = []
+            for event in sorted(events, key=lambda item: item["id"]):
+                if event["event"] in self.batch_handlers and event["id"] > last_ordered.get(self._entity_key(event), 0):
+                    coalescable.append(event)
+                elif await self._dispatch(event):
+                    done_ids.append(event["id"])
+
+            if coalescable:
+                done_ids.extend(await self._process_coalesced(coalescable))
+            return done_ids
+
+    async def _process_coalesced(self, events: List[Dict]) -> List[int]:
+        """تطبيق آخر payload فقط لكل (حدث، تاجر، كيان) مع معاملة واحدة لكل متجر"""
+        all_events = events + self._claim_siblings(events)
+
+        latest: Dict[tuple, Dict] = {}
+        for event in sorted(all_events, key=lambda item: item["id"]):
+            entity_key = event["entity_id"] if event["entity_id"] is not None else f"#{event['id']}"
+            latest[(event["event"], event["merchant_id"], entity_key)] = event
+
+        winner_ids = {event["id"] for event in latest.values()}
+        coalesced_ids = [event["id"] for event in all_events if event["id"] not in winner_ids]
+        self._mark_done(coalesced_ids, status="coalesced")
+        self._stats["coalesced"] += len(coalesced_ids)
+
+        groups: Dict[tuple, List[Dict]] = {}
+        for event in latest.values():
+            groups.setdefault((event["event"], event["merchant_id"]), []).append(event)
+
+        done_ids = []
+        for (event_type, merchant_id), group in groups.items():
+            handler = self.batch_handlers[event_type]
+            db = SessionLocal()
+            try:
+                await handler(db, str(merchant_id), [event["payload"] for event in group])
+                done_ids.extend(event["id"] for event in group)
+                self._stats["processed"] += len(group)
+                self._stats["coalesced_applied"] += len(group)
+                self._stats["coalesced_transactions"] += 1
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Error processing {len(group)} coalesced {event_type} webhooks for {merchant_id}: {str(e)}")
+                for event in group:
+                    self._mark_failed(event, str(e))
+            finally:
+                db.close()
+
+        return done_ids
+
+    async def _dispatch(self, event: Dict) -> bool:
+        handler = self.handlers.get(event["event"])
+        if handler is None and event["event"] in self.batch_handlers:
+            batch_handler = self.batch_handlers[event["event"]]
+
+            async def handler(db: Session, merchant_id: str, payload: dict):
+                await batch_handler(db, merchant_id, [payload])
+        if handler is None:
+            self._stats["ignored"] += 1
+            return True
+
+        if await self._run_handler(
+            event,
+            f"webhook {event['event']}",
+            lambda db: handler(db, str(event["merchant_id"]), event["payload"]),
+        ):
+            self._stats["processed"] += 1
+            return True
+        return False
+
+    def get_metrics(self) -> Dict:
+        return {**super().get_metrics(), "workers": len(self._tasks)}
+
+
+webhook_inbox = WebhookInbox()
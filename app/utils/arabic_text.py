@@ -0,0 +1,177 @@
+# app/utils/arabic_text.py
+"""معالجة نصوص المنتجات العربية والإنجليزية: توحيد الحروف، كلمات التوقف، تجذيع خفيف وعد التكرار
+
+التوحيد: أشكال الألف (أ إ آ ٱ) ← ا، التاء المربوطة ← ه، الألف المقصورة ← ي، حذف التشكيل
+والتطويل، الأرقام العربية ← أرقام لاتينية، والحروف الإنجليزية صغيرة.
+"""
+
+import re
+from collections import Counter
+from functools import lru_cache
+from itertools import chain
+from typing import Dict, List, Optional, Set, Tuple
+
+# التشكيل (فتحة، ضمة، كسرة، تنوين، شدة، سكون...) والألف الخنجرية والتطويل
+_DIACRITICS = [chr(code) for code in range(0x064B, 0x0660)] + ["\u0670"]
+_TATWEEL = "\u0640"
+
+_NORMALIZE_TABLE = str.maketrans(
+    {
+        **{char: None for char in _DIACRITICS + [_TATWEEL]},
+        "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+        "ة": "ه",
+        "ى": "ي",
+        **{arabic: str(digit) for digit, arabic in enumerate("٠١٢٣٤٥٦٧٨٩")},
+        **{persian: str(digit) for digit, persian in enumerate("۰۱۲۳۴۵۶۷۸۹")},
+    }
+)
+
+# الكلمة تشمل علامات التشكيل حتى لا تنقسم "مُنتَج" إلى أجزاء
+_WORD_RE = re.compile(r"[\w\u064b-\u065f\u0670]+")
+_DIGIT_RE = re.compile(r"\d")
+# الفاصلة وعلامة الاستفهام العربيتان (، ؟) مضافتان عمداً: القائمة القديمة كانت تعد ؛ فقط
+# من الترقيم العربي، فلا ينال الوصف العربي المرقّم نقاط الترقيم في جودة المحتوى
+_PUNCTUATION = ".,!?؛:،؟"
+
+STOPWORDS_AR = frozenset(
+    word.translate(_NORMALIZE_TABLE)
+    for word in (
+        "من", "في", "على", "إلى", "الى", "عن", "مع", "هذا", "هذه", "ذلك", "تلك", "الذي", "التي", "الذين",
+        "كان", "كانت", "يكون", "تكون", "أو", "أن", "إن", "لا", "ما", "لم", "لن", "كل", "بعد", "قبل", "عند",
+        "حتى", "ثم", "قد", "هو", "هي", "هم", "نحن", "أنت", "أنتم", "لكم", "لنا", "لك", "به", "بها", "فيه",
+        "فيها", "منه", "منها", "عليه", "عليها", "يتم", "أيضا", "أيضاً", "بين", "غير", "كما", "لدى", "إذا",
+        "او", "وهو", "وهي", "وفي", "ومن", "ومع", "وعلى", "لذلك", "حيث", "عبر", "خلال", "جدا", "جداً", "أكثر",
+        "أي", "كلا", "ليس", "بدون", "دون", "لقد", "هناك", "هنا", "الآن", "يمكن", "يمكنك", "فقط",
+    )
+)
+
+STOPWORDS_EN = frozenset((
+    "the", "and", "for", "with", "you", "your", "are", "this", "that", "from", "was", "were", "has", "have",
+    "had", "not", "but", "all", "can", "our", "out", "its", "into", "than", "then", "them", "they", "their",
+    "will", "would", "there", "these", "those", "what", "which", "who", "when", "where", "how", "any",
+    "also", "more", "most", "very", "just", "only", "about", "over", "such", "each", "other", "use", "per",
+))
+
+STOPWORDS = STOPWORDS_AR | STOPWORDS_EN
+
+# السوابق واللواحق بعد التوحيد، الأطول أولاً
+_PREFIXES = ("وال", "بال", "كال", "فال", "لل", "ال")
+_SUFFIXES = ("ات", "ون", "ين")
+# أقل طول للجذع بعد حذف سابقة أو لاحقة
+_MIN_STEM = 3
+
+
+def normalize(text: Optional[str]) -> str:
+    """توحيد الحروف العربية وتصغير الإنجليزية"""
+    if not text:
+        return ""
+    return text.translate(_NORMALIZE_TABLE).lower()
+
+
+def light_stem(word: str) -> str:
+    """تجذيع خفيف لكلمة موحدة: حذف أداة التعريف وحروف العطف والجر الملتصقة ولواحق الجمع"""
+    for prefix in _PREFIXES:
+        if word.startswith(prefix) and len(word) - len(prefix) >= _MIN_STEM:
+            word = word[len(prefix):]
+            break
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= _MIN_STEM:
+            word = word[:-len(suffix)]
+            break
+    return word
+
+
+@lru_cache(maxsize=65536)
+def _token_words(token: str) -> Tuple[str, ...]:
+    """الكلمات الموحدة داخل جزء من النص بين مسافتين ("الجودة،" ← ("الجوده",))"""
+    return tuple(_WORD_RE.findall(normalize(token)))
+
+
+@lru_cache(maxsize=65536)
+def _token_keywords(token: str) -> Tuple[Tuple[str, str], ...]:
+    """(مفتاح العد، الكلمة كما وردت) لكل كلمة مفتاحية داخل جزء من النص"""
+    pairs = []
+    for word in _WORD_RE.findall(token):
+        normalized = normalize(word)
+        if len(normalized) <= 2 or normalized in STOPWORDS:
+            continue
+        key = light_stem(normalized)
+        if len(key) > 2:
+            pairs.append((key, word.replace(_TATWEEL, "")))
+    return tuple(pairs)
+
+
+# النص يُقسم بالمسافات ويُعد بـ Counter أولاً، ثم يُوحد كل جزء مختلف مرة واحدة فقط
+# (مع كاش) بدلاً من توحيد وتقسيم النص كاملاً في كل استدعاء
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """كلمات النص بعد التوحيد بترتيبها (بدون علامات الترقيم)"""
+    if not text:
+        return []
+    return list(chain.from_iterable(map(_token_words, text.split())))
+
+
+def word_stats(text: Optional[str]) -> Tuple[int, Set[str]]:
+    """عدد الكلمات بعد التوحيد ومجموعة الكلمات المختلفة (مثل len و set لـ tokenize بدون بناء القائمة)"""
+    if not text:
+        return 0, set()
+    tokens = text.split()
+    distinct = set(tokens)
+    token_words = list(map(_token_words, distinct))
+    unique = set(chain.from_iterable(token_words))
+    count = len(tokens)
+    # أغلب الأجزاء كلمة واحدة، والتكرار يُحسب فقط إذا وُجد جزء ليس كذلك ("-" أو "a/b")
+    if set(map(len, token_words)) != {1}:
+        counts = Counter(tokens)
+        count += sum((len(words) - 1) * counts[token] for token, words in zip(distinct, token_words))
+    return count, unique
+
+
+def keyword_counts(text: Optional[str]) -> Tuple[Counter, Dict[str, str]]:
+    """تكرار كل مفتاح (كلمة موحدة بعد التجذيع) وأول صيغة ظهر بها في النص"""
+    counts: Counter = Counter()
+    surfaces: Dict[str, str] = {}
+    if not text:
+        return counts, surfaces
+    for token, freq in Counter(text.split()).items():
+        for key, word in _token_keywords(token):
+            if key in counts:
+                counts[key] += freq
+            else:
+                counts[key] = freq
+                surfaces[key] = word
+    return counts, surfaces
+
+
+def extract_keywords(text: Optional[str], limit: int = 10, min_freq: int = 2) -> List[str]:
+    """أكثر الكلمات المفتاحية تكراراً (بصيغتها في النص) - صيغ نفس الكلمة تُعد معاً"""
+    counts, surfaces = keyword_counts(text)
+    return [surfaces[key] for key, freq in counts.most_common(limit) if freq >= min_freq]
+
+
+def has_repeated_keywords(text: Optional[str], required: int = 3) -> bool:
+    """هل يحتوي النص على required كلمة مفتاحية مكررة على الأقل - يتوقف فور الوصول للعدد
+
+    مكافئ لـ len(extract_keywords(text)) >= required عندما required <= 10.
+    """
+    if not text:
+        return False
+    seen = set()
+    repeated = set()
+    for token in text.split():
+        for key, _ in _token_keywords(token):
+            if key in seen:
+                repeated.add(key)
+                if len(repeated) >= required:
+                    return True
+            else:
+                seen.add(key)
+    return False
+
+
+def contains_digit(text: str) -> bool:
+    return _DIGIT_RE.search(text) is not None
+
+
+def count_punctuation(text: str) -> int:
+    return sum(map(text.count, _PUNCTUATION))
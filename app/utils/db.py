@@ -0,0 +1,261 @@
+# app/utils/db.py
+"""أدوات مساعدة لعمليات قاعدة البيانات التي تختلف بين PostgreSQL و SQLite"""
+
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# حد المتغيرات في استعلام SQLite الواحد (SQLITE_MAX_VARIABLE_NUMBER في النسخ القديمة)
+SQLITE_MAX_VARIABLES = 999
+
+
+def dialect_name(db: Session) -> str:
+    """اسم محرك قاعدة البيانات المرتبط بالجلسة"""
+    return db.get_bind().dialect.name
+
+
+def dialect_insert(db: Session, table):
+    """إنشاء INSERT يدعم ON CONFLICT حسب نوع قاعدة البيانات"""
+    if dialect_name(db) == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
+def rows_per_statement(db: Session, columns_count: int, default: int = 500) -> int:
+    """عدد الصفوف الآمن في INSERT متعدد الصفوف"""
+    if dialect_name(db) == "sqlite":
+        return max(1, SQLITE_MAX_VARIABLES // max(1, columns_count))
+    return default
+
+
+def claim_batch(db: Session, model, conditions: list, order_by: list, limit: int, values: dict) -> List:
+    """حجز دفعة من صفوف طابور (webhooks، مهام...) لمعالج واحد
+
+    يُحدَّث حتى `limit` صف مطابق بـ claim_token جديد ثم تُقرأ الصفوف المحجوزة.
+    على PostgreSQL يُستخدم FOR UPDATE SKIP LOCKED حتى لا تنتظر المعالجات
+    بعضها ولا تحجز نفس الصفوف. الجدول يجب أن يحتوي على عمود claim_token.
+    لا يتم عمل commit هنا.
+    """
+    claim_token = uuid.uuid4().hex
+    candidates = select(model.id).where(*conditions).order_by(*order_by).limit(limit)
+    if dialect_name(db) == "postgresql":
+        candidates = candidates.with_for_update(skip_locked=True)
+    
+    db.execute(
+        update(model)
+        .where(model.id.in_(candidates))
+        .values(claim_token=claim_token, **values)
+        .execution_options(synchronize_session=False)
+    )
+    return db.query(model).filter(model.claim_token == claim_token).order_by(*order_by).all()
+
+
+class QueueWorker:
+    """أساس الطوابير المحفوظة في قاعدة البيانات (webhooks، مهام مؤجلة، إيميلات)
+
+    يوفر حلقة الـ workers مع الإيقاظ، حجز الصفوف المستحقة أو العالقة مع worker
+    توقف فجأة، تعليم الصفوف كمنتهية أو فاشلة مع backoff أُسّي، وعداد الطابور.
+    كل طابور يحدد النموذج وأسماء الأعمدة ويكتب process_batch ومعالجاته فقط.
+    الجدول يحتاج الأعمدة: status, attempts, last_error, claim_token, locked_at.
+    """
+
+    name = "Queue worker"
+    model = None
+    active_status = "processing"  # حالة الصف أثناء معالجته
+    done_status = "done"
+    available_column = "available_at"  # لا يُحجز الصف قبل هذا الوقت
+    finished_column = "finished_at"  # وقت الانتهاء عند النجاح
+    failed_column: Optional[str] = "finished_at"  # وقت الانتهاء عند الاستسلام (None لعدم التسجيل)
+
+    def __init__(
+        self,
+        batch_size: int,
+        max_attempts: int,
+        retry_delay: float,
+        lock_timeout: timedelta,
+        poll_interval: float,
+        workers_count: int = 1,
+    ):
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+        self.workers_count = workers_count
+
+        self._tasks: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stats: Dict[str, int] = {"retried": 0, "failed": 0}
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._worker_loop(index))
+            for index in range(self.workers_count)
+        ]
+        logger.info(f"✅ {self.name} started with {self.workers_count} workers")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+        logger.info(f"🛑 {self.name} stopped")
+
+    def _notify(self, session=None):
+        """إيقاظ الـ workers (آمن من threads المسارات المتزامنة ومن after_commit)"""
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _worker_loop(self, index: int):
+        while True:
+            try:
+                claimed = await self.process_batch()
+                if claimed:
+                    continue
+                delay = self._next_delay()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"{self.name} worker #{index} error: {str(e)}")
+                delay = self.poll_interval
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def _next_delay(self) -> float:
+        """مدة النوم عندما لا توجد صفوف جاهزة"""
+        return self.poll_interval
+
+    async def process_batch(self) -> int:
+        """حجز دفعة ومعالجتها - يرجع عدد الصفوف المحجوزة"""
+        raise NotImplementedError
+
+    def _as_dict(self, row) -> Dict:
+        """نسخة من الصف تُستخدم بعد إغلاق جلسة الحجز"""
+        raise NotImplementedError
+
+    def _ready(self, now: datetime):
+        """صفوف مستحقة، أو محجوزة مع worker توقف فجأة"""
+        model = self.model
+        return or_(
+            and_(model.status == "pending", getattr(model, self.available_column) <= now),
+            and_(model.status == self.active_status, model.locked_at < now - self.lock_timeout),
+        )
+
+    def _claim_where(self, db: Session, conditions: list, order_by: list, limit: int) -> List[Dict]:
+        rows = claim_batch(
+            db,
+            self.model,
+            conditions=conditions,
+            order_by=order_by,
+            limit=limit,
+            values={"status": self.active_status, "locked_at": datetime.utcnow()},
+        )
+        return [self._as_dict(row) for row in rows]
+
+    def _claim_ready(self, db: Session) -> List[Dict]:
+        return self._claim_where(
+            db,
+            conditions=[self._ready(datetime.utcnow())],
+            order_by=[getattr(self.model, self.available_column), self.model.id],
+            limit=self.batch_size,
+        )
+
+    def _claim(self, claim: Optional[Callable[[Session], List[Dict]]] = None) -> List[Dict]:
+        """حجز دفعة في معاملة مستقلة (افتراضياً الصفوف الجاهزة بترتيب استحقاقها)"""
+        db = SessionLocal()
+        try:
+            claimed = (claim or self._claim_ready)(db)
+            db.commit()
+            return claimed
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def _run_handler(self, row: Dict, label: str, call: Callable[[Session], Awaitable[None]]) -> bool:
+        """تنفيذ معالج بجلسة مستقلة - عند الفشل يُعاد الصف للطابور ويرجع False"""
+        db = SessionLocal()
+        try:
+            await call(db)
+            return True
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error processing {label} #{row['id']}: {str(e)}")
+            self._mark_failed(row, str(e))
+            return False
+        finally:
+            db.close()
+
+    def _update(self, condition, values: dict):
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(self.model)
+                .where(condition)
+                .values(claim_token=None, **values)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _mark_done(self, ids: List[int], status: Optional[str] = None):
+        if not ids:
+            return
+        self._update(
+            self.model.id.in_(ids),
+            {"status": status or self.done_status, self.finished_column: datetime.utcnow()},
+        )
+
+    def _mark_failed(self, row: Dict, error: str, give_up: bool = False) -> bool:
+        """إعادة الصف للطابور بعد retry_delay * 2^(المحاولة-1) - يرجع True عند الاستسلام"""
+        attempts = row["attempts"] + 1
+        give_up = give_up or attempts >= self.max_attempts
+        values = {"attempts": attempts, "last_error": error[:2000]}
+        if give_up:
+            values["status"] = "failed"
+            if self.failed_column:
+                values[self.failed_column] = datetime.utcnow()
+            self._stats["failed"] += 1
+        else:
+            values["status"] = "pending"
+            values[self.available_column] = datetime.utcnow() + timedelta(seconds=self.retry_delay * 2 ** (attempts - 1))
+            self._stats["retried"] += 1
+
+        self._update(self.model.id == row["id"], values)
+        return give_up
+
+    def get_metrics(self) -> Dict:
+        model = self.model
+        db = SessionLocal()
+        try:
+            backlog = dict(
+                db.query(model.status, func.count(model.id))
+                .filter(model.status.in_(["pending", self.active_status, "failed"]))
+                .group_by(model.status)
+                .all()
+            )
+        finally:
+            db.close()
+        return {**self._stats, "backlog": backlog}